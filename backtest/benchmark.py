@@ -0,0 +1,250 @@
+"""
+Throughput benchmarks on synthetic data, written as JSON for comparison across versions.
+- simulator: bars/s of one grid backtest (`run_grid_backtest`, streamed metrics).
+- optimizer: combinations/s of a small sweep.
+- metrics: streaming accumulator vs vectorized array path over a full equity curve.
+- cache: dataset write, memory-mapped open and a full column scan.
+- orders: bulk vs one-by-one placement and cancellation of a dense grid, and the memory
+  held per resting order (tracemalloc).
+- ticks: trade prints (synthetic, `ticks_per_bar` per bar) written to zstd day partitions
+  (bytes per print on disk), replayed in chunks (prints/s) and run through the
+  queue-position grid (`run_grid_ticks`); memory is bounded by the largest chunk.
+- downloader: rows/s and requests of the async windowed downloader and of the sync
+  fetcher against the local fake MEXC client (no network, no cache writes).
+"""
+from __future__ import annotations
+import asyncio
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+import numpy as np
+
+from backtest.data.market import MarketArrays
+from backtest.data.synthetic import synthetic_market
+from config.schemas import BacktestConfig, OptimizeMatrix
+from strategies.grid import GridParams
+
+BENCHMARKS = ("simulator", "optimizer", "metrics", "cache", "orders", "ticks", "downloader")
+BENCH_CONFIG = BacktestConfig(symbol="BENCH_USDT_PERP", leverage=10)
+BENCH_PARAMS = GridParams(grid_levels=40, grid_spacing_pct=0.25, position_size_usdt=5.0,
+                          take_profit_pct=200.0, stop_loss_pct=80.0)
+BENCH_MATRIX = OptimizeMatrix(grid_levels=[10, 40], grid_spacing_pct=[0.2, 0.5, 1.0], position_size_usdt=[5.0],
+                              take_profit_pct=[200.0], stop_loss_pct=[80.0], leverage=[5, 20])
+
+
+def _timed(fn: Callable[[], Any], repeats: int = 1) -> float:
+    """Best wall time of `repeats` calls."""
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_simulator(market: MarketArrays, repeats: int = 3) -> Dict[str, Any]:
+    from backtest.engine import run_grid_backtest
+
+    result: Dict[str, Any] = {}
+    secs = _timed(lambda: result.update(run_grid_backtest(market, BENCH_CONFIG, BENCH_PARAMS)), repeats)
+    return {"seconds": secs, "bars": len(market), "bars_per_sec": len(market) / secs,
+            "event_bars": result["event_bars"], "fills": result["fills"]}
+
+
+def bench_optimizer(market: MarketArrays, workers: int = 1) -> Dict[str, Any]:
+    from backtest.optimizer import expand_matrix, run_sweep
+
+    combos = len(list(expand_matrix(BENCH_MATRIX)))
+    secs = _timed(lambda: run_sweep(market, BENCH_CONFIG, BENCH_MATRIX, workers=workers))
+    return {"seconds": secs, "combos": combos, "workers": workers, "combos_per_sec": combos / secs}
+
+
+def bench_metrics(market: MarketArrays, repeats: int = 3) -> Dict[str, Any]:
+    from backtest.metrics import MetricsAccumulator, compute_metrics_array
+
+    equity = 1000.0 * np.asarray(market.close) / float(market.close[0])
+
+    def stream() -> None:
+        acc = MetricsAccumulator()
+        for k in range(0, len(equity), 4096):
+            acc.update_equity_array(equity[k:k + 4096])
+        acc.result()
+
+    array_s = _timed(lambda: compute_metrics_array(equity), repeats)
+    stream_s = _timed(stream, repeats)
+    return {"bars": len(equity), "array_seconds": array_s, "stream_seconds": stream_s,
+            "bars_per_sec": len(equity) / array_s}
+
+
+def bench_cache(market: MarketArrays, root: Path, repeats: int = 3) -> Dict[str, Any]:
+    from backtest.data.dataset import open_dataset, write_dataset
+
+    path = root / "bench_dataset"
+    write_s = _timed(lambda: write_dataset(market, path))
+    open_s = _timed(lambda: open_dataset(path), repeats)
+
+    def scan() -> None:
+        m = open_dataset(path)
+        for arr in m.columns().values():
+            float(np.asarray(arr).sum())
+
+    scan_s = _timed(scan, repeats)
+    nbytes = sum(arr.nbytes for arr in market.columns().values())
+    return {"bytes": nbytes, "write_seconds": write_s, "open_seconds": open_s, "scan_seconds": scan_s,
+            "scan_mb_per_sec": nbytes / scan_s / 1e6}
+
+
+def bench_orders(levels: int = 20_000) -> Dict[str, Any]:
+    from backtest.exchange_sim import ExchangeSim, Order
+
+    prices = 1.0 - 1e-5 * np.arange(1, levels + 1)
+
+    def fresh() -> ExchangeSim:
+        sim = ExchangeSim(BENCH_CONFIG.symbol, specs=None)
+        sim.on_bar(1.0, 1.0, 1.0, 1.0, 0)
+        return sim
+
+    def measured(place: Callable[[ExchangeSim], Any]) -> Dict[str, float]:
+        sim = fresh()
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        place(sim)
+        secs = time.perf_counter() - t0
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        if len(sim.open_orders) != levels:
+            raise RuntimeError(f"placed {len(sim.open_orders)} of {levels} orders")
+        t0 = time.perf_counter()
+        sim.cancel_orders(list(sim.open_orders))
+        return {"place_seconds": secs, "cancel_seconds": time.perf_counter() - t0,
+                "bytes_per_order": held / levels}
+
+    def one_by_one(sim: ExchangeSim) -> None:
+        for k, p in enumerate(prices.tolist()):
+            sim.place_order(Order(id=f"b{k}", side="buy", type="limit", price=p, qty=10.0))
+
+    # tracemalloc slows the placement itself; time without it as well
+    bulk_s = _timed(lambda: fresh().place_orders("buy", prices, 10.0))
+    single_s = _timed(lambda: one_by_one(fresh()))
+    return {"levels": levels, "bulk_place_seconds": bulk_s, "single_place_seconds": single_s,
+            "bulk": measured(lambda sim: sim.place_orders("buy", prices, 10.0)),
+            "single_with_ids": measured(one_by_one)}
+
+
+def bench_ticks(market: MarketArrays, root: Path, ticks_per_bar: int = 20, chunk_rows: int = 1 << 18) -> Dict[str, Any]:
+    from backtest.data.partitions import DAY_MS
+    from backtest.data.synthetic import synthetic_trades
+    from backtest.data.trades import iter_trades, normalize_trades, trade_store
+    from backtest.engine import run_grid_ticks
+
+    trades = normalize_trades(synthetic_trades(market, ticks_per_bar))
+    store = trade_store(BENCH_CONFIG.symbol, root)
+    start, end = int(trades["ts"].iloc[0]), int(trades["ts"].iloc[-1])
+    t0 = time.perf_counter()
+    store.write(trades, start, end, now=end + DAY_MS)
+    write_s = time.perf_counter() - t0
+    del trades
+    disk = sum(p.stat().st_size for p in store.dir.glob("*.parquet"))
+
+    def replay() -> int:
+        return sum(len(chunk) for chunk in iter_trades(store, start, end, chunk_rows))
+
+    read_s = _timed(replay)
+    n = 0
+    chunk_bytes = 0
+    for chunk in iter_trades(store, start, end, chunk_rows):
+        n += len(chunk)
+        chunk_bytes = max(chunk_bytes, chunk.ts.nbytes + chunk.price.nbytes + chunk.qty.nbytes + chunk.side.nbytes)
+    t0 = time.perf_counter()
+    metrics = run_grid_ticks(iter_trades(store, start, end, chunk_rows), BENCH_CONFIG, BENCH_PARAMS, queue_ahead=50.0)
+    sim_s = time.perf_counter() - t0
+    return {"prints": n, "disk_bytes_per_print": disk / n, "write_seconds": write_s,
+            "replay_prints_per_sec": n / read_s, "sim_prints_per_sec": n / sim_s,
+            "event_prints": metrics["event_trades"], "fills": metrics["fills"],
+            "chunk_rows": chunk_rows, "max_chunk_mb": chunk_bytes / 1e6}
+
+
+def bench_downloader(days: float, concurrency: int = 8, latency_s: float = 0.005) -> Dict[str, Any]:
+    from backtest.data import client, downloader
+    from backtest.data.async_downloader import AsyncDownloader
+    from backtest.data.fake_exchange import FakeMexc, FakeMexcSync
+
+    end = 1_704_067_200_000
+    start = end - int(days * 86_400_000)
+
+    async def run_async() -> Dict[str, Any]:
+        async with AsyncDownloader(lambda: FakeMexc(latency_s=latency_s), concurrency=concurrency,
+                                   rate_per_sec=10_000) as dl:
+            t0 = time.perf_counter()
+            df = await dl.klines("PI/USDT", "1m", start, end - 1)
+            return {"seconds": time.perf_counter() - t0, "rows": len(df), "requests": dl.stats["requests"]}
+
+    # the fake client's markets snapshot must not land in (or be read from) the real cache
+    cache_dir, factory = downloader.CACHE_DIR, client._FACTORY
+    with tempfile.TemporaryDirectory() as tmp:
+        downloader.CACHE_DIR = Path(tmp)
+        try:
+            out = {"async": asyncio.run(run_async())}
+            fake = FakeMexcSync(latency_s=0.0)
+            client.set_exchange_factory(lambda: fake)
+            t0 = time.perf_counter()
+            df = downloader.fetch_klines_ccxt("PI/USDT", "1m", start, end - 1)
+            out["sync"] = {"seconds": time.perf_counter() - t0, "rows": len(df), "requests": fake.requests}
+        finally:
+            client.set_exchange_factory(factory)
+            downloader.CACHE_DIR = cache_dir
+    for v in out.values():
+        v["rows_per_sec"] = v["rows"] / v["seconds"] if v["seconds"] else 0.0
+    out["concurrency"] = concurrency
+    out["latency_s"] = latency_s
+    return out
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(days: float = 30.0, seed: int = 0, workers: int = 1, only: Optional[Iterable[str]] = None,
+                   out: Optional[Path] = None, **market_kwargs: float) -> Dict[str, Any]:
+    """Run the selected benchmarks on one synthetic market; writes JSON to `out` if given."""
+    selected = list(only) if only else list(BENCHMARKS)
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"unknown benchmarks: {sorted(unknown)}")
+    t0 = time.perf_counter()
+    market = synthetic_market(days, seed, **market_kwargs)
+    report: Dict[str, Any] = {
+        "meta": {"git_rev": _git_rev(), "python": platform.python_version(), "numpy": np.__version__,
+                 "machine": platform.machine(), "timestamp": time.time(), "days": days, "seed": seed,
+                 "bars": len(market), "generate_seconds": time.perf_counter() - t0, **market_kwargs},
+    }
+    for name in selected:
+        if name == "simulator":
+            report[name] = bench_simulator(market)
+        elif name == "optimizer":
+            report[name] = bench_optimizer(market, workers)
+        elif name == "metrics":
+            report[name] = bench_metrics(market)
+        elif name == "cache":
+            with tempfile.TemporaryDirectory() as tmp:
+                report[name] = bench_cache(market, Path(tmp))
+        elif name == "orders":
+            report[name] = bench_orders()
+        elif name == "ticks":
+            with tempfile.TemporaryDirectory() as tmp:
+                report[name] = bench_ticks(market, Path(tmp))
+        elif name == "downloader":
+            report[name] = bench_downloader(days)
+    if out is not None:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(report, indent=2))
+    return report
@@ -0,0 +1,203 @@
+"""
+Concurrent download mode on top of ccxt's async support.
+- The requested range is split into independent windows (one page each) that are
+  fetched concurrently under a shared token-bucket rate limit.
+- Network errors and rate-limit responses are retried with exponential backoff.
+- Windows are merged with the same dedupe/sort step as the serial downloader.
+- `fetch_concurrent_gaps` fetches every gap the partition cache is missing in one session.
+- The exchange backend is pluggable (e.g. fake_exchange.FakeMexc for offline tests).
+"""
+from __future__ import annotations
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+import pandas as pd
+import ccxt
+
+from backtest.data.client import load_snapshot
+from backtest.data.downloader import (_finalize_funding, _finalize_ohlcv, _normalize_swap_symbol, _parse_funding_row,
+                                      record_page)
+from utils.profiling import current_profiler
+from utils.time import timeframe_to_ms
+
+FUNDING_INTERVAL_MS = 8 * 3_600_000
+ExchangeFactory = Callable[[], Any]
+
+
+def default_exchange_factory() -> Any:
+    import ccxt.async_support as ccxt_async
+
+    ex = ccxt_async.mexc()
+    ex.options = {**getattr(ex, "options", {}), "defaultType": "swap", "adjustForTimeDifference": False}
+    markets = load_snapshot()
+    if markets is not None:
+        ex.set_markets(markets)
+    return ex
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited_s = 0.0
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                delay = (tokens - self._tokens) / self.rate
+                self.waited_s += delay
+                await asyncio.sleep(delay)
+
+
+def split_windows(since_ms: int, end_ms: int, window_ms: int) -> List[Tuple[int, int]]:
+    """[since_ms, end_ms] cut into consecutive inclusive windows of `window_ms`."""
+    return [(s, min(s + window_ms - 1, end_ms)) for s in range(since_ms, end_ms + 1, window_ms)]
+
+
+class AsyncDownloader:
+    """One exchange client, rate limiter and concurrency cap shared by all streams.
+
+    Use as ``async with AsyncDownloader(...) as dl: df = await dl.klines(...)``.
+    """
+
+    def __init__(self, exchange_factory: Optional[ExchangeFactory] = None, concurrency: int = 8,
+                 rate_per_sec: float = 10.0, burst: Optional[float] = None, retries: int = 5,
+                 backoff_s: float = 0.5, limit: int = 1000):
+        self.exchange_factory = exchange_factory or default_exchange_factory
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate_per_sec, burst)
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.limit = limit
+        self.ex: Any = None
+        self.stats: Dict[str, int] = {"requests": 0, "retries": 0, "rows": 0}
+        self.profiler = current_profiler()
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncDownloader":
+        self.ex = self.exchange_factory()
+        self._sem = asyncio.Semaphore(self.concurrency)
+        if not getattr(self.ex, "markets", None):
+            try:
+                await self.ex.load_markets()
+            except Exception:
+                # proceed; some versions lazy-load on first fetch
+                pass
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.ex.close()
+
+    async def _call(self, fn: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        prof = self.profiler
+        for attempt in range(self.retries + 1):
+            t0 = time.perf_counter()
+            await self.bucket.acquire()
+            self.stats["requests"] += 1
+            t1 = time.perf_counter()
+            if prof is not None:
+                prof.add_time("rate_limit_wait", t1 - t0)
+            try:
+                page = await fn(*args, **kwargs)
+                if prof is not None:
+                    record_page(prof, self.ex, page, time.perf_counter() - t1)
+                return page
+            except ccxt.NetworkError:
+                # includes RateLimitExceeded/DDoSProtection/RequestTimeout
+                if attempt == self.retries:
+                    raise
+                self.stats["retries"] += 1
+                if prof is not None:
+                    prof.count("retries")
+                await asyncio.sleep(self.backoff_s * 2 ** attempt * (1 + 0.25 * random.random()))
+
+    async def _ohlcv_window(self, method: str, symbol: str, timeframe: str, w_start: int, w_end: int) -> List[list]:
+        rows: List[list] = []
+        cursor_end = w_end
+        async with self._sem:
+            while cursor_end >= w_start:
+                params = {"contractType": "PERPETUAL", "startTime": w_start, "endTime": cursor_end}
+                page = await self._call(getattr(self.ex, method), symbol, timeframe=timeframe, since=None,
+                                        limit=self.limit, params=params)
+                if not page:
+                    break
+                rows.extend(r for r in page if w_start <= r[0] <= w_end)
+                new_cursor_end = page[0][0] - 1
+                if new_cursor_end >= cursor_end:
+                    break
+                cursor_end = new_cursor_end
+        self.stats["rows"] += len(rows)
+        return rows
+
+    async def _ohlcv(self, method: str, symbol: str, timeframe: str, since_ms: int, end_ms: int) -> pd.DataFrame:
+        symbol = _normalize_swap_symbol(self.ex, symbol)
+        windows = split_windows(since_ms, end_ms, self.limit * timeframe_to_ms(timeframe))
+        pages = await asyncio.gather(*(self._ohlcv_window(method, symbol, timeframe, s, e) for s, e in windows))
+        return _finalize_ohlcv([r for page in pages for r in page])
+
+    async def klines(self, symbol: str, timeframe: str, since_ms: int, end_ms: int) -> pd.DataFrame:
+        return await self._ohlcv("fetch_ohlcv", symbol, timeframe, since_ms, end_ms)
+
+    async def mark(self, symbol: str, timeframe: str, since_ms: int, end_ms: int) -> pd.DataFrame:
+        if not getattr(self.ex, "has", {}).get("fetchMarkOHLCV", False):
+            return _finalize_ohlcv([])  # graceful fallback
+        return await self._ohlcv("fetch_mark_ohlcv", symbol, timeframe, since_ms, end_ms)
+
+    async def _funding_window(self, symbol: str, w_start: int, w_end: int) -> List[dict]:
+        rows: List[dict] = []
+        cursor = w_start
+        async with self._sem:
+            while cursor <= w_end:
+                page = await self._call(self.ex.fetch_funding_rate_history, symbol, since=cursor,
+                                        limit=self.limit, params={"contractType": "PERPETUAL"})
+                if not page:
+                    break
+                for r in page:
+                    row = _parse_funding_row(r)
+                    if row is not None and w_start <= row["ts"] <= w_end:
+                        rows.append(row)
+                last_ts = page[-1].get("timestamp")
+                if last_ts is None or last_ts + 1 <= cursor:
+                    break
+                cursor = last_ts + 1
+        self.stats["rows"] += len(rows)
+        return rows
+
+    async def funding(self, symbol: str, since_ms: int, end_ms: int) -> pd.DataFrame:
+        symbol = _normalize_swap_symbol(self.ex, symbol)
+        windows = split_windows(since_ms, end_ms, self.limit * FUNDING_INTERVAL_MS)
+        pages = await asyncio.gather(*(self._funding_window(symbol, s, e) for s, e in windows))
+        return _finalize_funding([r for page in pages for r in page])
+
+
+def fetch_concurrent_gaps(stream: str, symbol: str, gaps: Sequence[Tuple[int, int]], timeframe: str = "1m",
+                          **opts: Any) -> List[pd.DataFrame]:
+    """Blocking entry point: every [since_ms, end_ms] gap of one stream ('klines', 'mark' or
+    'funding') in a single AsyncDownloader session, so they share its client and rate limit.
+    `opts` go to AsyncDownloader."""
+    async def _run() -> List[pd.DataFrame]:
+        async with AsyncDownloader(**opts) as dl:
+            if stream == "funding":
+                return await asyncio.gather(*(dl.funding(symbol, s, e) for s, e in gaps))
+            fetch = getattr(dl, stream)
+            return await asyncio.gather(*(fetch(symbol, timeframe, s, e) for s, e in gaps))
+
+    return list(asyncio.run(_run()))
+
+
+def fetch_concurrent(stream: str, symbol: str, since_ms: int, end_ms: int, timeframe: str = "1m",
+                     **opts: Any) -> pd.DataFrame:
+    """One range of one stream; see fetch_concurrent_gaps."""
+    return fetch_concurrent_gaps(stream, symbol, [(since_ms, end_ms)], timeframe=timeframe, **opts)[0]
@@ -0,0 +1,119 @@
+"""
+Shared MEXC swap client and persisted markets snapshot.
+- One configured ccxt client per process (keeps its HTTP session alive across fetches).
+- Loaded markets are saved to a JSON snapshot with a TTL; later processes seed the client
+  from it instead of calling load_markets over the network.
+- The snapshot also feeds `register_specs` (tick/lot/min notional/risk tiers).
+"""
+from __future__ import annotations
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+import ccxt
+
+from backtest.exchange_specs import ContractSpecs, register_specs, spec_symbol, specs_from_ccxt_market
+
+SNAPSHOT_TTL_S = 24 * 3600
+ExchangeFactory = Callable[[], Any]
+
+_CLIENTS: Dict[int, Any] = {}  # keyed by pid so forked workers never share a session
+_FACTORY: Optional[ExchangeFactory] = None
+
+
+def snapshot_path() -> Path:
+    from backtest.data.downloader import CACHE_DIR
+
+    return CACHE_DIR / "markets_mexc_swap.json"
+
+
+def set_exchange_factory(factory: Optional[ExchangeFactory]) -> None:
+    """Swap the backend (e.g. fake_exchange.FakeMexcSync); None restores ccxt.mexc. Drops pooled clients."""
+    global _FACTORY
+    _FACTORY = factory
+    _CLIENTS.clear()
+
+
+def _configure(ex: Any) -> Any:
+    ex.options = {**getattr(ex, "options", {}), "defaultType": "swap", "adjustForTimeDifference": False}
+    return ex
+
+
+def load_snapshot(path: Optional[Path] = None, ttl_s: float = SNAPSHOT_TTL_S) -> Optional[Dict[str, Any]]:
+    """Markets from the snapshot, or None if missing, unreadable or older than `ttl_s`."""
+    path = path or snapshot_path()
+    try:
+        payload = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    if time.time() - payload.get("saved_at", 0) > ttl_s:
+        return None
+    return payload.get("markets") or None
+
+
+def save_snapshot(markets: Dict[str, Any], path: Optional[Path] = None) -> None:
+    path = path or snapshot_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"saved_at": time.time(), "markets": markets}, default=str))
+    tmp.replace(path)
+
+
+def seed_markets(ex: Any, ttl_s: float = SNAPSHOT_TTL_S) -> None:
+    """Give `ex` its markets from the snapshot, or load them once and refresh the snapshot."""
+    markets = load_snapshot(ttl_s=ttl_s)
+    if markets is not None:
+        ex.set_markets(markets)
+        return
+    try:
+        markets = ex.load_markets()
+    except Exception:
+        # proceed; some versions lazy-load on first fetch
+        return
+    if markets:
+        save_snapshot(markets)
+
+
+def get_exchange(ttl_s: float = SNAPSHOT_TTL_S) -> Any:
+    """The process-wide configured client, created and seeded on first use."""
+    pid = os.getpid()
+    ex = _CLIENTS.get(pid)
+    if ex is None:
+        ex = _configure((_FACTORY or ccxt.mexc)())
+        seed_markets(ex, ttl_s)
+        _CLIENTS.clear()
+        _CLIENTS[pid] = ex
+    return ex
+
+
+def register_specs_from_snapshot(ref_prices: Optional[Dict[str, float]] = None,
+                                 ttl_s: float = SNAPSHOT_TTL_S) -> int:
+    """Register ContractSpecs for every swap market in the snapshot; returns how many.
+
+    `ref_prices` (keyed by spec symbol, e.g. PI_USDT_PERP) turns risk-tier caps into USDT;
+    markets without one are registered without tiers. Falls back to loading markets through the shared client when no fresh snapshot exists.
+    """
+    markets = load_snapshot(ttl_s=ttl_s)
+    if markets is None:
+        markets = getattr(get_exchange(ttl_s), "markets", None) or {}
+    ref_prices = ref_prices or {}
+    count = 0
+    for market in markets.values():
+        if not market.get("swap"):
+            continue
+        register_specs(specs_from_ccxt_market(market, ref_prices.get(spec_symbol(market))))
+        count += 1
+    return count
+
+
+def register_symbol_specs(symbol: str, ref_price: float, ttl_s: float = float("inf")) -> Optional[ContractSpecs]:
+    """Register `symbol`'s specs (e.g. PI_USDT_PERP) from the snapshot with tier caps priced at
+    `ref_price`; None if the snapshot does not have it. Never goes to the network: a stale
+    snapshot still carries the right tick and lot."""
+    for market in (load_snapshot(ttl_s=ttl_s) or {}).values():
+        if market.get("swap") and spec_symbol(market) == symbol:
+            specs = specs_from_ccxt_market(market, ref_price)
+            register_specs(specs)
+            return specs
+    return None
@@ -0,0 +1,104 @@
+"""
+Memory-mapped market datasets.
+- `build_dataset` validates last-price klines and mark OHLC (see validators.py: bad candles
+  repaired, duplicates dropped, gaps counted), aligns them and funding onto one bar
+  timeline once (funding pre-indexed to bar positions) and writes each column as a
+  fixed-dtype .npy file next to a meta.json that carries the quality reports.
+- A dataset is reused only if it was built after its last day closed (UTC); one covering
+  the current day is rebuilt on the next call, as the partition cache refetches that day.
+- `open_dataset` maps the columns read-only with numpy.memmap: no parse, no copy, and
+  the OS page cache is shared by every process that opens the same dataset.
+"""
+from __future__ import annotations
+import json
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+import numpy as np
+
+from backtest.data.market import BAR_COLUMNS, FUNDING_COLUMNS, MarketArrays
+from backtest.data.partitions import DAY_MS, day_floor, safe_symbol
+from utils.logging import get_logger
+
+DATASET_VERSION = 2
+
+
+def dataset_dir(symbol: str, timeframe: str, start: str, end: str, root: Optional[Path] = None) -> Path:
+    if root is None:
+        from backtest.data.downloader import CACHE_DIR
+
+        root = CACHE_DIR / "datasets"
+    return root / f"{safe_symbol(symbol)}_{timeframe}_{start}_{end}"
+
+
+def write_dataset(market: MarketArrays, path: Path, **meta: object) -> Path:
+    """Write `market` as one .npy per column; replaced atomically if it exists."""
+    tmp = path.with_name(path.name + ".tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+    columns = {}
+    for name, arr in market.columns().items():
+        np.save(tmp / f"{name}.npy", np.ascontiguousarray(arr))
+        columns[name] = np.dtype(arr.dtype).str
+    info = {"version": DATASET_VERSION, "bars": len(market), "funding_events": len(market.funding_ts),
+            "columns": columns, "built_at": time.time(), **meta}
+    (tmp / "meta.json").write_text(json.dumps(info, indent=2))
+    if path.exists():
+        shutil.rmtree(path)
+    tmp.replace(path)
+    return path
+
+
+def dataset_meta(path: Path) -> Optional[dict]:
+    meta = path / "meta.json"
+    return json.loads(meta.read_text()) if meta.exists() else None
+
+
+def dataset_version(path: Path) -> Optional[int]:
+    meta = dataset_meta(path)
+    return meta.get("version") if meta is not None else None
+
+
+def open_dataset(path: Path) -> MarketArrays:
+    """Map a dataset read-only; every column is a numpy.memmap."""
+    meta = json.loads((path / "meta.json").read_text())
+    if meta.get("version") != DATASET_VERSION:
+        raise ValueError(f"{path}: dataset version {meta.get('version')} != {DATASET_VERSION}, rebuild it")
+    arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in BAR_COLUMNS + FUNDING_COLUMNS}
+    return MarketArrays(**arrays)
+
+
+def build_dataset(symbol: str, timeframe: str, start: str, end: str, root: Optional[Path] = None,
+                  force: bool = False, mark: bool = True) -> Path:
+    """Download (through the partition cache) and align the three streams into a dataset.
+
+    Without `mark` the mark-price stream is not downloaded and the mark columns repeat the
+    last price; such a dataset is rebuilt when one with marks is asked for.
+    """
+    from backtest.data.downloader import (_range_ms, get_or_download_funding, get_or_download_klines,
+                                          get_or_download_mark)
+    from backtest.data.market import market_from_frames
+    from backtest.data.validators import validate_ohlcv
+
+    path = dataset_dir(symbol, timeframe, start, end, root)
+    meta = dataset_meta(path)
+    closed_at_ms = day_floor(_range_ms(start, end)[1]) + DAY_MS
+    if (meta is not None and not force and meta.get("version") == DATASET_VERSION
+            and meta.get("built_at", 0) * 1000 >= closed_at_ms and (meta.get("mark", True) or not mark)):
+        return path
+    klines, k_report = validate_ohlcv(get_or_download_klines(symbol, timeframe, start, end), timeframe, compact=False)
+    reports = {"klines": k_report}
+    mark_frame = None
+    if mark:
+        mark_frame, reports["mark"] = validate_ohlcv(get_or_download_mark(symbol, timeframe, start, end), timeframe,
+                                                     compact=False)
+    funding = get_or_download_funding(symbol, start, end)
+    for stream, report in reports.items():
+        if not report.clean:
+            get_logger("grid_trader.data").warning("%s %s %s: %s", symbol, timeframe, stream, report.issues())
+    quality = {stream: report.to_dict() for stream, report in reports.items()}
+    market = market_from_frames(klines, mark_frame, funding)
+    return write_dataset(market, path, symbol=symbol, timeframe=timeframe, start=start, end=end, mark=mark,
+                         quality=quality)
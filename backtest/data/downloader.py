@@ -1,16 +1,32 @@
 """
 Downloader for MEXC PI/USDT linear perpetual data.
 - Prefer official MEXC SDK; fallback to ccxt for klines/funding where needed.
-- Cache to backtest/data/cache/ as Parquet/CSV.
+- Cache to backtest/data/cache/ as day-partitioned Parquet (see partitions.py);
+  only days missing from the cache are fetched.
+- Only 1m klines/mark are downloaded; higher timeframes are resampled from them locally
+  and cached as their own partitions (see resample.py).
+- Trade prints go to their own zstd partitions (see trades.py); `download_trades` fetches
+  and writes one day at a time and returns nothing, since a month of ticks should be
+  replayed from disk with `trades.iter_trades`, not held as one frame.
 """
 from __future__ import annotations
+import json
 from pathlib import Path
-from typing import List, Optional
+from time import perf_counter
+from typing import Any, Callable, List, Optional, Sequence, Tuple
 import pandas as pd
 import ccxt
 
+from backtest.data.client import get_exchange
+from backtest.data.partitions import PartitionStore, day_floor, DAY_MS
+from backtest.data.resample import BASE_TIMEFRAME, cacheable, is_derived, resample_ohlcv
+from backtest.data.trades import SIDE_CODES, normalize_trades, trade_store
+from utils.profiling import Profiler, current_profiler
+from utils.time import timeframe_to_ms
+
 CACHE_DIR = Path(__file__).resolve().parent / "cache"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
+OHLCV_COLUMNS = ["ts", "open", "high", "low", "close", "volume"]
+FUNDING_COLUMNS = ["ts", "rate"]
 
 
 def _normalize_swap_symbol(ex: ccxt.Exchange, symbol: str) -> str:
@@ -24,22 +40,12 @@ def _normalize_swap_symbol(ex: ccxt.Exchange, symbol: str) -> str:
 
 
 def fetch_klines_ccxt(symbol: str, timeframe: str, since_ms: Optional[int] = None, end_ms: Optional[int] = None, limit: int = 1000) -> pd.DataFrame:
-    ex = ccxt.mexc()
-    # Ensure options has required keys to avoid KeyError
-    ex.options = {
-        **getattr(ex, "options", {}),
-        "defaultType": "swap",
-        "adjustForTimeDifference": False,
-    }
-    try:
-        ex.load_markets()
-    except Exception:
-        # proceed; some versions lazy-load on first fetch
-        pass
+    ex = get_exchange()
+    prof = current_profiler()
     symbol = _normalize_swap_symbol(ex, symbol)
     all_rows: list[list] = []
     # Reverse paginate using endTime windows (more reliable on MEXC)
-    ms_per_candle = 60_000 if timeframe == '1m' else 60_000
+    ms_per_candle = timeframe_to_ms(timeframe)
     window_ms = limit * ms_per_candle
     cursor_end = end_ms
     if cursor_end is None:
@@ -52,7 +58,10 @@ def fetch_klines_ccxt(symbol: str, timeframe: str, since_ms: Optional[int] = Non
         # Only include startTime if we have a lower bound; some APIs ignore but safe to send
         if since_ms is not None:
             params["startTime"] = w_start
+        t0 = perf_counter()
         ohlcv = ex.fetch_ohlcv(symbol, timeframe=timeframe, since=None, limit=limit, params=params)
+        if prof is not None:
+            record_page(prof, ex, ohlcv, perf_counter() - t0)
         if ohlcv:
             # Bound and append
             bounded = [row for row in ohlcv if (since_ms is None or row[0] >= since_ms) and (end_ms is None or row[0] <= end_ms)]
@@ -69,11 +78,38 @@ def fetch_klines_ccxt(symbol: str, timeframe: str, since_ms: Optional[int] = Non
             cursor_end = w_start - 1
         if cursor_end < (since_ms or 0):
             break
-    if not all_rows:
-        return pd.DataFrame(columns=["ts","open","high","low","close","volume"])    
-    # Deduplicate and sort
-    df = pd.DataFrame(all_rows, columns=["ts","open","high","low","close","volume"]).drop_duplicates(subset=["ts"]).sort_values("ts").reset_index(drop=True)
-    return df
+    return _finalize_ohlcv(all_rows)
+
+
+def record_page(prof: Profiler, ex: Any, page: Any, seconds: float) -> None:
+    """Count one fetched page; bytes come from the raw response when the client kept it."""
+    raw = getattr(ex, "last_http_response", None)
+    size = len(raw) if isinstance(raw, (str, bytes)) and raw else len(json.dumps(page, default=str))
+    prof.add_time("request", seconds)
+    prof.count("requests")
+    prof.count("rows", len(page) if page else 0)
+    prof.count("bytes", size)
+
+
+def _finalize_ohlcv(rows: List[list]) -> pd.DataFrame:
+    """Deduplicate and sort raw [ts, o, h, l, c, v] rows."""
+    if not rows:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+    return pd.DataFrame(rows, columns=OHLCV_COLUMNS).drop_duplicates(subset=["ts"]).sort_values("ts").reset_index(drop=True)
+
+
+def _finalize_funding(rows: List[dict]) -> pd.DataFrame:
+    if not rows:
+        return pd.DataFrame(columns=FUNDING_COLUMNS)
+    return pd.DataFrame(rows).drop_duplicates(subset=["ts"]).sort_values("ts").reset_index(drop=True)
+
+
+def _parse_funding_row(r: dict) -> Optional[dict]:
+    ts = r.get('timestamp') or r.get('datetime')
+    rate = r.get('fundingRate') or r.get('fundingRateDaily') or r.get('info', {}).get('fundingRate')
+    if ts is None or rate is None:
+        return None
+    return {"ts": ts, "rate": float(rate)}
 
 
 def save_df(df: pd.DataFrame, path: Path) -> None:
@@ -92,55 +128,116 @@ def load_cached(path: Path) -> Optional[pd.DataFrame]:
     return None
 
 
-def get_or_download_klines(symbol: str, timeframe: str, start: str, end: str, force: bool = False) -> pd.DataFrame:
-    # Normalize cache filename (avoid ':' in swap symbols)
-    safe_symbol = symbol.replace('/', '_').replace(':', '_')
-    cache_path = CACHE_DIR / f"{safe_symbol}_{timeframe}_{start}_{end}.parquet"
-    cached = load_cached(cache_path)
-    if (not force) and (cached is not None):
-        return cached
-    # Compute ms bounds in UTC
+def _range_ms(start: str, end: str) -> Tuple[int, int]:
+    """UTC ms bounds; a date-only end includes the whole day."""
     start_ms = int(pd.Timestamp(start, tz='UTC').timestamp() * 1000)
-    # For end, include the whole day: set to end-of-day 23:59:59 if date-only
     end_ts = pd.Timestamp(end)
     if end_ts.tzinfo is None:
         # assume date-only string; take 23:59:59 UTC of that date
         end_ms = int(pd.Timestamp(end + ' 23:59:59', tz='UTC').timestamp() * 1000)
     else:
         end_ms = int(end_ts.tz_convert('UTC').timestamp() * 1000)
-    df = fetch_klines_ccxt(symbol, timeframe, since_ms=start_ms, end_ms=end_ms)
-    # Final strict bound in case last page overshot
-    if not df.empty:
-        df = df[(df['ts'] >= start_ms) & (df['ts'] <= end_ms)].reset_index(drop=True)
-    save_df(df, cache_path)
-    return df
+    return start_ms, end_ms
+
+
+# fetches every missing [start_ms, end_ms] gap of a stream in one call, one frame per gap
+FetchGaps = Callable[[List[Tuple[int, int]]], List[pd.DataFrame]]
+
+
+def _per_gap(fetch: Callable[[int, int], pd.DataFrame]) -> FetchGaps:
+    return lambda gaps: [fetch(s, e) for s, e in gaps]
+
+
+def _get_or_download(symbol: str, stream: str, columns: Sequence[str], start: str, end: str, force: bool,
+                     fetch: FetchGaps) -> pd.DataFrame:
+    """Serve [start, end] from day partitions, fetching only the missing days."""
+    start_ms, end_ms = _range_ms(start, end)
+    return _get_or_download_ms(symbol, stream, columns, start_ms, end_ms, force, fetch)
+
+
+def _get_or_download_ms(symbol: str, stream: str, columns: Sequence[str], start_ms: int, end_ms: int, force: bool,
+                        fetch: FetchGaps) -> pd.DataFrame:
+    store = PartitionStore(CACHE_DIR, symbol, stream, columns)
+    gaps = [(day_floor(start_ms), day_floor(end_ms) + DAY_MS - 1)] if force else store.gaps(start_ms, end_ms)
+    fresh = []
+    for (g_start, g_end), df in zip(gaps, fetch(gaps) if gaps else []):
+        if df.empty:
+            # nothing at all for the gap (pre-listing, or unsupported stream): don't pin empty days
+            continue
+        df = df[(df['ts'] >= g_start) & (df['ts'] <= g_end)]
+        # rows of days still open are returned but not cached
+        fresh.append(store.write(df, g_start, g_end))
+    out = store.read(start_ms, end_ms)
+    fresh = [f for f in fresh if not f.empty]
+    if fresh:
+        out = pd.concat([out, *fresh]) if not out.empty else pd.concat(fresh)
+        out = out[(out['ts'] >= start_ms) & (out['ts'] <= end_ms)]
+        out = out.drop_duplicates(subset=["ts"]).sort_values("ts")
+    return out.reset_index(drop=True)
+
+
+def _get_or_resample(symbol: str, kind: str, timeframe: str, start: str, end: str, force: bool,
+                     base_fetch: FetchGaps) -> pd.DataFrame:
+    """Serve a derived timeframe by resampling the cached 1m stream (downloaded as needed)."""
+    start_ms, end_ms = _range_ms(start, end)
+
+    def derive(gaps: List[Tuple[int, int]]) -> List[pd.DataFrame]:
+        # one base read over the span of all gaps, so its missing days are fetched together
+        base = _get_or_download_ms(symbol, f"{kind}_{BASE_TIMEFRAME}", OHLCV_COLUMNS, gaps[0][0], gaps[-1][1],
+                                   force, base_fetch)
+        return [resample_ohlcv(base[(base["ts"] >= s) & (base["ts"] <= e)], timeframe) for s, e in gaps]
+
+    if not cacheable(timeframe):
+        # candles straddle day partitions; derive on the fly (edge buckets hold only in-range bars)
+        return derive([(start_ms, end_ms)])[0]
+    return _get_or_download_ms(symbol, f"{kind}_{timeframe}", OHLCV_COLUMNS, start_ms, end_ms, force, derive)
+
+
+def _concurrent_fetch(stream: str, symbol: str, timeframe: str, concurrency: int, rate_per_sec: float) -> FetchGaps:
+    from backtest.data.async_downloader import fetch_concurrent_gaps
+
+    return lambda gaps: fetch_concurrent_gaps(stream, symbol, gaps, timeframe=timeframe,
+                                              concurrency=concurrency, rate_per_sec=rate_per_sec)
+
+
+def get_or_download_klines(symbol: str, timeframe: str, start: str, end: str, force: bool = False,
+                           concurrency: int = 1, rate_per_sec: float = 10.0, resample: bool = True) -> pd.DataFrame:
+    """concurrency > 1 fetches gaps with the async windowed downloader. With `resample`,
+    timeframes above 1m are built from the cached 1m klines instead of downloaded."""
+    derived = resample and is_derived(timeframe)
+    tf = BASE_TIMEFRAME if derived else timeframe
+    if concurrency > 1:
+        fetch = _concurrent_fetch("klines", symbol, tf, concurrency, rate_per_sec)
+    else:
+        fetch = _per_gap(lambda s, e: fetch_klines_ccxt(symbol, tf, since_ms=s, end_ms=e))
+    if derived:
+        return _get_or_resample(symbol, "klines", timeframe, start, end, force, fetch)
+    return _get_or_download(symbol, f"klines_{timeframe}", OHLCV_COLUMNS, start, end, force, fetch)
 
 
 # ------------------------ Funding Rates ------------------------
 def fetch_funding_rates_ccxt(symbol: str, since_ms: Optional[int], end_ms: Optional[int], limit: int = 1000) -> pd.DataFrame:
-    ex = ccxt.mexc()
-    ex.options = {**getattr(ex, "options", {}), "defaultType": "swap", "adjustForTimeDifference": False}
-    try:
-        ex.load_markets()
-    except Exception:
-        pass
+    ex = get_exchange()
+    prof = current_profiler()
     market_symbol = _normalize_swap_symbol(ex, symbol)
     all_rows: list[dict] = []
     cursor = since_ms
     while True:
         params = {"contractType": "PERPETUAL"}
         # ccxt signature: fetchFundingRateHistory(symbol=None, since=None, limit=None, params={})
+        t0 = perf_counter()
         rows = ex.fetch_funding_rate_history(market_symbol, since=cursor, limit=limit, params=params)
+        if prof is not None:
+            record_page(prof, ex, rows, perf_counter() - t0)
         if not rows:
             break
         for r in rows:
-            ts = r.get('timestamp') or r.get('datetime')
-            rate = r.get('fundingRate') or r.get('fundingRateDaily') or r.get('info', {}).get('fundingRate')
-            if ts is None or rate is None:
+            row = _parse_funding_row(r)
+            if row is None:
                 continue
-            if end_ms is not None and ts > end_ms:
+            if end_ms is not None and row["ts"] > end_ms:
                 continue
-            all_rows.append({"ts": ts, "rate": float(rate)})
+            all_rows.append(row)
         last_ts = rows[-1].get('timestamp')
         if last_ts is None:
             break
@@ -150,44 +247,29 @@ def fetch_funding_rates_ccxt(symbol: str, since_ms: Optional[int], end_ms: Optio
         if cursor is not None and next_cursor <= cursor:
             break
         cursor = next_cursor
-    if not all_rows:
-        return pd.DataFrame(columns=["ts", "rate"])
-    df = pd.DataFrame(all_rows).drop_duplicates(subset=["ts"]).sort_values("ts").reset_index(drop=True)
-    return df
-
-
-def get_or_download_funding(symbol: str, start: str, end: str, force: bool = False) -> pd.DataFrame:
-    safe_symbol = symbol.replace('/', '_').replace(':', '_')
-    cache_path = CACHE_DIR / f"{safe_symbol}_funding_{start}_{end}.parquet"
-    cached = load_cached(cache_path)
-    if (not force) and (cached is not None):
-        return cached
-    start_ms = int(pd.Timestamp(start, tz='UTC').timestamp() * 1000)
-    end_ts = pd.Timestamp(end)
-    if end_ts.tzinfo is None:
-        end_ms = int(pd.Timestamp(end + ' 23:59:59', tz='UTC').timestamp() * 1000)
+    return _finalize_funding(all_rows)
+
+
+def get_or_download_funding(symbol: str, start: str, end: str, force: bool = False,
+                            concurrency: int = 1, rate_per_sec: float = 10.0) -> pd.DataFrame:
+    if concurrency > 1:
+        fetch = _concurrent_fetch("funding", symbol, "1m", concurrency, rate_per_sec)
     else:
-        end_ms = int(end_ts.tz_convert('UTC').timestamp() * 1000)
-    df = fetch_funding_rates_ccxt(symbol, start_ms, end_ms)
-    save_df(df, cache_path)
-    return df
+        fetch = _per_gap(lambda s, e: fetch_funding_rates_ccxt(symbol, s, e))
+    return _get_or_download(symbol, "funding", FUNDING_COLUMNS, start, end, force, fetch)
 
 
 # ------------------------ Mark Price OHLCV ------------------------
 def fetch_mark_ohlcv_ccxt(symbol: str, timeframe: str, since_ms: Optional[int], end_ms: Optional[int], limit: int = 1000) -> pd.DataFrame:
-    ex = ccxt.mexc()
-    ex.options = {**getattr(ex, "options", {}), "defaultType": "swap", "adjustForTimeDifference": False}
-    try:
-        ex.load_markets()
-    except Exception:
-        pass
+    ex = get_exchange()
+    prof = current_profiler()
     market_symbol = _normalize_swap_symbol(ex, symbol)
     all_rows: list[list] = []
     # Some exchanges implement fetchMarkOHLCV; ccxt exposes unified method name
     has_mark = getattr(ex, 'has', {}).get('fetchMarkOHLCV', False)
     if not has_mark:
         return pd.DataFrame(columns=["ts","open","high","low","close","volume"])  # graceful fallback
-    ms_per_candle = 60_000 if timeframe == '1m' else 60_000
+    ms_per_candle = timeframe_to_ms(timeframe)
     window_ms = limit * ms_per_candle
     cursor_end = end_ms or int(pd.Timestamp.utcnow().timestamp() * 1000)
     while True:
@@ -197,7 +279,10 @@ def fetch_mark_ohlcv_ccxt(symbol: str, timeframe: str, since_ms: Optional[int],
         params = {"contractType": "PERPETUAL", "endTime": cursor_end}
         if since_ms is not None:
             params["startTime"] = w_start
+        t0 = perf_counter()
         ohlcv = ex.fetch_mark_ohlcv(market_symbol, timeframe=timeframe, since=None, limit=limit, params=params)
+        if prof is not None:
+            record_page(prof, ex, ohlcv, perf_counter() - t0)
         if ohlcv:
             bounded = [row for row in ohlcv if (since_ms is None or row[0] >= since_ms) and (end_ms is None or row[0] <= end_ms)]
             all_rows.extend(bounded)
@@ -210,24 +295,62 @@ def fetch_mark_ohlcv_ccxt(symbol: str, timeframe: str, since_ms: Optional[int],
             cursor_end = w_start - 1
         if cursor_end < (since_ms or 0):
             break
-    if not all_rows:
-        return pd.DataFrame(columns=["ts","open","high","low","close","volume"])    
-    df = pd.DataFrame(all_rows, columns=["ts","open","high","low","close","volume"]).drop_duplicates(subset=["ts"]).sort_values("ts").reset_index(drop=True)
-    return df
-
-
-def get_or_download_mark(symbol: str, timeframe: str, start: str, end: str, force: bool = False) -> pd.DataFrame:
-    safe_symbol = symbol.replace('/', '_').replace(':', '_')
-    cache_path = CACHE_DIR / f"{safe_symbol}_mark_{timeframe}_{start}_{end}.parquet"
-    cached = load_cached(cache_path)
-    if (not force) and (cached is not None):
-        return cached
-    start_ms = int(pd.Timestamp(start, tz='UTC').timestamp() * 1000)
-    end_ts = pd.Timestamp(end)
-    if end_ts.tzinfo is None:
-        end_ms = int(pd.Timestamp(end + ' 23:59:59', tz='UTC').timestamp() * 1000)
+    return _finalize_ohlcv(all_rows)
+
+
+def get_or_download_mark(symbol: str, timeframe: str, start: str, end: str, force: bool = False,
+                         concurrency: int = 1, rate_per_sec: float = 10.0, resample: bool = True) -> pd.DataFrame:
+    derived = resample and is_derived(timeframe)
+    tf = BASE_TIMEFRAME if derived else timeframe
+    if concurrency > 1:
+        fetch = _concurrent_fetch("mark", symbol, tf, concurrency, rate_per_sec)
     else:
-        end_ms = int(end_ts.tz_convert('UTC').timestamp() * 1000)
-    df = fetch_mark_ohlcv_ccxt(symbol, timeframe, start_ms, end_ms)
-    save_df(df, cache_path)
-    return df
+        fetch = _per_gap(lambda s, e: fetch_mark_ohlcv_ccxt(symbol, tf, s, e))
+    if derived:
+        return _get_or_resample(symbol, "mark", timeframe, start, end, force, fetch)
+    return _get_or_download(symbol, f"mark_{timeframe}", OHLCV_COLUMNS, start, end, force, fetch)
+
+
+# ------------------------ Trades ------------------------
+def fetch_trades_ccxt(symbol: str, since_ms: int, end_ms: int, limit: int = 1000) -> pd.DataFrame:
+    """Trade prints in [since_ms, end_ms], paged forward by timestamp."""
+    ex = get_exchange()
+    prof = current_profiler()
+    market_symbol = _normalize_swap_symbol(ex, symbol)
+    rows: list[tuple] = []
+    cursor = since_ms
+    seen: set = set()  # ids already taken at the cursor's millisecond (pages overlap there)
+    while cursor <= end_ms:
+        t0 = perf_counter()
+        page = ex.fetch_trades(market_symbol, since=cursor, limit=limit, params={"endTime": end_ms})
+        if prof is not None:
+            record_page(prof, ex, page, perf_counter() - t0)
+        fresh = [t for t in page or [] if t.get("timestamp") is not None and t["timestamp"] <= end_ms
+                 and (t["timestamp"] > cursor or t.get("id") not in seen)]
+        if not fresh:
+            break
+        rows.extend((t["timestamp"], float(t["price"]), float(t["amount"]), SIDE_CODES.get(t.get("side"), 0))
+                    for t in fresh)
+        last = fresh[-1]["timestamp"]
+        seen = {t.get("id") for t in fresh if t["timestamp"] == last} | (seen if last == cursor else set())
+        if len(page) < limit:
+            break
+        cursor = last
+    return normalize_trades(pd.DataFrame(rows, columns=["ts", "price", "qty", "side"]))
+
+
+def download_trades(symbol: str, start: str, end: str, force: bool = False,
+                    fetch: Optional[Callable[[int, int], pd.DataFrame]] = None) -> int:
+    """Fill the trade partitions of [start, end] one missing day at a time; returns rows written."""
+    start_ms, end_ms = _range_ms(start, end)
+    store = trade_store(symbol, CACHE_DIR)
+    fetch = fetch or (lambda s, e: fetch_trades_ccxt(symbol, s, e))
+    days = store.days(start_ms, end_ms) if force else store.missing_days(start_ms, end_ms)
+    written = 0
+    for d in days:
+        df = fetch(d, d + DAY_MS - 1)
+        if df.empty:
+            continue
+        kept = store.write(df, d, d + DAY_MS - 1)
+        written += len(df) - len(kept)
+    return written
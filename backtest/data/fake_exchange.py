@@ -0,0 +1,154 @@
+"""
+Local stand-in for the ccxt MEXC swap client, serving synthetic candles, funding and trades.
+- Same method names/params the downloaders use (endTime-windowed OHLCV pages,
+  forward-paged funding history and trades), in async and sync flavours.
+- Deterministic prices derived from the timestamp, optional latency and injected
+  network errors, and a request counter for tests and benchmarks.
+"""
+from __future__ import annotations
+import asyncio
+import math
+import time
+from typing import Any, Dict, List, Optional
+import ccxt
+
+from utils.time import timeframe_to_ms
+
+FUNDING_INTERVAL_MS = 8 * 3_600_000
+TRADE_INTERVAL_MS = 2_000
+
+# Shaped like ccxt's parsed MEXC swap market (trimmed to the fields the repo reads).
+FAKE_MARKETS: Dict[str, Any] = {
+    "PI/USDT:USDT": {
+        "id": "PI_USDT", "symbol": "PI/USDT:USDT", "base": "PI", "quote": "USDT", "settle": "USDT",
+        "type": "swap", "swap": True, "linear": True, "contract": True, "contractSize": 1.0,
+        "precision": {"price": 0.0001, "amount": 1.0},
+        "limits": {"amount": {"min": 1.0, "max": 5_000_000.0}, "cost": {"min": None, "max": None}},
+        "info": {"symbol": "PI_USDT", "contractSize": 1, "priceUnit": 0.0001, "volUnit": 1, "minVol": 1,
+                 "maxVol": 5_000_000, "maxLeverage": 125, "maintenanceMarginRate": 0.004,
+                 "initialMarginRate": 0.008, "riskBaseVol": 500_000, "riskIncrVol": 500_000,
+                 "riskIncrMmr": 0.004, "riskIncrImr": 0.004, "riskLevelLimit": 5},
+    },
+}
+
+
+def synthetic_price(ts: int) -> float:
+    return 1.0 + 0.05 * math.sin(ts / 3.6e6) + 0.01 * math.sin(ts / 1.7e5)
+
+
+class FakeMexcSync:
+    def __init__(self, listing_ms: int = 0, latency_s: float = 0.0, fail_every: int = 0, mark_offset: float = 0.0005):
+        self.listing_ms = listing_ms
+        self.latency_s = latency_s
+        self.fail_every = fail_every
+        self.mark_offset = mark_offset
+        self.requests = 0
+        self.options: Dict[str, Any] = {}
+        self.has = {"fetchMarkOHLCV": True, "fetchFundingRateHistory": True}
+        self.markets: Dict[str, Any] = {}
+        self.market_loads = 0
+
+    def set_markets(self, markets: Dict[str, Any], currencies: Any = None) -> Dict[str, Any]:
+        self.markets = markets
+        return markets
+
+    def load_markets(self, reload: bool = False) -> Dict[str, Any]:
+        self.market_loads += 1
+        self.markets = FAKE_MARKETS
+        return self.markets
+
+    def _tick(self) -> None:
+        self.requests += 1
+        if self.fail_every and self.requests % self.fail_every == 0:
+            raise ccxt.NetworkError("fake: injected failure")
+
+    def _candles(self, timeframe: str, limit: int, params: Dict[str, Any], offset: float) -> List[list]:
+        tf = timeframe_to_ms(timeframe)
+        end = params.get("endTime")
+        if end is None:
+            end = int(time.time() * 1000)
+        start = params.get("startTime", end - limit * tf + 1)
+        first = max(start, self.listing_ms)
+        first = first + (-first % tf)
+        last = end - end % tf
+        if last < first:
+            return []
+        # like MEXC: the newest `limit` candles of the window
+        first = max(first, last - (limit - 1) * tf)
+        rows = []
+        for ts in range(first, last + 1, tf):
+            o = synthetic_price(ts) + offset
+            c = synthetic_price(ts + tf - 1) + offset
+            rows.append([ts, o, max(o, c) * 1.0005, min(o, c) * 0.9995, c, 1000.0])
+        return rows
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = "1m", since: Optional[int] = None,
+                    limit: int = 1000, params: Optional[Dict[str, Any]] = None) -> List[list]:
+        self._tick()
+        return self._candles(timeframe, limit, params or {}, 0.0)
+
+    def fetch_mark_ohlcv(self, symbol: str, timeframe: str = "1m", since: Optional[int] = None,
+                         limit: int = 1000, params: Optional[Dict[str, Any]] = None) -> List[list]:
+        self._tick()
+        return self._candles(timeframe, limit, params or {}, self.mark_offset)
+
+    def fetch_funding_rate_history(self, symbol: Optional[str] = None, since: Optional[int] = None,
+                                   limit: int = 1000, params: Optional[Dict[str, Any]] = None) -> List[dict]:
+        self._tick()
+        since = max(since or 0, self.listing_ms)
+        first = since + (-since % FUNDING_INTERVAL_MS)
+        now = int(time.time() * 1000)
+        rows = []
+        for k in range(limit):
+            ts = first + k * FUNDING_INTERVAL_MS
+            if ts > now:
+                break
+            rows.append({"timestamp": ts, "fundingRate": 0.0001 * math.sin(ts / 8.64e7)})
+        return rows
+
+    def fetch_trades(self, symbol: str, since: Optional[int] = None, limit: int = 1000,
+                     params: Optional[Dict[str, Any]] = None) -> List[dict]:
+        """One print every TRADE_INTERVAL_MS around the synthetic price, oldest first."""
+        self._tick()
+        since = max(since or 0, self.listing_ms)
+        end = (params or {}).get("endTime", int(time.time() * 1000))
+        first = since + (-since % TRADE_INTERVAL_MS)
+        rows = []
+        for ts in range(first, min(end, first + (limit - 1) * TRADE_INTERVAL_MS) + 1, TRADE_INTERVAL_MS):
+            k = ts // TRADE_INTERVAL_MS
+            rows.append({"id": str(k), "timestamp": ts, "price": round(synthetic_price(ts), 4),
+                         "amount": float(1 + k % 5), "side": "buy" if k % 3 else "sell"})
+        return rows
+
+    def close(self) -> None:
+        pass
+
+
+class FakeMexc(FakeMexcSync):
+    """Async flavour (mirrors ccxt.async_support)."""
+
+    async def load_markets(self, reload: bool = False) -> Dict[str, Any]:
+        return FakeMexcSync.load_markets(self, reload)
+
+    async def _pause(self) -> None:
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+
+    async def fetch_ohlcv(self, *args: Any, **kwargs: Any) -> List[list]:
+        await self._pause()
+        return FakeMexcSync.fetch_ohlcv(self, *args, **kwargs)
+
+    async def fetch_mark_ohlcv(self, *args: Any, **kwargs: Any) -> List[list]:
+        await self._pause()
+        return FakeMexcSync.fetch_mark_ohlcv(self, *args, **kwargs)
+
+    async def fetch_funding_rate_history(self, *args: Any, **kwargs: Any) -> List[dict]:
+        await self._pause()
+        return FakeMexcSync.fetch_funding_rate_history(self, *args, **kwargs)
+
+    async def fetch_trades(self, *args: Any, **kwargs: Any) -> List[dict]:
+        await self._pause()
+        return FakeMexcSync.fetch_trades(self, *args, **kwargs)
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,77 @@
+"""
+Aligned market arrays consumed by the simulator and optimizer.
+- One bar timeline (last-price OHLCV) with mark-price OHLC aligned onto it.
+- Funding events kept as their own (ts, rate) arrays, pre-indexed to the bar they fall in.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, fields
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+
+BAR_COLUMNS = ("ts", "open", "high", "low", "close", "volume", "mark_open", "mark_high", "mark_low", "mark_close")
+FUNDING_COLUMNS = ("funding_ts", "funding_rate", "funding_idx")
+
+
+@dataclass
+class MarketArrays:
+    ts: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    mark_open: np.ndarray
+    mark_high: np.ndarray
+    mark_low: np.ndarray
+    mark_close: np.ndarray
+    funding_ts: np.ndarray
+    funding_rate: np.ndarray
+    funding_idx: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+    def slice(self, start: int, stop: Optional[int] = None) -> "MarketArrays":
+        """Bars [start, stop) with the funding events that fall inside them (bar columns are views)."""
+        stop = len(self) if stop is None else stop
+        bars = {c: getattr(self, c)[start:stop] for c in BAR_COLUMNS}
+        lo = np.searchsorted(self.funding_idx, start, side="left")
+        hi = np.searchsorted(self.funding_idx, stop, side="left")
+        return MarketArrays(**bars, funding_ts=self.funding_ts[lo:hi], funding_rate=self.funding_rate[lo:hi],
+                            funding_idx=self.funding_idx[lo:hi] - start)
+
+
+def funding_bar_index(bar_ts: np.ndarray, funding_ts: np.ndarray) -> np.ndarray:
+    """Index of the bar each funding event falls in (bar open <= event); -1 before the first bar."""
+    return np.searchsorted(bar_ts, funding_ts, side="right").astype(np.int64) - 1
+
+
+def market_from_frames(klines: pd.DataFrame, mark: Optional[pd.DataFrame] = None,
+                       funding: Optional[pd.DataFrame] = None) -> MarketArrays:
+    """Align mark OHLC onto the kline timeline (forward-filled, last price where mark is missing)."""
+    k = klines.drop_duplicates(subset=["ts"]).sort_values("ts").reset_index(drop=True)
+    ts = k["ts"].to_numpy(dtype=np.int64)
+    cols = {c: k[c].to_numpy(dtype=np.float64) for c in ("open", "high", "low", "close", "volume")}
+    if mark is not None and not mark.empty:
+        m = mark.drop_duplicates(subset=["ts"]).set_index("ts").sort_index()
+        m = m.reindex(ts).ffill()
+        for c in ("open", "high", "low", "close"):
+            v = m[c].to_numpy(dtype=np.float64)
+            cols[f"mark_{c}"] = np.where(np.isnan(v), cols[c], v)
+    else:
+        for c in ("open", "high", "low", "close"):
+            cols[f"mark_{c}"] = cols[c].copy()
+    if funding is not None and not funding.empty:
+        f = funding.drop_duplicates(subset=["ts"]).sort_values("ts")
+        f_ts = f["ts"].to_numpy(dtype=np.int64)
+        f_rate = f["rate"].to_numpy(dtype=np.float64)
+    else:
+        f_ts = np.empty(0, dtype=np.int64)
+        f_rate = np.empty(0, dtype=np.float64)
+    f_idx = funding_bar_index(ts, f_ts)
+    keep = f_idx >= 0
+    return MarketArrays(ts=ts, **cols, funding_ts=f_ts[keep], funding_rate=f_rate[keep], funding_idx=f_idx[keep])
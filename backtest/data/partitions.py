@@ -0,0 +1,106 @@
+"""
+Day-partitioned Parquet store for downloaded streams.
+- Layout: <root>/<safe_symbol>/<stream>/<YYYY-MM-DD>.parquet, one file per UTC day.
+- A partition file means the day was fetched; it may be empty (no trading that day).
+- Days that have not closed yet are never persisted, so they are refetched next time.
+- Compression and row-group size are per store: large streams (trades) use zstd and
+  row groups small enough to be read back one at a time (`iter_batches`).
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DAY_MS = 86_400_000
+
+
+def safe_symbol(symbol: str) -> str:
+    return symbol.replace('/', '_').replace(':', '_')
+
+
+def day_floor(ms: int) -> int:
+    return ms - ms % DAY_MS
+
+
+def day_label(day_ms: int) -> str:
+    return pd.Timestamp(day_ms, unit="ms", tz="UTC").strftime("%Y-%m-%d")
+
+
+def now_ms() -> int:
+    return int(pd.Timestamp.now(tz="UTC").timestamp() * 1000)
+
+
+class PartitionStore:
+    def __init__(self, root: Path, symbol: str, stream: str, columns: Sequence[str], compression: str = "snappy",
+                 row_group_size: Optional[int] = None):
+        self.dir = root / safe_symbol(symbol) / stream
+        self.columns = list(columns)
+        self.compression = compression
+        self.row_group_size = row_group_size
+
+    def path_for(self, day_ms: int) -> Path:
+        return self.dir / f"{day_label(day_ms)}.parquet"
+
+    def days(self, start_ms: int, end_ms: int) -> List[int]:
+        return list(range(day_floor(start_ms), end_ms + 1, DAY_MS))
+
+    def missing_days(self, start_ms: int, end_ms: int) -> List[int]:
+        return [d for d in self.days(start_ms, end_ms) if not self.path_for(d).exists()]
+
+    def gaps(self, start_ms: int, end_ms: int) -> List[Tuple[int, int]]:
+        """Missing days merged into contiguous [first_ms, last_ms] ranges, whole days each."""
+        out: List[Tuple[int, int]] = []
+        for d in self.missing_days(start_ms, end_ms):
+            if out and out[-1][1] + 1 == d:
+                out[-1] = (out[-1][0], d + DAY_MS - 1)
+            else:
+                out.append((d, d + DAY_MS - 1))
+        return out
+
+    def write(self, df: pd.DataFrame, start_ms: int, end_ms: int, now: Optional[int] = None) -> pd.DataFrame:
+        """Persist every closed day of [start_ms, end_ms] from `df`; returns the rows not persisted."""
+        now = now_ms() if now is None else now
+        self.dir.mkdir(parents=True, exist_ok=True)
+        day_of = df["ts"].astype("int64") // DAY_MS * DAY_MS if not df.empty else None
+        kept = []
+        for d in self.days(start_ms, end_ms):
+            part = df[day_of == d] if day_of is not None else df.iloc[0:0]
+            if d + DAY_MS > now:
+                kept.append(part)
+                continue
+            tmp = self.path_for(d).with_suffix(".tmp")
+            part.reset_index(drop=True).reindex(columns=self.columns).to_parquet(
+                tmp, index=False, compression=self.compression, row_group_size=self.row_group_size)
+            tmp.replace(self.path_for(d))
+        return pd.concat(kept) if kept else df.iloc[0:0]
+
+    def read(self, start_ms: int, end_ms: int) -> pd.DataFrame:
+        tables = []
+        for d in self.days(start_ms, end_ms):
+            p = self.path_for(d)
+            if p.exists():
+                t = pq.read_table(p)
+                if t.num_rows:
+                    tables.append(t)
+        if not tables:
+            return pd.DataFrame(columns=self.columns)
+        df = pa.concat_tables(tables, promote_options="default").to_pandas()
+        return df[(df["ts"] >= start_ms) & (df["ts"] <= end_ms)].reset_index(drop=True)
+
+    def iter_batches(self, start_ms: int, end_ms: int, batch_rows: int) -> Iterator[pa.RecordBatch]:
+        """Rows of [start_ms, end_ms] in time order, at most `batch_rows` per batch, reading one
+        row group at a time (a whole day is never materialized)."""
+        for d in self.days(start_ms, end_ms):
+            p = self.path_for(d)
+            if not p.exists():
+                continue
+            edge = d < start_ms or d + DAY_MS - 1 > end_ms
+            for batch in pq.ParquetFile(p).iter_batches(batch_size=batch_rows, columns=self.columns):
+                if edge:
+                    ts = batch.column("ts").to_numpy()
+                    lo, hi = ts.searchsorted(start_ms, "left"), ts.searchsorted(end_ms, "right")
+                    batch = batch.slice(lo, hi - lo)
+                if batch.num_rows:
+                    yield batch
@@ -0,0 +1,63 @@
+"""
+Local resampling of cached base (1m) OHLCV into higher timeframes.
+- Buckets are aligned on multiples of the target timeframe since the epoch (UTC), the
+  way exchanges label candles: open of the first base bar, max high, min low, close of
+  the last base bar, summed volume.
+- Gaps: a bucket with some base bars missing is built from the bars present; a bucket
+  with none is not emitted (no trades, no candle), unless `fill_gaps`, which emits a
+  flat candle at the previous close with zero volume.
+- Timeframes that divide a UTC day are cached as their own day partitions by the
+  downloader, so each derived timeframe is computed once per day.
+"""
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+from backtest.data.partitions import DAY_MS
+from utils.time import timeframe_to_ms
+
+BASE_TIMEFRAME = "1m"
+OHLCV_COLUMNS = ["ts", "open", "high", "low", "close", "volume"]
+
+
+def is_derived(timeframe: str) -> bool:
+    """True when `timeframe` can be built from base bars (a whole multiple of them)."""
+    tf, base = timeframe_to_ms(timeframe), timeframe_to_ms(BASE_TIMEFRAME)
+    return tf > base and tf % base == 0
+
+
+def cacheable(timeframe: str) -> bool:
+    """Derived candles never straddle a day partition when the timeframe divides a day."""
+    return DAY_MS % timeframe_to_ms(timeframe) == 0
+
+
+def resample_ohlcv(df: pd.DataFrame, timeframe: str, fill_gaps: bool = False) -> pd.DataFrame:
+    """Aggregate OHLCV rows (sorted or not, base resolution) into `timeframe` candles."""
+    if df.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+    tf = timeframe_to_ms(timeframe)
+    base = df.drop_duplicates(subset=["ts"]).sort_values("ts")
+    ts = base["ts"].to_numpy(dtype=np.int64)
+    bucket = ts - ts % tf
+    start = np.flatnonzero(np.concatenate(([True], bucket[1:] != bucket[:-1])))
+    last = np.concatenate((start[1:], [len(ts)])) - 1
+    cols = {c: base[c].to_numpy(dtype=np.float64) for c in ("open", "high", "low", "close", "volume")}
+    out = pd.DataFrame({
+        "ts": bucket[start],
+        "open": cols["open"][start],
+        "high": np.maximum.reduceat(cols["high"], start),
+        "low": np.minimum.reduceat(cols["low"], start),
+        "close": cols["close"][last],
+        "volume": np.add.reduceat(cols["volume"], start),
+    })
+    if fill_gaps and len(out) > 1:
+        full = np.arange(out["ts"].iloc[0], out["ts"].iloc[-1] + 1, tf, dtype=np.int64)
+        out = out.set_index("ts").reindex(full)
+        missing = out["close"].isna()
+        close = out["close"].ffill()
+        for c in ("open", "high", "low"):
+            out[c] = out[c].where(~missing, close)
+        out["close"] = close
+        out["volume"] = out["volume"].fillna(0.0)
+        out = out.rename_axis("ts").reset_index()
+    return out
@@ -0,0 +1,94 @@
+"""
+Synthetic 1m market data for tests and benchmarks.
+- Price paths are geometric Brownian motion, optionally with Poisson jumps
+  (Merton jump-diffusion); each bar's high/low is drawn beyond its open/close.
+- Mark price tracks last price with a small mean-reverting basis; funding every 8h
+  follows the basis.
+- `synthetic_frames` returns downloader-shaped DataFrames (klines, mark, funding);
+  `synthetic_market` aligns them into MarketArrays.
+- `synthetic_trades` spreads prints along each bar's O->L->H->C (O->H->L->C) path, on a
+  price tick, so the bars rebuilt from them match the candles up to rounding.
+"""
+from __future__ import annotations
+from typing import Tuple
+import numpy as np
+import pandas as pd
+
+from backtest.data.market import MarketArrays, market_from_frames
+
+BAR_MS = 60_000
+BARS_PER_DAY = 1440
+FUNDING_INTERVAL_MS = 8 * 3_600_000
+_MINUTES_PER_YEAR = 525_600
+
+
+def synthetic_frames(days: float = 1.0, seed: int = 0, start_ms: int = 1_704_067_200_000, price: float = 1.0,
+                     sigma: float = 0.8, drift: float = 0.0, jump_rate: float = 0.0, jump_sigma: float = 0.02,
+                     basis_bps: float = 5.0) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """(klines, mark, funding) for `days` of 1m bars.
+
+    `sigma`/`drift` are annualized; `jump_rate` is the expected number of jumps per day,
+    each a normal log-return with stdev `jump_sigma`.
+    """
+    rng = np.random.default_rng(seed)
+    n = max(1, int(round(days * BARS_PER_DAY)))
+    dt = 1.0 / _MINUTES_PER_YEAR
+    log_r = rng.normal((drift - 0.5 * sigma * sigma) * dt, sigma * np.sqrt(dt), n)
+    if jump_rate > 0:
+        jumps = rng.poisson(jump_rate / BARS_PER_DAY, n)
+        hit = jumps > 0
+        log_r[hit] += rng.normal(0.0, jump_sigma, int(hit.sum())) * np.sqrt(jumps[hit])
+    close = price * np.exp(np.cumsum(log_r))
+    open_ = np.concatenate(([price], close[:-1]))
+    wick = np.abs(rng.normal(0.0, sigma * np.sqrt(dt), (2, n)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    ts = start_ms + np.arange(n, dtype=np.int64) * BAR_MS
+    volume = rng.gamma(2.0, 500.0, n)
+    klines = pd.DataFrame({"ts": ts, "open": open_, "high": high, "low": low, "close": close, "volume": volume})
+
+    # AR(1) basis in bps, so mark stays within a few bps of last
+    shocks = rng.normal(0.0, basis_bps * 0.1, n)
+    basis = np.empty(n)
+    b = 0.0
+    for k, shock in enumerate(shocks.tolist()):
+        b = 0.99 * b + shock
+        basis[k] = b
+    scale = 1 + basis / 10_000
+    mark = pd.DataFrame({"ts": ts, "open": open_ * scale, "high": high * scale, "low": low * scale,
+                         "close": close * scale, "volume": 0.0})
+
+    f_ts = np.arange(start_ms + (-start_ms % FUNDING_INTERVAL_MS), ts[-1] + 1,
+                     FUNDING_INTERVAL_MS, dtype=np.int64)
+    idx = np.searchsorted(ts, f_ts, side="right") - 1
+    rate = np.clip(0.0001 + basis[idx] / 10_000 * 0.1, -0.003, 0.003)
+    funding = pd.DataFrame({"ts": f_ts, "rate": rate})
+    return klines, mark, funding
+
+
+def synthetic_market(days: float = 1.0, seed: int = 0, **kwargs: float) -> MarketArrays:
+    return market_from_frames(*synthetic_frames(days, seed, **kwargs))
+
+
+def synthetic_trades(market: MarketArrays, per_bar: int = 20, seed: int = 0, tick: float = 1e-4,
+                     bounce: int = 2) -> pd.DataFrame:
+    """`per_bar` prints per bar (trades.TRADE_COLUMNS), walking the bar's intra-bar path with up
+    to `bounce` ticks of noise (kept inside the bar's range), so prices revisit levels the way
+    prints bouncing between bid and ask do."""
+    rng = np.random.default_rng(seed)
+    o, h, l, c = (np.asarray(a, dtype=np.float64) for a in (market.open, market.high, market.low, market.close))
+    up = c >= o
+    legs = np.stack([o, np.where(up, l, h), np.where(up, h, l), c], axis=1)  # (n, 4)
+    pos = np.linspace(0.0, 3.0, per_bar)  # along the three legs
+    k = np.minimum(pos.astype(np.int64), 2)
+    frac = pos - k
+    price = legs[:, k] + (legs[:, k + 1] - legs[:, k]) * frac
+    n = len(o)
+    if bounce:
+        noise = rng.integers(-bounce, bounce + 1, (n, per_bar)) * tick
+        noise[:, [0, -1]] = 0.0  # keep open and close
+        price = np.clip(price + noise, l[:, None], h[:, None])
+    ts = np.asarray(market.ts, dtype=np.int64)[:, None] + (np.arange(per_bar) * (BAR_MS // per_bar))[None, :]
+    return pd.DataFrame({"ts": ts.ravel(), "price": np.round(price.ravel() / tick) * tick,
+                         "qty": rng.gamma(1.5, 20.0, n * per_bar).round() + 1,
+                         "side": rng.choice(np.array([-1, 1], dtype=np.int8), n * per_bar)})
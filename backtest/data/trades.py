@@ -0,0 +1,99 @@
+"""
+Trade prints: storage layout and chunked replay.
+- Trades live in the partition cache like the other streams (one Parquet file per UTC
+  day, see partitions.py), zstd-compressed with fixed dtypes (int64 ts, float64
+  price/qty, int8 side) and row groups of TRADE_ROW_GROUP rows.
+- `side` is the taker side: 1 buy (lifted an ask), -1 sell (hit a bid), 0 unknown.
+- `iter_trades` yields `TradeChunk`s of at most `chunk_rows` trades, reading one row group
+  at a time, so replaying a month of ticks holds a chunk in memory, not the month.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from backtest.data.partitions import PartitionStore
+
+TRADE_COLUMNS = ["ts", "price", "qty", "side"]
+TRADES_STREAM = "trades"
+TRADE_ROW_GROUP = 1 << 18
+DEFAULT_CHUNK_ROWS = 1 << 18
+SIDE_CODES = {"buy": 1, "sell": -1}
+
+
+@dataclass(slots=True)
+class TradeChunk:
+    ts: np.ndarray     # int64 ms, ascending
+    price: np.ndarray  # float64
+    qty: np.ndarray    # float64, contracts
+    side: np.ndarray   # int8 taker side
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    @classmethod
+    def from_batch(cls, batch: pa.RecordBatch) -> "TradeChunk":
+        col = batch.column
+        return cls(col("ts").to_numpy().astype(np.int64, copy=False),
+                   col("price").to_numpy().astype(np.float64, copy=False),
+                   col("qty").to_numpy().astype(np.float64, copy=False),
+                   col("side").to_numpy().astype(np.int8, copy=False))
+
+
+def normalize_trades(df: pd.DataFrame) -> pd.DataFrame:
+    """TRADE_COLUMNS with the stored dtypes, sorted by ts (stable: same-ms prints keep their order)."""
+    if df.empty:
+        return pd.DataFrame({"ts": np.empty(0, np.int64), "price": np.empty(0), "qty": np.empty(0),
+                             "side": np.empty(0, np.int8)})
+    out = pd.DataFrame({"ts": df["ts"].to_numpy(dtype=np.int64), "price": df["price"].to_numpy(dtype=np.float64),
+                        "qty": df["qty"].to_numpy(dtype=np.float64), "side": df["side"].to_numpy(dtype=np.int8)})
+    if not out["ts"].is_monotonic_increasing:
+        out = out.sort_values("ts", kind="stable").reset_index(drop=True)
+    return out
+
+
+def trade_store(symbol: str, root: Optional[Path] = None) -> PartitionStore:
+    if root is None:
+        from backtest.data.downloader import CACHE_DIR
+
+        root = CACHE_DIR
+    return PartitionStore(root, symbol, TRADES_STREAM, TRADE_COLUMNS, compression="zstd",
+                          row_group_size=TRADE_ROW_GROUP)
+
+
+def iter_trades(store: PartitionStore, start_ms: int, end_ms: int,
+                chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[TradeChunk]:
+    """Cached trades of [start_ms, end_ms] in time order, at most `chunk_rows` per chunk."""
+    for batch in store.iter_batches(start_ms, end_ms, chunk_rows):
+        yield TradeChunk.from_batch(batch)
+
+
+def chunk_frame(df: pd.DataFrame, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterable[TradeChunk]:
+    """In-memory trades (e.g. from a fetch) as the same chunks `iter_trades` yields."""
+    df = normalize_trades(df)
+    for k in range(0, len(df), chunk_rows):
+        part = df.iloc[k:k + chunk_rows]
+        yield TradeChunk(part["ts"].to_numpy(), part["price"].to_numpy(), part["qty"].to_numpy(),
+                         part["side"].to_numpy())
+
+
+def trades_to_bars(chunks: Iterable[TradeChunk], timeframe_ms: int) -> pd.DataFrame:
+    """OHLCV bars of the prints (bars without trades are absent), built chunk by chunk."""
+    parts = []
+    for chunk in chunks:
+        frame = pd.DataFrame({"bucket": chunk.ts // timeframe_ms * timeframe_ms, "price": chunk.price,
+                              "qty": chunk.qty})
+        g = frame.groupby("bucket", sort=True)
+        parts.append(pd.DataFrame({"open": g["price"].first(), "high": g["price"].max(), "low": g["price"].min(),
+                                   "close": g["price"].last(), "volume": g["qty"].sum()}))
+    if not parts:
+        return pd.DataFrame(columns=["ts", "open", "high", "low", "close", "volume"])
+    bars = pd.concat(parts)
+    # a bar split across two chunks appears twice; merge the pieces
+    g = bars.groupby(level=0, sort=True)
+    out = pd.DataFrame({"open": g["open"].first(), "high": g["high"].max(), "low": g["low"].min(),
+                        "close": g["close"].last(), "volume": g["volume"].sum()})
+    return out.rename_axis("ts").reset_index()
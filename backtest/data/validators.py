@@ -1,14 +1,249 @@
+"""
+OHLCV validation in one pass per chunk.
+- `OhlcvValidator.feed` takes chunks in time order (day partitions, slices of a frame) and
+  carries the last timestamp/close across them, so a multi-year history never has to be
+  validated as one frame.
+- Per chunk: non-numeric or non-positive rows are dropped, rows are sorted if needed,
+  duplicates (and rows behind what was already emitted) are dropped, candles with
+  high < max(open, close) or low > min(open, close) are repaired, dropped or only flagged,
+  and missing bars are counted (and optionally filled with flat zero-volume candles at the
+  previous close, as resample.py does).
+- `compact` emits int64 ts, float32 volume and float32 prices when every price of the chunk
+  survives the round trip at its decimal precision (`QualityReport.price_decimals`;
+  `np.round(p.astype(np.float64), decimals)` gives back the exact prices).
+- Everything found is counted in a `QualityReport`.
+"""
 from __future__ import annotations
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Iterator, Literal, Optional, Tuple
+import numpy as np
 import pandas as pd
 
+from utils.time import timeframe_to_ms
 
-def validate_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+OHLCV_COLUMNS = ["ts", "open", "high", "low", "close", "volume"]
+PRICE_COLUMNS = ("open", "high", "low", "close")
+BadCandles = Literal["repair", "drop", "flag"]
+DEFAULT_CHUNK_ROWS = 1_000_000
+_MAX_DECIMALS = 8
+
+
+@dataclass
+class QualityReport:
+    rows_in: int = 0
+    rows_out: int = 0
+    non_numeric: int = 0  # unparseable or missing values, dropped
+    non_positive: int = 0  # price <= 0 or volume < 0, dropped
+    reordered: int = 0  # rows that arrived out of order within a chunk (sorted, kept)
+    duplicates: int = 0  # repeated ts, or ts at/behind rows already emitted (dropped)
+    inconsistent: int = 0  # high < max(open, close) or low > min(open, close)
+    repaired: int = 0
+    dropped_bad: int = 0
+    misaligned: int = 0  # ts not on a multiple of the timeframe
+    gaps: int = 0  # runs of missing bars
+    missing_bars: int = 0
+    filled_bars: int = 0
+    first_ts: Optional[int] = None
+    last_ts: Optional[int] = None
+    price_dtype: Optional[str] = None
+    price_decimals: Optional[int] = None
+
+    def issues(self) -> Dict[str, int]:
+        """Non-zero problem counters."""
+        names = ("non_numeric", "non_positive", "duplicates", "inconsistent", "misaligned", "gaps", "missing_bars")
+        return {n: getattr(self, n) for n in names if getattr(self, n)}
+
+    @property
+    def clean(self) -> bool:
+        """Nothing was dropped, inconsistent, misaligned or missing."""
+        return not self.issues()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _exact_at(x: np.ndarray, d: int) -> bool:
+    s = x * 10.0 ** d
+    # a few thousand ulps of slack for the decimal -> binary error of x and of the product
+    return bool(np.all(np.abs(s - np.rint(s)) <= 1e-12 * np.maximum(np.abs(s), 1.0)))
+
+
+def _price_decimals(x: np.ndarray) -> Optional[int]:
+    """Fewest decimals (up to 8) that represent every value of `x`; None if there are more."""
+    # a prefix rules out the small precisions cheaply; only candidates get the full pass
+    head = x[:1024]
+    for d in range(_MAX_DECIMALS + 1):
+        if _exact_at(head, d) and _exact_at(x, d):
+            return d
+    return None
+
+
+def _fits_float32(x: np.ndarray, decimals: int) -> bool:
+    back = np.round(x.astype(np.float32).astype(np.float64), decimals)
+    return bool(np.array_equal(back, np.round(x, decimals)))
+
+
+def _column(chunk: pd.DataFrame, name: str) -> np.ndarray:
+    col = chunk[name]
+    if not pd.api.types.is_numeric_dtype(col) or pd.api.types.is_bool_dtype(col):
+        col = pd.to_numeric(col, errors="coerce")
+    return col.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+class OhlcvValidator:
+    """Streaming validator; feed chunks in time order, read `report` at the end."""
+
+    def __init__(self, timeframe: Optional[str] = None, fill_gaps: bool = False, bad: BadCandles = "repair",
+                 compact: bool = True):
+        if bad not in ("repair", "drop", "flag"):
+            raise ValueError(f"bad must be repair, drop or flag, not {bad!r}")
+        if fill_gaps and timeframe is None:
+            raise ValueError("fill_gaps needs the timeframe")
+        self.tf = timeframe_to_ms(timeframe) if timeframe is not None else None
+        self.fill_gaps = fill_gaps
+        self.bad = bad
+        self.compact = compact
+        self.report = QualityReport()
+        self._last_ts: Optional[int] = None
+        self._last_close = 0.0
+
+    def feed(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Validate one chunk; returns the OHLCV columns that pass (possibly empty)."""
+        rep = self.report
+        rep.rows_in += len(chunk)
+        if chunk.empty:
+            return self._frame(np.empty(0, dtype=np.int64), {c: np.empty(0) for c in OHLCV_COLUMNS[1:]})
+        ts_f = _column(chunk, "ts")
+        cols = {c: _column(chunk, c) for c in OHLCV_COLUMNS[1:]}
+
+        finite = np.isfinite(ts_f)
+        for v in cols.values():
+            finite &= np.isfinite(v)
+        positive = cols["volume"] >= 0
+        for c in PRICE_COLUMNS:
+            positive &= cols[c] > 0
+        rep.non_numeric += int((~finite).sum())
+        rep.non_positive += int((finite & ~positive).sum())
+        keep = finite & positive
+        ts = ts_f.astype(np.int64) if keep.all() else ts_f[keep].astype(np.int64)
+        if not keep.all():
+            cols = {c: v[keep] for c, v in cols.items()}
+
+        if len(ts) > 1 and np.any(ts[1:] < ts[:-1]):
+            order = np.argsort(ts, kind="stable")
+            rep.reordered += int(np.count_nonzero(order != np.arange(len(ts))))
+            ts = ts[order]
+            cols = {c: v[order] for c, v in cols.items()}
+        drop = np.zeros(len(ts), dtype=bool)
+        drop[1:] = ts[1:] == ts[:-1]
+        if self._last_ts is not None:
+            drop |= ts <= self._last_ts
+        if drop.any():
+            rep.duplicates += int(drop.sum())
+            ts = ts[~drop]
+            cols = {c: v[~drop] for c, v in cols.items()}
+
+        o, h, l, c = cols["open"], cols["high"], cols["low"], cols["close"]
+        top = np.maximum(o, c)
+        bottom = np.minimum(o, c)
+        bad = (h < top) | (l > bottom)
+        n_bad = int(bad.sum())
+        if n_bad:
+            rep.inconsistent += n_bad
+            if self.bad == "repair":
+                cols["high"] = np.maximum(h, top)
+                cols["low"] = np.minimum(l, bottom)
+                rep.repaired += n_bad
+            elif self.bad == "drop":
+                rep.dropped_bad += n_bad
+                ts = ts[~bad]
+                cols = {k: v[~bad] for k, v in cols.items()}
+
+        if self.tf is not None and len(ts):
+            ts, cols = self._gaps(ts, cols)
+        if len(ts):
+            self._last_ts = int(ts[-1])
+            self._last_close = float(cols["close"][-1])
+            if rep.first_ts is None:
+                rep.first_ts = int(ts[0])
+            rep.last_ts = self._last_ts
+        rep.rows_out += len(ts)
+        return self._frame(ts, cols)
+
+    def _gaps(self, ts: np.ndarray, cols: Dict[str, np.ndarray]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        tf = self.tf
+        rep = self.report
+        rep.misaligned += int(np.count_nonzero(ts % tf))
+        prev_ts = np.empty(len(ts), dtype=np.int64)
+        prev_ts[1:] = ts[:-1]
+        prev_ts[0] = ts[0] - tf if self._last_ts is None else self._last_ts
+        missing = (ts - prev_ts - 1) // tf
+        at = np.flatnonzero(missing > 0)
+        if not at.size:
+            return ts, cols
+        m = missing[at]
+        rep.gaps += len(at)
+        rep.missing_bars += int(m.sum())
+        if not self.fill_gaps:
+            return ts, cols
+        prev_close = np.empty(len(ts))
+        prev_close[1:] = cols["close"][:-1]
+        prev_close[0] = self._last_close
+        # bar j (1-based) of the gap before row k sits at prev_ts[k] + j * tf
+        pos = np.repeat(at, m)
+        step = np.arange(int(m.sum())) - np.repeat(np.cumsum(m) - m, m) + 1
+        fill_ts = prev_ts[pos] + step * tf
+        flat = prev_close[pos]
+        rep.filled_bars += len(pos)
+        out = {c: np.insert(v, pos, 0.0 if c == "volume" else flat) for c, v in cols.items()}
+        return np.insert(ts, pos, fill_ts), out
+
+    def _frame(self, ts: np.ndarray, cols: Dict[str, np.ndarray]) -> pd.DataFrame:
+        rep = self.report
+        price_dtype = np.float64
+        if self.compact:
+            decimals = [_price_decimals(cols[c]) for c in PRICE_COLUMNS] if len(ts) else []
+            if len(ts) and None not in decimals:
+                d = max(decimals)
+                if all(_fits_float32(cols[c], d) for c in PRICE_COLUMNS):
+                    price_dtype = np.float32
+                    rep.price_decimals = max(d, rep.price_decimals or 0)
+        if len(ts):
+            name = np.dtype(price_dtype).name
+            rep.price_dtype = name if rep.price_dtype in (None, name) else "float64"
+        data = {"ts": ts.astype(np.int64, copy=False)}
+        for c in PRICE_COLUMNS:
+            data[c] = cols[c].astype(price_dtype, copy=False)
+        data["volume"] = cols["volume"].astype(np.float32 if self.compact else np.float64, copy=False)
+        return pd.DataFrame(data, columns=OHLCV_COLUMNS)
+
+
+def iter_validated(chunks: Iterable[pd.DataFrame], validator: OhlcvValidator) -> Iterator[pd.DataFrame]:
+    """Validate chunks lazily; `validator.report` is complete once the iterator is exhausted."""
+    for chunk in chunks:
+        out = validator.feed(chunk)
+        if not out.empty:
+            yield out
+
+
+def validate_ohlcv(df: pd.DataFrame, timeframe: Optional[str] = None, fill_gaps: bool = False,
+                   bad: BadCandles = "repair", compact: bool = True,
+                   chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Tuple[pd.DataFrame, QualityReport]:
+    """Validate a whole frame `chunk_rows` rows at a time; returns (clean frame, report).
+
+    Gaps are only detected (and filled) when `timeframe` is given.
+    """
+    validator = OhlcvValidator(timeframe, fill_gaps=fill_gaps, bad=bad, compact=compact)
     if df is None or df.empty:
-        return df
-    df = df.drop_duplicates(subset=["ts"]).sort_values("ts")
-    # Coerce types
-    for c in ["open","high","low","close","volume"]:
-        if c in df:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-    df = df.dropna().reset_index(drop=True)
-    return df
+        return validator.feed(pd.DataFrame(columns=OHLCV_COLUMNS)), validator.report
+    ts = pd.to_numeric(df["ts"], errors="coerce")
+    if not ts.is_monotonic_increasing:
+        # the streaming pass only sorts within a chunk
+        order = np.argsort(ts.to_numpy(dtype=np.float64, na_value=np.inf), kind="stable")
+        validator.report.reordered += int(np.count_nonzero(order != np.arange(len(order))))
+        df = df.iloc[order]
+    parts = list(iter_validated((df.iloc[k:k + chunk_rows] for k in range(0, len(df), chunk_rows)), validator))
+    if not parts:
+        return validator.feed(df.iloc[0:0]), validator.report
+    out = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    return out, validator.report
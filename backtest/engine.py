@@ -0,0 +1,119 @@
+"""
+Backtest runner: wires market arrays, ExchangeSim and GridStrategy together.
+- `load_market` maps the aligned klines/mark/funding dataset (built through the downloader cache)
+  and registers the symbol's contract specs from the markets snapshot.
+- `run_grid_backtest` is the unit of work the optimizer fans out; funding is charged from
+  the dataset's pre-indexed events.
+- `run_grid_ticks` runs the same grid on trade prints with the queue-position fill model.
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from backtest.data.dataset import build_dataset, open_dataset
+from backtest.data.market import MarketArrays
+from backtest.exchange_sim import ExchangeSim
+from backtest.exchange_specs import ContractSpecs
+from backtest.funding import FundingSchedule
+from backtest.metrics import MetricsAccumulator
+from backtest.replay import CoarseBars
+from config.schemas import BacktestConfig
+from strategies.grid import GridParams, GridStrategy
+from utils.time import timeframe_to_ms
+
+
+def contract_to_market_symbol(contract: str) -> str:
+    """PI_USDT_PERP -> PI/USDT (ccxt style); other forms pass through."""
+    if contract.endswith("_PERP"):
+        base, _, quote = contract[: -len("_PERP")].partition("_")
+        return f"{base}/{quote}"
+    return contract
+
+
+def load_market(config: BacktestConfig) -> MarketArrays:
+    """Memory-mapped dataset for the config's range, built on first use; the symbol's specs
+    are registered alongside (see register_market_specs)."""
+    market = open_dataset(market_dataset_path(config))
+    register_market_specs(config, market)
+    return market
+
+
+def register_market_specs(config: BacktestConfig, market: MarketArrays) -> Optional[ContractSpecs]:
+    """Register the config symbol's specs from the markets snapshot, risk tiers priced at the
+    market's last close."""
+    from backtest.data.client import register_symbol_specs
+
+    if not len(market):
+        return None
+    return register_symbol_specs(config.symbol, float(market.close[-1]))
+
+
+def market_dataset_path(config: BacktestConfig) -> Path:
+    return build_dataset(contract_to_market_symbol(config.symbol), config.timeframe, config.start, config.end,
+                         mark=config.use_mark_price)
+
+
+def run_grid_backtest(market: MarketArrays, config: BacktestConfig, params: GridParams,
+                      sim: Optional[ExchangeSim] = None, record_equity: bool = False) -> Dict[str, Any]:
+    """Run one grid over `market` and return its metrics (streamed, no per-bar storage).
+
+    With `record_equity` the per-bar curve stays available on `sim.equity_curve` and the
+    running funding PnL on `sim.funding_curve`.
+    """
+    if sim is None:
+        sim = ExchangeSim(config.symbol, margin_mode=config.margin_mode, leverage=config.leverage,
+                          fees_bps=config.fees_bps)
+        sim.balance_usdt = config.initial_balance_usdt
+    sim.metrics = MetricsAccumulator(periods_per_year=periods_per_year(config.timeframe))
+    strategy = GridStrategy(params, leverage=config.leverage)
+    marks = dict(mark_close=market.mark_close, mark_high=market.mark_high, mark_low=market.mark_low) \
+        if config.use_mark_price else {}
+    funding = FundingSchedule.from_market(market, use_mark_price=config.use_mark_price)
+    coarse = None
+    if config.replay_timeframe:
+        coarse = CoarseBars.build(market.ts, market.high, market.low, config.replay_timeframe,
+                                  marks.get("mark_high"), marks.get("mark_low"))
+    sim.run_bars(market.open, market.high, market.low, market.close, market.ts, strategy,
+                 funding=funding, coarse=coarse, record_equity=record_equity, **marks)
+    metrics = sim.metrics.result()
+    metrics.update({
+        "fills": len(sim.fills),
+        "funding_events": len(funding),
+        "stopped": strategy.stopped_reason or "",
+        "event_bars": sim.event_bars,
+    })
+    if coarse is not None:
+        metrics["blocks_skipped"] = sim.replay_stats["skipped"]
+        metrics["blocks_drilled"] = sim.replay_stats["drilled"]
+    return metrics
+
+
+def run_grid_ticks(chunks: Iterable[Any], config: BacktestConfig, params: GridParams,
+                   sim: Optional[ExchangeSim] = None, funding: Optional[FundingSchedule] = None,
+                   queue_ahead: float = 0.0, record_equity: bool = False,
+                   tick: Optional[float] = None) -> Dict[str, Any]:
+    """Run one grid over trade chunks (see backtest.data.trades.iter_trades) and return its
+    metrics. Equity is sampled once per `config.timeframe`, so the metrics read like those of
+    `run_grid_backtest` on bars of that timeframe; `tick` as in `ExchangeSim.run_trades`."""
+    if sim is None:
+        sim = ExchangeSim(config.symbol, margin_mode=config.margin_mode, leverage=config.leverage,
+                          fees_bps=config.fees_bps)
+        sim.balance_usdt = config.initial_balance_usdt
+    sim.metrics = MetricsAccumulator(periods_per_year=periods_per_year(config.timeframe))
+    strategy = GridStrategy(params, leverage=config.leverage)
+    events = sim.run_trades(chunks, strategy, funding=funding, queue_ahead=queue_ahead,
+                            sample_ms=timeframe_to_ms(config.timeframe), record_equity=record_equity,
+                            tick=tick)
+    metrics = sim.metrics.result()
+    metrics.update({
+        "fills": len(sim.fills),
+        "funding_events": len(sim.funding_events),
+        "stopped": strategy.stopped_reason or "",
+        "trades_processed": sim.trades_processed,
+        "event_trades": events,
+    })
+    return metrics
+
+
+def periods_per_year(timeframe: str) -> float:
+    return 365 * 86_400_000 / timeframe_to_ms(timeframe)
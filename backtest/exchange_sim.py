@@ -6,17 +6,75 @@ MEXC-parity exchange simulator (linear USDT perpetuals).
 - PnL: mark-price based unrealized/realized
 - Funding: applied at funding timestamps
 - Liquidation: maintenance tiers, liq/bankruptcy price
-This is a skeleton; methods will be implemented incrementally.
+
+Matching model (bar-based):
+- Resting limit orders live in price-sorted buy/sell ladders; a bar only visits the
+  levels between its low and high. Resting orders fill at their own price (maker).
+- Open orders are kept as columns of an `OrderStore` (backtest.order_store) and addressed
+  by integer handles; `Order` is only the request ticket of `place_order`, its status
+  reflects the outcome at placement. `place_orders`/`cancel_orders` work on whole grids
+  at once, and `open_orders` is a read-only view keyed by order id (handle if id-less).
+- Market orders fill at the next bar's open (taker).
+- Marketable limit orders are checked against the last close at placement: post-only
+  orders are rejected, GTC/IOC/FOK orders fill immediately at the last close (taker).
+  Non-marketable IOC/FOK orders expire. Bars carry no depth, so FOK behaves like IOC.
+- Funding: a precomputed `FundingSchedule` is charged before the trading of the bar each
+  event falls in, at the scheduled mark; `run_bars` stops only on those bars.
+- Liquidation: after each bar's fills the mark high/low is checked against the position's
+  liquidation price; the position is taken over at its bankruptcy price.
+- Intra-bar path: O->L->H->C for up bars, O->H->L->C for down bars. Fills are reported
+  to `fill_listener` as they happen, so orders placed in reaction can still fill on the
+  remaining legs of the same bar.
+- `run_bars` takes whole OHLC arrays and only drops into Python on bars where
+  something can happen (a resting level is touched or an order is pending).
+- With a `profiler` (the active one from utils.profiling at construction), on_bar and
+  run_bars time their phases: match (fill callbacks included), liquidation, funding,
+  strategy, scan, quiet and equity.
+
+Matching model (trade-driven, `run_trades`):
+- Replays trade prints (backtest.data.trades) chunk by chunk instead of candles. A print
+  through a resting price (below a bid, above an ask) fills the whole level.
+- A print at the resting price only works down the queue: an order joins its level behind
+  `queue_ahead` contracts (the depth assumed in front of it; also behind our own earlier
+  orders there) and fills once that much plus its own qty has printed at the price
+  against it (taker sells for bids, taker buys for asks, either when the side is
+  unknown). Fills are all-or-nothing, at the order's price (maker).
+- Resting prices and prints share one tick (`tick`, the specs' tick size, or the decimal
+  tick of the prints), so a grid price like p0 * step**k sits on a price that prints.
+- Pending market orders fill at the next print; marketable placements, post-only
+  rejection, liquidation (on the print price) and funding (at the first print at or
+  after the event) work as in the bar model. Equity is sampled once per `sample_ms`, so
+  metrics are per bar of that length.
+- Only prints that reach a resting level, the watch band or the liquidation price leave
+  the vectorized scan, as in `run_bars`.
 """
 from __future__ import annotations
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Mapping
 from dataclasses import dataclass
-from typing import Optional, Literal, List, Dict
+from typing import Optional, Literal, List, Dict, Any, Callable, Iterable, Iterator, Sequence, Tuple
+import itertools
+from time import perf_counter
+import numpy as np
+
+from backtest.exchange_specs import ContractSpecs, get_specs
+from backtest.funding import FundingSchedule, cumulative_funding_pnl
+from backtest.liquidation import position_prices
+from backtest.metrics import MetricsAccumulator
+from backtest.order_store import BUY, SELL, FLAG_MARKET, FLAG_POST_ONLY, TIF_CODES, TIF_NAMES, OrderKey, OrderStore
+from backtest.replay import CoarseBars
+from utils.profiling import Profiler, current_profiler
 
 Side = Literal["buy", "sell"]
 OrderType = Literal["limit", "market"]
 TIF = Literal["GTC", "IOC", "FOK"]
+OrderStatus = Literal["new", "open", "filled", "canceled", "rejected", "expired"]
 
-@dataclass
+# Bars scanned per vectorized probe; grows geometrically while nothing triggers.
+_SCAN_CHUNK_MIN = 512
+_SCAN_CHUNK_MAX = 1 << 16
+
+@dataclass(slots=True)
 class Order:
     id: str
     side: Side
@@ -25,35 +83,929 @@ class Order:
     qty: float
     tif: TIF = "GTC"
     post_only: bool = False
+    status: OrderStatus = "new"
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     qty: float = 0.0
     entry_price: float = 0.0
 
+
+class _Ladder:
+    """Handles of the resting orders of one side, sorted by price ascending; FIFO within a level."""
+
+    def __init__(self) -> None:
+        self.prices: List[float] = []
+        self.levels: Dict[float, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def add(self, price: float, h: int) -> None:
+        ids = self.levels.get(price)
+        if ids is None:
+            self.levels[price] = [h]
+            insort(self.prices, price)
+        else:
+            ids.append(h)
+
+    def add_many(self, prices: List[float], handles: List[int]) -> None:
+        """Bulk `add`; new levels are merged with one sort instead of an insort each."""
+        new: List[float] = []
+        for p, h in zip(prices, handles):
+            ids = self.levels.get(p)
+            if ids is None:
+                self.levels[p] = [h]
+                new.append(p)
+            else:
+                ids.append(h)
+        if new:
+            self.prices = sorted(self.prices + new)
+
+    def remove(self, price: float, h: int) -> None:
+        ids = self.levels.get(price)
+        if not ids:
+            return
+        try:
+            ids.remove(h)
+        except ValueError:
+            return
+        if not ids:
+            del self.levels[price]
+            del self.prices[bisect_left(self.prices, price)]
+
+    def remove_many(self, prices: List[float], handles: List[int]) -> None:
+        emptied = False
+        for p, h in zip(prices, handles):
+            ids = self.levels.get(p)
+            if not ids:
+                continue
+            try:
+                ids.remove(h)
+            except ValueError:
+                continue
+            if not ids:
+                del self.levels[p]
+                emptied = True
+        if emptied:
+            self.prices = [p for p in self.prices if p in self.levels]
+
+    def lowest(self) -> float:
+        return self.prices[0] if self.prices else float("inf")
+
+    def highest(self) -> float:
+        return self.prices[-1] if self.prices else float("-inf")
+
+    def pop_at_or_above(self, price: float) -> List[int]:
+        """Remove levels >= price, returned best (highest) level first."""
+        i = bisect_left(self.prices, price)
+        if i == len(self.prices):
+            return []
+        out: List[int] = []
+        for p in reversed(self.prices[i:]):
+            out.extend(self.levels.pop(p))
+        del self.prices[i:]
+        return out
+
+    def pop_at_or_below(self, price: float) -> List[int]:
+        """Remove levels <= price, returned best (lowest) level first."""
+        j = bisect_right(self.prices, price)
+        if j == 0:
+            return []
+        out: List[int] = []
+        for p in self.prices[:j]:
+            out.extend(self.levels.pop(p))
+        del self.prices[:j]
+        return out
+
+
+class _OpenOrders(Mapping):
+    """Read-only view of the open orders, keyed by order id (by handle for id-less orders).
+    Values are `Order` snapshots built on access."""
+
+    def __init__(self, store: OrderStore):
+        self._store = store
+
+    def __getitem__(self, key: OrderKey) -> Order:
+        store = self._store
+        h = store.handle(key)
+        if h is None:
+            raise KeyError(key)
+        market = bool(store.flags[h] & FLAG_MARKET)
+        return Order(id=store.ids[h] or "", side="buy" if store.side[h] == BUY else "sell",
+                     type="market" if market else "limit", price=None if market else float(store.price[h]),
+                     qty=float(store.qty[h]), tif=TIF_NAMES[int(store.tif[h])],
+                     post_only=bool(store.flags[h] & FLAG_POST_ONLY), status="open")
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, (str, int)) and self._store.handle(key) is not None
+
+    def __iter__(self) -> Iterator[OrderKey]:
+        return self._store.keys()
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+
+def on_ticks(prices: Any, tick: float) -> Any:
+    """Prices snapped to the nearest multiple of `tick`, as canonical floats (the same price from
+    a print and from a resting order compares equal)."""
+    return np.round(np.round(np.asarray(prices, dtype=np.float64) / tick) * tick, 10)
+
+
+def infer_tick(prices: np.ndarray) -> float:
+    """The decimal tick (a power of ten) that all of `prices` sit on, judged by the smallest
+    step between distinct prices; 1e-8 if there is none."""
+    steps = np.diff(np.unique(np.asarray(prices, dtype=np.float64)))
+    steps = steps[steps > 0]
+    if not steps.size:
+        return 1e-8
+    return float(10.0 ** np.floor(np.log10(steps.min()) + 1e-6))
+
+
+def _scan(h: np.ndarray, l: np.ndarray, mh: np.ndarray, ml: np.ndarray, lo: float, hi: float,
+          liq_lo: Optional[float], liq_hi: Optional[float], i: int, n: int) -> int:
+    """First index in [i, n) whose range reaches lo/hi or whose mark reaches the liquidation price."""
+    chunk = _SCAN_CHUNK_MIN
+    k = i
+    while k < n:
+        e = min(n, k + chunk)
+        mask = (l[k:e] <= lo) | (h[k:e] >= hi)
+        if liq_lo is not None:
+            mask |= ml[k:e] <= liq_lo
+        elif liq_hi is not None:
+            mask |= mh[k:e] >= liq_hi
+        hit = np.flatnonzero(mask)
+        if hit.size:
+            return k + int(hit[0])
+        k = e
+        chunk = min(chunk * 2, _SCAN_CHUNK_MAX)
+    return n
+
+
+class _EquitySampler:
+    """Equity at the last print of each `sample_ms` interval (repeated through intervals
+    without prints), streamed into the sim's metrics and optionally collected."""
+
+    def __init__(self, sim: "ExchangeSim", sample_ms: int, out: Optional[List[np.ndarray]]):
+        self.sim = sim
+        self.ms = sample_ms
+        self.out = out
+        self.bucket: Optional[int] = None  # interval of the last print
+        self.last = 0.0  # equity right after the last print
+
+    def _emit(self, values: np.ndarray) -> None:
+        if self.out is not None:
+            self.out.append(values)
+        if self.sim.metrics is not None:
+            self.sim.metrics.update_equity_array(values)
+
+    def step(self, ts: int) -> None:
+        """Before a print at `ts`: close the intervals it moves past."""
+        b = ts // self.ms
+        if self.bucket is not None and b > self.bucket:
+            self._emit(np.full(b - self.bucket, self.last))
+        if self.bucket is None or b > self.bucket:
+            self.bucket = b
+
+    def mark(self, equity: float) -> None:
+        self.last = equity
+
+    def quiet(self, ts: np.ndarray, px: np.ndarray) -> None:
+        """Prints that changed nothing but the price: equity is linear in it."""
+        sim = self.sim
+        eq = np.full(len(px), sim.balance_usdt)
+        qm = sim.position.qty * sim.multiplier
+        if qm:
+            eq += (px - sim.position.entry_price) * qm
+        b = ts // self.ms
+        prev_b = np.empty_like(b)
+        prev_b[1:] = b[:-1]
+        prev_b[0] = b[0] if self.bucket is None else self.bucket
+        prev_eq = np.empty_like(eq)
+        prev_eq[1:] = eq[:-1]
+        prev_eq[0] = self.last
+        steps = b - prev_b
+        at = np.flatnonzero(steps > 0)
+        if at.size:
+            self._emit(np.repeat(prev_eq[at], steps[at]))
+        self.bucket = int(b[-1])
+        self.last = float(eq[-1])
+
+    def close(self) -> None:
+        if self.bucket is not None:
+            self._emit(np.array([self.last]))
+
+
 class ExchangeSim:
-    def __init__(self, symbol: str, margin_mode: str = "isolated", leverage: int = 125):
+    def __init__(self, symbol: str, margin_mode: str = "isolated", leverage: int = 125,
+                 specs: Optional[ContractSpecs] = None, fees_bps: float = 0.0):
         self.symbol = symbol
         self.margin_mode = margin_mode
         self.leverage = leverage
+        self.specs = specs if specs is not None else get_specs(symbol)
+        self.fees_bps = fees_bps
         self.balance_usdt: float = 0.0
         self.position = Position()
-        self.open_orders: Dict[str, Order] = {}
-
-    def on_bar(self, o: float, h: float, l: float, c: float, ts: int) -> None:
-        """Advance one candle. Will implement matching, funding, liq checks."""
-        pass
+        self._store = OrderStore()
+        self.open_orders = _OpenOrders(self._store)
+        self.fills: List[Dict[str, Any]] = []
+        self.last_price: Optional[float] = None
+        self.last_ts: Optional[int] = None
+        self.liq_price: Optional[float] = None
+        self.bankruptcy_price: Optional[float] = None
+        self.liquidations = 0
+        self.bars_processed = 0
+        self.event_bars = 0
+        self.equity_curve: Optional[np.ndarray] = None
+        self.funding_curve: Optional[np.ndarray] = None
+        self.position_curve: Optional[np.ndarray] = None
+        # Off when the margin backing the position lives outside this sim (portfolio cross wallet).
+        self.liquidation_enabled = True
+        self.funding_paid = 0.0
+        self.funding_events: List[Dict[str, Any]] = []
+        self.replay_stats: Dict[str, int] = {}
+        self.metrics: Optional[MetricsAccumulator] = None
+        self.fill_listener: Optional[Callable[[Dict[str, Any]], None]] = None
+        self.profiler: Optional[Profiler] = current_profiler()
+        self._band_lo = float("-inf")
+        self._band_hi = float("inf")
+        self._bids = _Ladder()
+        self._asks = _Ladder()
+        self._pending_market: List[int] = []
+        self._ids = itertools.count(1)
+        # Trade-driven mode only (run_trades): contracts assumed queued ahead of a new order,
+        # and the tick that resting prices and prints are snapped to.
+        self.queue_ahead: Optional[float] = None
+        self.tick: Optional[float] = None
+        self.trades_processed = 0
 
+    # ------------------------ Orders ------------------------
     def place_order(self, order: Order) -> str:
-        """Validate/normalize then accept order. Returns order id."""
+        """Validate/normalize then accept order. Returns order id.
+
+        The outcome is reported on ``order.status``: open (resting or pending market),
+        filled (taker at placement), rejected (constraints/post-only) or expired (IOC/FOK).
+        """
+        if not order.id:
+            order.id = f"o{next(self._ids)}"
         oid = order.id
-        self.open_orders[oid] = order
+        if not self._normalize(order):
+            order.status = "rejected"
+            return oid
+        order.status, _ = self._accept(order.side, order.type, order.price, order.qty, order.tif,
+                                       order.post_only, oid)
         return oid
 
-    def cancel_order(self, order_id: str) -> None:
-        self.open_orders.pop(order_id, None)
+    def place_limit(self, side: Side, price: float, qty: float, post_only: bool = False,
+                    tif: TIF = "GTC") -> int:
+        """`place_order` for an id-less limit order without the `Order` ticket.
+
+        Returns the handle of the resting order, or -1 if it did not rest (filled at placement,
+        rejected or expired). Fills of id-less orders report the handle as "order_id" (None when
+        filled at placement).
+        """
+        norm = self._normalize_limit(price, qty)
+        if norm is None:
+            return -1
+        _, h = self._accept(side, "limit", norm[0], norm[1], tif, post_only, None)
+        return h
+
+    def place_orders(self, side: Side, prices: Sequence[float], qtys: Any, post_only: bool = False,
+                     tif: TIF = "GTC") -> np.ndarray:
+        """Bulk `place_limit` for one side: rounding, validation and the marketable check are
+        vectorized and the resting orders are stored and laddered in one go. `qtys` is an array
+        or a scalar. Marketable orders fill at the last price (in input order) after the
+        others rest. Returns one handle per order, -1 where the order did not rest.
+        """
+        p = np.asarray(prices, dtype=np.float64).ravel()
+        q = np.broadcast_to(np.asarray(qtys, dtype=np.float64), p.shape)
+        specs = self.specs
+        if specs is not None:
+            q = specs.round_qtys(q)
+            p = specs.round_prices(p)
+        if self.tick is not None:
+            p = on_ticks(p, self.tick)
+        ok = (p > 0) & (q > 0)
+        if specs is not None:
+            ok &= p * specs.multiplier * q >= specs.min_notional
+        last = self.last_price
+        if last is None:
+            marketable = np.zeros(len(p), dtype=bool)
+        else:
+            marketable = p >= last if side == "buy" else p <= last
+        out = np.full(len(p), -1, dtype=np.int64)
+        if tif == "GTC":
+            rest = ok & ~marketable
+            flags = FLAG_POST_ONLY if post_only else 0
+            handles = self._store.add_many(BUY if side == "buy" else SELL, p[rest], q[rest], TIF_CODES[tif], flags)
+            ladder = self._bids if side == "buy" else self._asks
+            ladder.add_many(p[rest].tolist(), handles.tolist())
+            if self.queue_ahead is not None:
+                self._join_queue(ladder, handles.tolist())
+            out[rest] = handles
+        if not post_only:
+            for k in np.flatnonzero(ok & marketable).tolist():
+                self._fill(None, side, float(q[k]), last, self.last_ts, maker=False)
+        return out
+
+    def _accept(self, side: Side, type_: OrderType, price: Optional[float], qty: float, tif: TIF,
+                post_only: bool, oid: Optional[str]) -> Tuple[OrderStatus, int]:
+        """Route a normalized order; returns (status, handle or -1)."""
+        sign = BUY if side == "buy" else SELL
+        flags = FLAG_POST_ONLY if post_only else 0
+        if type_ == "market":
+            h = self._store.add(sign, float("nan"), qty, TIF_CODES[tif], flags | FLAG_MARKET, oid)
+            self._pending_market.append(h)
+            return "open", h
+        last = self.last_price
+        marketable = last is not None and (price >= last if side == "buy" else price <= last)
+        if marketable:
+            if post_only:
+                return "rejected", -1
+            self._fill(oid, side, qty, last, self.last_ts, maker=False)
+            return "filled", -1
+        if tif != "GTC":
+            return "expired", -1
+        h = self._store.add(sign, price, qty, TIF_CODES[tif], flags, oid)
+        ladder = self._bids if side == "buy" else self._asks
+        ladder.add(price, h)
+        if self.queue_ahead is not None:
+            self._join_queue(ladder, [h])
+        return "open", h
+
+    def cancel_order(self, order_id: OrderKey) -> None:
+        """Cancel by order id, or by handle for id-less orders; unknown keys are ignored."""
+        store = self._store
+        h = store.handle(order_id)
+        if h is None:
+            return
+        if store.flags[h] & FLAG_MARKET:
+            self._pending_market.remove(h)
+        else:
+            (self._bids if store.side[h] == BUY else self._asks).remove(float(store.price[h]), h)
+        store.remove(h)
+
+    def cancel_orders(self, keys: Iterable[OrderKey]) -> None:
+        """Bulk `cancel_order`."""
+        store = self._store
+        handles = [h for h in map(store.handle, keys) if h is not None]
+        if not handles:
+            return
+        hs = np.array(sorted(set(handles)), dtype=np.int64)
+        market = (store.flags[hs] & FLAG_MARKET) != 0
+        if market.any():
+            gone = set(hs[market].tolist())
+            self._pending_market = [h for h in self._pending_market if h not in gone]
+        buys = ~market & (store.side[hs] == BUY)
+        sells = ~market & (store.side[hs] == SELL)
+        self._bids.remove_many(store.price[hs[buys]].tolist(), hs[buys].tolist())
+        self._asks.remove_many(store.price[hs[sells]].tolist(), hs[sells].tolist())
+        store.remove_many(hs)
+
+    def _normalize(self, order: Order) -> bool:
+        """Round price/qty to tick/lot and check min notional. False if invalid."""
+        if order.type == "limit":
+            norm = self._normalize_limit(order.price, order.qty)
+            if norm is None:
+                return False
+            order.price, order.qty = norm
+            return True
+        specs = self.specs
+        if specs is not None:
+            order.qty = specs.round_qty(order.qty)
+        if order.qty <= 0:
+            return False
+        if specs is not None and self.last_price is not None:
+            return specs.valid_notional(self.last_price * specs.multiplier, order.qty)
+        return True
+
+    def _normalize_limit(self, price: Optional[float], qty: float) -> Optional[Tuple[float, float]]:
+        """(price, qty) rounded to tick/lot, or None if the limit order is invalid."""
+        if price is None or price <= 0:
+            return None
+        specs = self.specs
+        if specs is not None:
+            qty = specs.round_qty(qty)
+            price = specs.round_price(price)
+        if self.tick is not None:
+            price = float(on_ticks(price, self.tick))
+        if price <= 0:
+            return None
+        if qty <= 0:
+            return None
+        if specs is not None and not specs.valid_notional(price * specs.multiplier, qty):
+            return None
+        return price, qty
+
+    # ------------------------ Fills ------------------------
+    @property
+    def multiplier(self) -> float:
+        return self.specs.multiplier if self.specs is not None else 1.0
+
+    def _fill(self, key: Optional[OrderKey], side: Side, qty: float, price: float, ts: Optional[int],
+              maker: bool) -> None:
+        signed = qty if side == "buy" else -qty
+        mult = self.multiplier
+        pos = self.position
+        realized = 0.0
+        if pos.qty and (pos.qty > 0) != (signed > 0):
+            closing = min(abs(pos.qty), abs(signed))
+            direction = 1.0 if pos.qty > 0 else -1.0
+            realized = closing * (price - pos.entry_price) * direction * mult
+        new_qty = pos.qty + signed
+        if abs(new_qty) < 1e-12:
+            pos.qty, pos.entry_price = 0.0, 0.0
+        elif pos.qty == 0 or (pos.qty > 0) != (new_qty > 0):
+            pos.qty, pos.entry_price = new_qty, price
+        elif (pos.qty > 0) == (signed > 0):
+            pos.entry_price = (pos.entry_price * pos.qty + price * signed) / new_qty
+            pos.qty = new_qty
+        else:
+            pos.qty = new_qty
+        fee = abs(signed) * price * mult * self.fees_bps / 10_000
+        self.balance_usdt += realized - fee
+        self._update_liq_price()
+        fill = {
+            "order_id": key, "side": side, "price": price, "qty": qty,
+            "ts": ts, "maker": maker, "fee": fee, "realized_pnl": realized,
+        }
+        self.fills.append(fill)
+        if self.metrics is not None and realized:
+            self.metrics.record_trade(realized - fee)
+        if self.fill_listener is not None:
+            self.fill_listener(fill)
+
+    def _fill_ids(self, handles: List[int], ts: int) -> None:
+        store = self._store
+        for h in handles:
+            price, qty = store.price.item(h), store.qty.item(h)
+            side = "buy" if store.side.item(h) == BUY else "sell"
+            key = store.key(h)
+            store.remove(h)
+            # The path is at this level when it fills; orders placed from the listener see it.
+            self.last_price = price
+            self._fill(key, side, qty, price, ts, maker=True)
+
+    # ------------------------ Liquidation ------------------------
+    def _update_liq_price(self) -> None:
+        """Recompute liquidation/bankruptcy prices after the position or wallet changed."""
+        q = self.position.qty * self.multiplier
+        if not q or not self.liquidation_enabled:
+            self.liq_price = self.bankruptcy_price = None
+            return
+        pr = position_prices(self.specs, self.position.entry_price, q, self.leverage,
+                             self.margin_mode, wallet=self.balance_usdt)
+        lp = float(pr["liquidation_price"])
+        self.liq_price = lp if lp > 0 else None
+        self.bankruptcy_price = float(pr["bankruptcy_price"])
+
+    def _liquidate(self, ts: int) -> None:
+        """Take over the position at its bankruptcy price and cancel resting orders."""
+        self.cancel_orders(self._store.handles().tolist())
+        pos = self.position
+        price = max(self.bankruptcy_price, 0.0)
+        realized = pos.qty * (price - pos.entry_price) * self.multiplier
+        side = "sell" if pos.qty > 0 else "buy"
+        fill = {"order_id": "liquidation", "side": side, "price": price, "qty": abs(pos.qty),
+                "ts": ts, "maker": False, "fee": 0.0, "realized_pnl": realized, "liquidation": True}
+        self.balance_usdt += realized
+        pos.qty, pos.entry_price = 0.0, 0.0
+        self.liq_price = self.bankruptcy_price = None
+        self.liquidations += 1
+        if self.profiler is not None:
+            self.profiler.count("liquidations")
+        self.fills.append(fill)
+        if self.metrics is not None:
+            self.metrics.record_trade(realized)
+            self.metrics.record_liquidation()
+        if self.fill_listener is not None:
+            self.fill_listener(fill)
+
+    # ------------------------ Funding ------------------------
+    def apply_funding(self, rate: float, mark_price: float, ts: int) -> Dict[str, Any]:
+        """Settle one funding event against the open position; returns the event record."""
+        paid = self.position.qty * self.multiplier * mark_price * rate
+        event = {"ts": ts, "rate": rate, "mark": mark_price, "qty": self.position.qty, "paid": paid}
+        self.funding_events.append(event)
+        if paid:
+            self.balance_usdt -= paid
+            self.funding_paid += paid
+            if self.metrics is not None:
+                self.metrics.record_funding(paid)
+            self._update_liq_price()
+        return event
+
+    # ------------------------ Bars ------------------------
+    def on_bar(self, o: float, h: float, l: float, c: float, ts: int,
+               mark_high: Optional[float] = None, mark_low: Optional[float] = None) -> None:
+        """Advance one candle: pending market orders at open, then resting levels leg by leg along
+        the bar path, then the liquidation check against the bar's mark high/low (last-price
+        high/low when no mark is given)."""
+        prof = self.profiler
+        if prof is not None:
+            t0 = perf_counter()
+            n_fills = len(self.fills)
+        self.last_ts = ts
+        if self._pending_market:
+            pending, self._pending_market = self._pending_market, []
+            self.last_price = o
+            store = self._store
+            for h in pending:
+                qty, side, key = store.qty.item(h), "buy" if store.side.item(h) == BUY else "sell", store.key(h)
+                store.remove(h)
+                self._fill(key, side, qty, o, ts, maker=False)
+        prev = o if self.last_price is None else self.last_price
+        for p in ((o, l, h, c) if c >= o else (o, h, l, c)):
+            if p < prev:
+                self._match_buys(p, ts)
+            elif p > prev:
+                self._match_sells(p, ts)
+            prev = p
+            self.last_price = p
+        if prof is not None:
+            t1 = perf_counter()
+            prof.add_time("match", t1 - t0)
+            prof.count("fills", len(self.fills) - n_fills)
+        if self.liq_price is not None:
+            if self.position.qty > 0:
+                if (l if mark_low is None else mark_low) <= self.liq_price:
+                    self._liquidate(ts)
+            elif (h if mark_high is None else mark_high) >= self.liq_price:
+                self._liquidate(ts)
+        if prof is not None:
+            prof.add_time("liquidation", perf_counter() - t1)
+        self.bars_processed += 1
+
+    def _match_buys(self, low: float, ts: int) -> None:
+        # Loop: the fill listener may add levels that this same leg still reaches.
+        while self._bids.prices and low <= self._bids.prices[-1]:
+            self._fill_ids(self._bids.pop_at_or_above(low), ts)
+
+    def _match_sells(self, high: float, ts: int) -> None:
+        while self._asks.prices and high >= self._asks.prices[0]:
+            self._fill_ids(self._asks.pop_at_or_below(high), ts)
+
+    # ------------------------ Trades ------------------------
+    def _join_queue(self, ladder: _Ladder, handles: List[int]) -> None:
+        """Seed the queue position of resting orders, in FIFO order within a level."""
+        store = self._store
+        for h in handles:
+            level = ladder.levels[store.price.item(h)]
+            k = len(level) - 1 if level[-1] == h else level.index(h)
+            ahead = self.queue_ahead
+            if k:
+                # behind our previous order there, which is itself behind its own queue
+                ahead = max(ahead, store.queue.item(level[k - 1]))
+            store.queue[h] = ahead + store.qty.item(h)
+
+    def _snap_resting(self) -> None:
+        """Move resting limit orders onto the tick grid (orders that rested before tick mode)."""
+        store = self._store
+        for ladder in (self._bids, self._asks):
+            for price in list(ladder.prices):
+                snapped = float(on_ticks(price, self.tick))
+                if snapped == price:
+                    continue
+                handles = list(ladder.levels[price])
+                ladder.remove_many([price] * len(handles), handles)
+                store.price[handles] = snapped
+                ladder.add_many([snapped] * len(handles), handles)
+
+    def _work_queue(self, ladder: _Ladder, price: float, qty: float, ts: int) -> None:
+        """`qty` printed at `price` against the level: fill the orders whose queue has cleared."""
+        level = ladder.levels.get(price)
+        if not level:
+            return
+        store = self._store
+        hs = np.array(level, dtype=np.int64)
+        store.queue[hs] -= qty
+        done = [h for h in level if store.queue.item(h) <= 1e-12]
+        if done:
+            ladder.remove_many([price] * len(done), done)
+            self._fill_ids(done, ts)
+
+    def on_trade(self, price: float, qty: float, side: int, ts: int) -> None:
+        """Advance one print: pending market orders, levels traded through, the queue at the
+        print's price, then the liquidation check."""
+        self.last_ts = ts
+        if self._pending_market:
+            pending, self._pending_market = self._pending_market, []
+            self.last_price = price
+            store = self._store
+            for h in pending:
+                q, s, key = store.qty.item(h), "buy" if store.side.item(h) == BUY else "sell", store.key(h)
+                store.remove(h)
+                self._fill(key, s, q, price, ts, maker=False)
+        bids, asks = self._bids, self._asks
+        # Loops: the fill listener may place levels that this print still reaches.
+        while bids.prices and price < bids.prices[-1]:
+            self._fill_ids(bids.pop_at_or_above(float(np.nextafter(price, np.inf))), ts)
+        while asks.prices and price > asks.prices[0]:
+            self._fill_ids(asks.pop_at_or_below(float(np.nextafter(price, -np.inf))), ts)
+        if side != BUY and price in bids.levels:
+            self._work_queue(bids, price, qty, ts)
+        if side != SELL and price in asks.levels:
+            self._work_queue(asks, price, qty, ts)
+        self.last_price = price
+        if self.liq_price is not None:
+            if (price <= self.liq_price) if self.position.qty > 0 else (price >= self.liq_price):
+                self._liquidate(ts)
+        self.trades_processed += 1
+
+    def run_trades(self, chunks: Iterable[Any], strategy: Optional[Any] = None, *,
+                   funding: Optional[FundingSchedule] = None, queue_ahead: float = 0.0,
+                   sample_ms: int = 60_000, record_equity: bool = False, tick: Optional[float] = None) -> int:
+        """Replay trade chunks (anything with ts/price/qty/side arrays, e.g. `TradeChunk`);
+        returns the number of prints that needed Python-level work.
+
+        Chunks are consumed one at a time and never concatenated. The strategy is woken as in
+        `run_bars` (first print, prints with fills, prints crossing the watch band) with a
+        context whose open/high/low/close are the print's price and whose "index" counts
+        prints. Funding events are settled before the first print at or after their ts.
+        Equity at the last print of every `sample_ms` interval (carried through intervals
+        without prints) is streamed into `self.metrics` and, with `record_equity`, kept in
+        `equity_curve` with one entry per interval.
+
+        Resting prices and prints are snapped to one tick so that a print at an order's price
+        reaches its queue: `tick`, else the specs' tick size, else the decimal tick the first
+        chunk's prices sit on. The tick is fixed on the first call.
+        """
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        if first is None:
+            return 0
+        chunks = itertools.chain([first], chunks)
+        if self.queue_ahead is None:
+            # switching into tick mode: pick the tick, then move orders rested in bar mode onto
+            # it and queue them; a later replay keeps their progress
+            if tick is None:
+                tick = self.specs.tick_size if self.specs is not None else infer_tick(first.price)
+            self.tick = float(tick)
+            self.queue_ahead = float(queue_ahead)
+            self._snap_resting()
+            for ladder in (self._bids, self._asks):
+                for level in list(ladder.levels.values()):
+                    self._join_queue(ladder, list(level))
+        self.queue_ahead = float(queue_ahead)
+        if funding is None:
+            funding = FundingSchedule.empty()
+        f_ts = funding.ts.tolist()
+        fk = 0
+        samples: List[np.ndarray] = []
+        sampler = _EquitySampler(self, sample_ms, samples if record_equity else None)
+        prev_listener = self.fill_listener
+        if strategy is not None:
+            self.fill_listener = strategy.on_fill
+        wake = strategy is not None
+        events = 0
+        offset = 0
+        try:
+            for chunk in chunks:
+                t = np.asarray(chunk.ts, dtype=np.int64)
+                px = on_ticks(chunk.price, self.tick)
+                qty = np.asarray(chunk.qty, dtype=np.float64)
+                sd = np.asarray(chunk.side, dtype=np.int8)
+                n = len(t)
+                i = 0
+                while i < n:
+                    j = i if wake else self._next_trade_event(px, i, n)
+                    if fk < len(f_ts):
+                        jf = i + int(np.searchsorted(t[i:j], f_ts[fk], side="left"))
+                        j = min(j, jf)
+                    if j > i:
+                        sampler.quiet(t[i:j], px[i:j])
+                        self.last_price = float(px[j - 1])
+                        self.last_ts = int(t[j - 1])
+                        self.trades_processed += j - i
+                    if j >= n:
+                        break
+                    tj, pj = int(t[j]), float(px[j])
+                    sampler.step(tj)
+                    while fk < len(f_ts) and f_ts[fk] <= tj:
+                        event = self.apply_funding(float(funding.rate[fk]), float(funding.mark[fk]), f_ts[fk])
+                        event["index"] = offset + j
+                        if strategy is not None:
+                            strategy.on_funding(event)
+                        fk += 1
+                    n_fills = len(self.fills)
+                    banded = pj <= self._band_lo or pj >= self._band_hi
+                    self.on_trade(pj, float(qty[j]), int(sd[j]), tj)
+                    events += 1
+                    if strategy is not None and (wake or banded or len(self.fills) > n_fills):
+                        strategy.on_bar({"sim": self, "index": offset + j, "ts": tj, "open": pj,
+                                         "high": pj, "low": pj, "close": pj})
+                    sampler.mark(self.equity(pj))
+                    wake = False
+                    i = j + 1
+                offset += n
+        finally:
+            self.fill_listener = prev_listener
+        sampler.close()
+        self.equity_curve = (np.concatenate(samples) if samples else np.empty(0)) if record_equity else None
+        return events
+
+    def _next_trade_event(self, px: np.ndarray, i: int, n: int) -> int:
+        """First print in [i, n) at or beyond a resting level, the watch band or the liquidation
+        price; n if none."""
+        if self._pending_market:
+            return i
+        lo = max(self._bids.highest(), self._band_lo)
+        hi = min(self._asks.lowest(), self._band_hi)
+        if self.liq_price is not None:
+            if self.position.qty > 0:
+                lo = max(lo, self.liq_price)
+            else:
+                hi = min(hi, self.liq_price)
+        if lo == float("-inf") and hi == float("inf"):
+            return n
+        return _scan(px, px, px, px, lo, hi, None, None, i, n)
+
+    def set_watch_band(self, lo: Optional[float] = None, hi: Optional[float] = None) -> None:
+        """Wake the strategy in `run_bars` when a bar trades at or below `lo` or at or above `hi`."""
+        self._band_lo = float("-inf") if lo is None else lo
+        self._band_hi = float("inf") if hi is None else hi
+
+    def run_bars(self, open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                 ts: np.ndarray, strategy: Optional[Any] = None, *,
+                 mark_close: Optional[np.ndarray] = None, mark_high: Optional[np.ndarray] = None,
+                 mark_low: Optional[np.ndarray] = None, funding: Optional[FundingSchedule] = None,
+                 coarse: Optional[CoarseBars] = None, record_equity: bool = False) -> int:
+        """Replay whole OHLC arrays; returns the number of bars that needed Python-level work.
+
+        Quiet stretches (no pending order, no resting level or watch band inside the bar
+        range) are skipped with vectorized scans. If a `strategy` is given it is installed as
+        the fill listener and its `on_bar` runs on the first bar, on bars with fills and on
+        bars crossing the watch band; the context carries the sim. Liquidation is checked
+        against `mark_high`/`mark_low` (high/low if omitted). Equity is valued at
+        `mark_close` (close if omitted): kept per bar in `equity_curve` with `record_equity`,
+        and streamed into `self.metrics` when an accumulator is attached. `funding` events
+        are settled before their bar trades and passed to `strategy.on_funding`; with
+        `record_equity` the running funding PnL is kept in `funding_curve` and the position
+        size per bar in `position_curve`. With `coarse`
+        (see backtest.replay) quiet higher-timeframe blocks are skipped whole; how many were
+        skipped vs drilled into is left in `replay_stats`.
+        """
+        o = np.asarray(open_, dtype=np.float64)
+        h = np.asarray(high, dtype=np.float64)
+        l = np.asarray(low, dtype=np.float64)
+        c = np.asarray(close, dtype=np.float64)
+        t = np.asarray(ts, dtype=np.int64)
+        m = c if mark_close is None else np.asarray(mark_close, dtype=np.float64)
+        mh = h if mark_high is None else np.asarray(mark_high, dtype=np.float64)
+        ml = l if mark_low is None else np.asarray(mark_low, dtype=np.float64)
+        n = len(c)
+        self.equity_curve = np.empty(n, dtype=np.float64) if record_equity else None
+        self.position_curve = np.empty(n, dtype=np.float64) if record_equity else None
+        if funding is None:
+            funding = FundingSchedule.empty()
+        f_idx = funding.idx.tolist()
+        n_funding = len(f_idx)
+        fk = 0
+        first_event = len(self.funding_events)
+        drilled = 0
+        last_block = -1
+        prev_listener = self.fill_listener
+        if strategy is not None:
+            self.fill_listener = strategy.on_fill
+        events = 0
+        i = 0
+        wake = strategy is not None
+        prof = self.profiler
+        clock = perf_counter if prof is not None else None
+        try:
+            while i < n:
+                if clock is not None:
+                    t0 = clock()
+                j = i if wake else self._next_event(h, l, mh, ml, i, n, coarse)
+                while fk < n_funding and f_idx[fk] < i:
+                    fk += 1
+                if fk < n_funding and f_idx[fk] < j:
+                    j = f_idx[fk]
+                if clock is not None:
+                    t1 = clock()
+                    prof.add_time("scan", t1 - t0)
+                if j > i:
+                    self._advance_quiet(c, m, t, i, j)
+                    if clock is not None:
+                        prof.add_time("quiet", clock() - t1)
+                if j >= n:
+                    break
+                while fk < n_funding and f_idx[fk] == j:
+                    if clock is not None:
+                        t0 = clock()
+                    event = self.apply_funding(float(funding.rate[fk]), float(funding.mark[fk]),
+                                               int(funding.ts[fk]))
+                    event["index"] = j
+                    if strategy is not None:
+                        strategy.on_funding(event)
+                    if clock is not None:
+                        prof.add_time("funding", clock() - t0)
+                    fk += 1
+                if coarse is not None:
+                    b = coarse.block_of(j)
+                    if b != last_block:
+                        drilled += 1
+                        last_block = b
+                n_fills = len(self.fills)
+                oj, hj, lj, cj, tj = float(o[j]), float(h[j]), float(l[j]), float(c[j]), int(t[j])
+                banded = lj <= self._band_lo or hj >= self._band_hi
+                self.on_bar(oj, hj, lj, cj, tj, float(mh[j]), float(ml[j]))
+                events += 1
+                if strategy is not None and (wake or banded or len(self.fills) > n_fills):
+                    if clock is not None:
+                        t0 = clock()
+                    strategy.on_bar({"sim": self, "index": j, "ts": tj, "open": oj,
+                                     "high": hj, "low": lj, "close": cj})
+                    if clock is not None:
+                        prof.add_time("strategy", clock() - t0)
+                if clock is not None:
+                    t0 = clock()
+                if self.equity_curve is not None or self.metrics is not None:
+                    eq_j = self.equity(float(m[j]))
+                    if self.equity_curve is not None:
+                        self.equity_curve[j] = eq_j
+                        self.position_curve[j] = self.position.qty
+                    if self.metrics is not None:
+                        self.metrics.update_equity(eq_j)
+                if clock is not None:
+                    prof.add_time("equity", clock() - t0)
+                wake = False
+                i = j + 1
+        finally:
+            self.fill_listener = prev_listener
+        if record_equity:
+            settled = self.funding_events[first_event:]
+            self.funding_curve = cumulative_funding_pnl(
+                n, np.array([e["index"] for e in settled], dtype=np.int64),
+                np.array([e["paid"] for e in settled], dtype=np.float64))
+        if coarse is not None:
+            self.replay_stats = {"blocks": len(coarse), "drilled": drilled,
+                                 "skipped": len(coarse) - drilled, "event_bars": events}
+        self.event_bars += events
+        if prof is not None:
+            prof.count("bars", n)
+            prof.count("event_bars", events)
+            prof.count("funding_events", len(self.funding_events) - first_event)
+        return events
+
+    def _next_event(self, h: np.ndarray, l: np.ndarray, mh: np.ndarray, ml: np.ndarray, i: int, n: int,
+                    coarse: Optional[CoarseBars] = None) -> int:
+        """First bar index in [i, n) that can fill, cross the watch band or liquidate; n if none.
+
+        With `coarse`, whole blocks are tested on their high/low and only the first block that
+        can trigger is scanned bar by bar.
+        """
+        if self._pending_market:
+            return i
+        lo = max(self._bids.highest(), self._band_lo)
+        hi = min(self._asks.lowest(), self._band_hi)
+        liq_lo = liq_hi = None
+        if self.liq_price is not None:
+            if self.position.qty > 0:
+                liq_lo = self.liq_price
+            else:
+                liq_hi = self.liq_price
+        if lo == float("-inf") and hi == float("inf") and self.liq_price is None:
+            return n
+        if coarse is None:
+            return _scan(h, l, mh, ml, lo, hi, liq_lo, liq_hi, i, n)
+        b = coarse.block_of(i)
+        if i > coarse.start[b]:
+            # finish the block we are already drilling into
+            e = coarse.block_end(b)
+            hit = _scan(h, l, mh, ml, lo, hi, liq_lo, liq_hi, i, e)
+            if hit < e:
+                return hit
+            b += 1
+        nb = len(coarse)
+        b = _scan(coarse.high, coarse.low, coarse.mark_high, coarse.mark_low, lo, hi, liq_lo, liq_hi, b, nb)
+        if b >= nb:
+            return n
+        return _scan(h, l, mh, ml, lo, hi, liq_lo, liq_hi, int(coarse.start[b]), coarse.block_end(b))
+
+    def _advance_quiet(self, c: np.ndarray, m: np.ndarray, t: np.ndarray, i: int, j: int) -> None:
+        """Bars [i, j) touch nothing: only bookkeeping moves forward (equity is linear in mark)."""
+        if self.position_curve is not None:
+            self.position_curve[i:j] = self.position.qty
+        if self.equity_curve is not None or self.metrics is not None:
+            qm = self.position.qty * self.multiplier
+            for a in range(i, j, _SCAN_CHUNK_MAX):
+                b = min(j, a + _SCAN_CHUNK_MAX)
+                if self.equity_curve is not None:
+                    eq = self.equity_curve[a:b]
+                    eq.fill(self.balance_usdt)
+                else:
+                    eq = np.full(b - a, self.balance_usdt)
+                if qm:
+                    eq += (m[a:b] - self.position.entry_price) * qm
+                if self.metrics is not None:
+                    self.metrics.update_equity_array(eq)
+        self.last_price = float(c[j - 1])
+        self.last_ts = int(t[j - 1])
+        self.bars_processed += j - i
 
     def equity(self, mark_price: float) -> float:
         """Cash + position value(mark)."""
-        pnl = (mark_price - self.position.entry_price) * self.position.qty if self.position.qty else 0.0
+        pnl = (mark_price - self.position.entry_price) * self.position.qty * self.multiplier if self.position.qty else 0.0
         return self.balance_usdt + pnl
@@ -4,8 +4,14 @@ Exchange specs normalization for MEXC linear perpetuals.
 - Provides helpers to round price/qty, validate orders, and compute maintenance margin.
 """
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import List, Optional
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import math
+import numpy as np
+
+# Absorbs float error so that e.g. 0.3 on a 0.1 tick stays 0.3 instead of flooring to 0.2.
+_ROUND_EPS = 1e-9
 
 @dataclass
 class RiskTier:
@@ -21,24 +27,104 @@ class ContractSpecs:
     min_notional: float
     multiplier: float  # contract size per 1 qty, for linear USDT-margined often 1
     risk_tiers: List[RiskTier]
+    # Sorted tier table built once from risk_tiers (call refresh_tiers() after mutating them).
+    _tiers: List[RiskTier] = field(init=False, repr=False, compare=False)
+    _caps: np.ndarray = field(init=False, repr=False, compare=False)
+    _caps_list: List[float] = field(init=False, repr=False, compare=False)
+    _mmr: np.ndarray = field(init=False, repr=False, compare=False)
+    _cum: np.ndarray = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.refresh_tiers()
+
+    def refresh_tiers(self) -> None:
+        """Sort tiers by cap and precompute cumulative maintenance amounts.
+
+        When every tier's maintenance_amount is 0 the amounts are derived so maintenance
+        margin is continuous at tier boundaries: cum_k = cum_{k-1} + cap_{k-1} * (mmr_k - mmr_{k-1}).
+        Explicit amounts are kept as given.
+        """
+        tiers = sorted(self.risk_tiers, key=lambda t: t.notional_cap)
+        if not tiers:
+            raise ValueError(f"{self.symbol}: at least one risk tier is required")
+        caps = np.array([t.notional_cap for t in tiers], dtype=np.float64)
+        mmr = np.array([t.maintenance_margin_rate for t in tiers], dtype=np.float64)
+        cum = np.array([t.maintenance_amount for t in tiers], dtype=np.float64)
+        if not cum.any():
+            cum[1:] = np.cumsum(caps[:-1] * np.diff(mmr))
+        self._tiers = [RiskTier(t.notional_cap, t.maintenance_margin_rate, float(a)) for t, a in zip(tiers, cum)]
+        self._caps, self._mmr, self._cum = caps, mmr, cum
+        self._caps_list = caps.tolist()
 
     def round_price(self, price: float) -> float:
         ts = self.tick_size
-        return round((price // ts) * ts, 8)
+        return round(math.floor(price / ts + _ROUND_EPS) * ts, 8)
 
     def round_qty(self, qty: float) -> float:
         ls = self.lot_size
-        return round((qty // ls) * ls, 8)
+        return round(math.floor(qty / ls + _ROUND_EPS) * ls, 8)
+
+    def round_prices(self, price: np.ndarray) -> np.ndarray:
+        """Vectorized `round_price`."""
+        ts = self.tick_size
+        return np.round(np.floor(np.asarray(price, dtype=np.float64) / ts + _ROUND_EPS) * ts, 8)
+
+    def round_qtys(self, qty: np.ndarray) -> np.ndarray:
+        """Vectorized `round_qty`."""
+        ls = self.lot_size
+        return np.round(np.floor(np.asarray(qty, dtype=np.float64) / ls + _ROUND_EPS) * ls, 8)
 
     def valid_notional(self, price: float, qty: float) -> bool:
         return (price * qty) >= self.min_notional
 
     def tier_for_notional(self, notional: float) -> RiskTier:
-        tiers = sorted(self.risk_tiers, key=lambda t: t.notional_cap)
-        for t in tiers:
-            if notional <= t.notional_cap:
-                return t
-        return tiers[-1]
+        """Binary search over the precomputed caps; notionals above the last cap use the last tier."""
+        i = bisect_left(self._caps_list, notional)
+        return self._tiers[min(i, len(self._tiers) - 1)]
+
+    def maintenance_margin(self, notional: float) -> float:
+        t = self.tier_for_notional(notional)
+        return notional * t.maintenance_margin_rate - t.maintenance_amount
+
+    def tier_arrays(self, notional: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized tier lookup: (maintenance rate, cumulative amount) per notional."""
+        idx = np.minimum(np.searchsorted(self._caps, notional, side="left"), len(self._caps) - 1)
+        return self._mmr[idx], self._cum[idx]
+
+def spec_symbol(market: Dict[str, Any]) -> str:
+    """Registry symbol of a ccxt MEXC swap market (PI_USDT -> PI_USDT_PERP)."""
+    info = market.get("info") or {}
+    return f"{market.get('id') or info.get('symbol') or market['symbol']}_PERP"
+
+
+def specs_from_ccxt_market(market: Dict[str, Any], ref_price: Optional[float] = None) -> ContractSpecs:
+    """Build specs from a ccxt MEXC swap market (as stored in the markets snapshot).
+
+    MEXC states risk limits in contracts (riskBaseVol + k * riskIncrVol, riskLevelLimit tiers);
+    `ref_price` (e.g. the last close) turns them into USDT notional caps. Without it the tiers
+    are skipped and the base maintenance rate applies to any size.
+    """
+    info = market.get("info") or {}
+    contract_size = float(market.get("contractSize") or info.get("contractSize") or 1.0)
+    precision = market.get("precision") or {}
+    tick = float(precision.get("price") or info.get("priceUnit") or 0.0)
+    lot = float(precision.get("amount") or info.get("volUnit") or 1.0)
+    min_cost = ((market.get("limits") or {}).get("cost") or {}).get("min")
+    min_notional = float(min_cost) if min_cost is not None else 0.0
+    mmr = float(info.get("maintenanceMarginRate") or 0.0)
+    base_vol = float(info.get("riskBaseVol") or 0.0)
+    incr_vol = float(info.get("riskIncrVol") or 0.0)
+    incr_mmr = float(info.get("riskIncrMmr") or 0.0)
+    levels = int(info.get("riskLevelLimit") or 1)
+    if ref_price is None or base_vol <= 0 or incr_vol <= 0:
+        tiers = [RiskTier(notional_cap=float("inf"), maintenance_margin_rate=mmr, maintenance_amount=0.0)]
+    else:
+        unit = contract_size * ref_price
+        tiers = [RiskTier(notional_cap=(base_vol + k * incr_vol) * unit,
+                          maintenance_margin_rate=mmr + k * incr_mmr, maintenance_amount=0.0)
+                 for k in range(levels)]
+    return ContractSpecs(symbol=spec_symbol(market), tick_size=tick, lot_size=lot, min_notional=min_notional,
+                         multiplier=contract_size, risk_tiers=tiers)
 
 # Placeholder registry to be populated by downloader/adapters
 _SPECS_REGISTRY: dict[str, ContractSpecs] = {}
@@ -0,0 +1,58 @@
+"""
+Funding schedule for linear USDT perpetuals.
+- Funding events (irregular ts/rate rows) are mapped to the bar they fall in once, with a
+  sorted search, together with the mark price they are charged at.
+- The simulator's bar loop only stops on bars that carry an event; everything between
+  two events stays on the vectorized quiet path.
+- A position pays `qty * multiplier * mark * rate` (longs pay when the rate is positive).
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+import numpy as np
+
+from backtest.data.market import MarketArrays, funding_bar_index
+
+
+@dataclass
+class FundingSchedule:
+    idx: np.ndarray   # bar index of each event, ascending
+    ts: np.ndarray
+    rate: np.ndarray
+    mark: np.ndarray  # price the event is charged at
+
+    def __len__(self) -> int:
+        return len(self.idx)
+
+    @classmethod
+    def empty(cls) -> "FundingSchedule":
+        return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                   np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64))
+
+    @classmethod
+    def from_arrays(cls, bar_ts: np.ndarray, funding_ts: np.ndarray, rate: np.ndarray,
+                    price: np.ndarray) -> "FundingSchedule":
+        """Index raw events onto `bar_ts`; each is charged at `price` of its bar. Events before
+        the first bar are dropped."""
+        f_ts = np.asarray(funding_ts, dtype=np.int64)
+        order = np.argsort(f_ts, kind="stable")
+        f_ts = f_ts[order]
+        f_rate = np.asarray(rate, dtype=np.float64)[order]
+        idx = funding_bar_index(np.asarray(bar_ts, dtype=np.int64), f_ts)
+        keep = idx >= 0
+        idx = idx[keep]
+        return cls(idx, f_ts[keep], f_rate[keep], np.asarray(price, dtype=np.float64)[idx])
+
+    @classmethod
+    def from_market(cls, market: MarketArrays, use_mark_price: bool = True) -> "FundingSchedule":
+        """Events are already indexed in the dataset; charge them at the bar's (mark) open."""
+        idx = np.asarray(market.funding_idx, dtype=np.int64)
+        price = market.mark_open if use_mark_price else market.open
+        return cls(idx, np.asarray(market.funding_ts, dtype=np.int64),
+                   np.asarray(market.funding_rate, dtype=np.float64), np.asarray(price, dtype=np.float64)[idx])
+
+
+def cumulative_funding_pnl(n_bars: int, idx: np.ndarray, paid: np.ndarray) -> np.ndarray:
+    """Per-bar running funding PnL (negative of what was paid) from per-event payments."""
+    pnl = np.zeros(n_bars, dtype=np.float64)
+    np.subtract.at(pnl, np.asarray(idx, dtype=np.int64), np.asarray(paid, dtype=np.float64))
+    return np.cumsum(pnl, out=pnl)
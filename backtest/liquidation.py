@@ -0,0 +1,98 @@
+"""
+Liquidation and bankruptcy prices for linear USDT perpetuals (isolated and cross, up to 125x).
+- Signed position size q (base units, > 0 long), entry E, margin backing the position M,
+  maintenance rate mmr and cumulative maintenance amount cum for the position's tier.
+- Liquidation when M + q (P - E) <= |q| P mmr - cum, i.e.
+      P_liq = (q E - M - cum) / (q - |q| mmr)
+  and bankruptcy (all margin gone) at P_bk = E - M / q.
+- Isolated: M is the margin posted for the position (notional / leverage at entry).
+  Cross: M is the wallet balance available to the position.
+- Every function broadcasts over NumPy arrays, so a whole parameter sweep can be
+  screened in one call.
+"""
+from __future__ import annotations
+from typing import Dict, Optional, Union
+import numpy as np
+
+from backtest.exchange_specs import ContractSpecs, RiskTier
+
+ArrayLike = Union[float, np.ndarray]
+MAX_LEVERAGE = 125
+# Used when a symbol has no registered specs (MEXC base maintenance rate).
+DEFAULT_RISK_TIERS = [RiskTier(notional_cap=float("inf"), maintenance_margin_rate=0.004, maintenance_amount=0.0)]
+
+
+def isolated_margin(entry: ArrayLike, qty: ArrayLike, leverage: ArrayLike) -> ArrayLike:
+    lev = np.asarray(leverage, dtype=np.float64)
+    if np.any((lev < 1) | (lev > MAX_LEVERAGE)):
+        raise ValueError(f"leverage must be within 1..{MAX_LEVERAGE}")
+    return np.abs(qty) * np.asarray(entry, dtype=np.float64) / lev
+
+
+def resolve_specs(specs: Optional[ContractSpecs]) -> ContractSpecs:
+    """`specs`, or a stand-in carrying DEFAULT_RISK_TIERS for unregistered symbols."""
+    if specs is None:
+        return ContractSpecs("default", 0.0, 0.0, 0.0, 1.0, DEFAULT_RISK_TIERS)
+    return specs
+
+
+def maintenance_margin(notional: ArrayLike, mmr: ArrayLike, cum: ArrayLike = 0.0) -> ArrayLike:
+    return np.abs(notional) * mmr - cum
+
+
+def liquidation_price(entry: ArrayLike, qty: ArrayLike, margin: ArrayLike, mmr: ArrayLike,
+                      cum: ArrayLike = 0.0) -> ArrayLike:
+    """Mark price at which equity meets maintenance; nan for a flat position, <= 0 means never (long)."""
+    q = np.asarray(qty, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = (q * entry - margin - cum) / (q - np.abs(q) * mmr)
+    return np.where(q == 0, np.nan, p)
+
+
+def bankruptcy_price(entry: ArrayLike, qty: ArrayLike, margin: ArrayLike) -> ArrayLike:
+    q = np.asarray(qty, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = entry - margin / q
+    return np.where(q == 0, np.nan, p)
+
+
+def position_prices(specs: Optional[ContractSpecs], entry: ArrayLike, qty: ArrayLike, leverage: ArrayLike,
+                    margin_mode: str = "isolated", wallet: Optional[ArrayLike] = None) -> Dict[str, ArrayLike]:
+    """Liquidation/bankruptcy prices with the tier picked from the entry notional.
+
+    `qty` is in base units (contracts * multiplier). Cross margin needs `wallet`.
+    """
+    notional = np.abs(qty) * np.asarray(entry, dtype=np.float64)
+    mmr, cum = resolve_specs(specs).tier_arrays(notional)
+    if margin_mode == "cross":
+        if wallet is None:
+            raise ValueError("cross margin needs the wallet balance")
+        margin = np.asarray(wallet, dtype=np.float64)
+    else:
+        margin = isolated_margin(entry, qty, leverage)
+    return {
+        "margin": margin,
+        "maintenance_margin": maintenance_margin(notional, mmr, cum),
+        "liquidation_price": liquidation_price(entry, qty, margin, mmr, cum),
+        "bankruptcy_price": bankruptcy_price(entry, qty, margin),
+    }
+
+
+def first_breach(liq_price: ArrayLike, qty: ArrayLike, mark_low: np.ndarray, mark_high: np.ndarray) -> np.ndarray:
+    """First bar index whose mark low (longs) / high (shorts) reaches the liquidation price; len if never.
+
+    Running extremes are monotonic, so each variant is a binary search, not a scan.
+    """
+    lp = np.atleast_1d(np.asarray(liq_price, dtype=np.float64))
+    q = np.broadcast_to(np.asarray(qty, dtype=np.float64), lp.shape)
+    n = len(mark_low)
+    out = np.full(lp.shape, n, dtype=np.int64)
+    if n == 0:
+        return out
+    run_min = np.minimum.accumulate(np.asarray(mark_low, dtype=np.float64))
+    run_max = np.maximum.accumulate(np.asarray(mark_high, dtype=np.float64))
+    longs = (q > 0) & ~np.isnan(lp)
+    shorts = (q < 0) & ~np.isnan(lp)
+    out[longs] = np.searchsorted(-run_min, -lp[longs], side="left")
+    out[shorts] = np.searchsorted(run_max, lp[shorts], side="left")
+    return out
@@ -1,10 +1,170 @@
 """
 Metrics computation for backtests.
-Skeleton: converts equity curve to stats (total return, sharpe, max drawdown, win rate, profit factor, funding sum, liq count).
+Converts an equity curve to stats (total return, sharpe, sortino, max drawdown and its
+duration, win rate, profit factor, funding sum, liq count).
+- `MetricsAccumulator` is updated by the simulator per bar/fill in O(1) memory; quiet
+  stretches are folded in as arrays (moments merged, not stored).
+- `compute_metrics_array` is the vectorized after-the-fact path over an equity array.
 """
 from __future__ import annotations
-from typing import List, Dict
+from typing import List, Dict, Optional
 import math
+import numpy as np
+
+MINUTES_PER_YEAR = 525_600
+
+
+class MetricsAccumulator:
+    def __init__(self, periods_per_year: float = MINUTES_PER_YEAR):
+        self.periods_per_year = periods_per_year
+        self.start_equity: Optional[float] = None
+        self.last_equity: Optional[float] = None
+        self.bars = 0
+        # running moments of per-bar returns (Welford / Chan merge)
+        self.n_returns = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.downside_sq = 0.0
+        # drawdown
+        self.peak = -math.inf
+        self.max_drawdown = 0.0
+        self.dd_len = 0
+        self.max_dd_len = 0
+        # trades / costs
+        self.wins = 0
+        self.losses = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.funding_paid = 0.0
+        self.liquidations = 0
+
+    # ------------------------ equity ------------------------
+    def update_equity(self, equity: float) -> None:
+        prev = self.last_equity
+        if prev is None:
+            self.start_equity = equity
+        elif prev > 0:
+            r = equity / prev - 1.0
+            self.n_returns += 1
+            d = r - self.mean
+            self.mean += d / self.n_returns
+            self.m2 += d * (r - self.mean)
+            if r < 0:
+                self.downside_sq += r * r
+        if equity >= self.peak:
+            self.peak = equity
+            self.dd_len = 0
+        else:
+            self.dd_len += 1
+            self.max_dd_len = max(self.max_dd_len, self.dd_len)
+            if self.peak > 0:
+                self.max_drawdown = max(self.max_drawdown, (self.peak - equity) / self.peak)
+        self.last_equity = equity
+        self.bars += 1
+
+    def update_equity_array(self, equity: np.ndarray) -> None:
+        """Fold a run of consecutive equity values in with array ops."""
+        e = np.asarray(equity, dtype=np.float64)
+        k = e.size
+        if k == 0:
+            return
+        if self.last_equity is None:
+            self.start_equity = float(e[0])
+            prev = e[:-1]
+            cur = e[1:]
+        else:
+            prev = np.concatenate(([self.last_equity], e[:-1]))
+            cur = e
+        ok = prev > 0
+        if not ok.all():
+            prev, cur = prev[ok], cur[ok]
+        if prev.size:
+            r = cur / prev - 1.0
+            n_b = r.size
+            mean_b = float(r.mean())
+            m2_b = float(((r - mean_b) ** 2).sum())
+            n = self.n_returns + n_b
+            delta = mean_b - self.mean
+            self.mean += delta * n_b / n
+            self.m2 += m2_b + delta * delta * self.n_returns * n_b / n
+            self.n_returns = n
+            neg = r[r < 0]
+            self.downside_sq += float((neg * neg).sum())
+        peaks = np.maximum.accumulate(np.maximum(e, self.peak))
+        under = e < peaks
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dd = np.where(peaks > 0, (peaks - e) / peaks, 0.0)
+        self.max_drawdown = max(self.max_drawdown, float(dd.max()))
+        # lengths of runs of bars under water, the first continuing the carried-in run
+        at_peak = np.flatnonzero(~under)
+        if at_peak.size == 0:
+            self.dd_len += k
+            self.max_dd_len = max(self.max_dd_len, self.dd_len)
+        else:
+            longest = self.dd_len + int(at_peak[0])
+            if at_peak.size > 1:
+                longest = max(longest, int((np.diff(at_peak) - 1).max()))
+            self.dd_len = k - 1 - int(at_peak[-1])
+            self.max_dd_len = max(self.max_dd_len, longest, self.dd_len)
+        self.peak = float(peaks[-1])
+        self.last_equity = float(e[-1])
+        self.bars += k
+
+    # ------------------------ events ------------------------
+    def record_trade(self, pnl: float) -> None:
+        if pnl > 0:
+            self.wins += 1
+            self.gross_profit += pnl
+        elif pnl < 0:
+            self.losses += 1
+            self.gross_loss -= pnl
+
+    def record_funding(self, amount: float) -> None:
+        """`amount` paid by the account (negative when funding was received)."""
+        self.funding_paid += amount
+
+    def record_liquidation(self) -> None:
+        self.liquidations += 1
+
+    # ------------------------ results ------------------------
+    def result(self) -> Dict:
+        start, end = self.start_equity, self.last_equity
+        var = self.m2 / (self.n_returns - 1) if self.n_returns > 1 else 0.0
+        std = math.sqrt(var) if var > 0 else 0.0
+        downside = math.sqrt(self.downside_sq / self.n_returns) if self.n_returns else 0.0
+        ann = math.sqrt(self.periods_per_year)
+        trades = self.wins + self.losses
+        if self.gross_loss > 0:
+            profit_factor = self.gross_profit / self.gross_loss
+        else:
+            profit_factor = math.inf if self.gross_profit > 0 else 0.0
+        return {
+            "total_return": (end - start) / start if start else 0.0,
+            "sharpe_ratio": self.mean / std * ann if std else 0.0,
+            "sortino_ratio": self.mean / downside * ann if downside else 0.0,
+            "max_drawdown": self.max_drawdown,
+            "max_drawdown_duration": self.max_dd_len,
+            "win_rate": self.wins / trades if trades else 0.0,
+            "profit_factor": profit_factor,
+            "trades": trades,
+            "funding_paid": self.funding_paid,
+            "liquidations": self.liquidations,
+            "final_equity": end if end is not None else 0.0,
+        }
+
+
+def compute_metrics_array(equity: np.ndarray, trade_pnls: Optional[np.ndarray] = None,
+                          periods_per_year: float = MINUTES_PER_YEAR) -> Dict:
+    """Vectorized stats from a per-bar equity array (and optional closed-trade PnLs)."""
+    acc = MetricsAccumulator(periods_per_year)
+    acc.update_equity_array(equity)
+    if trade_pnls is not None:
+        pnl = np.asarray(trade_pnls, dtype=np.float64)
+        acc.wins = int((pnl > 0).sum())
+        acc.losses = int((pnl < 0).sum())
+        acc.gross_profit = float(pnl[pnl > 0].sum())
+        acc.gross_loss = float(-pnl[pnl < 0].sum())
+    return acc.result()
 
 
 def compute_metrics(equity_curve: List[Dict]) -> Dict:
@@ -13,19 +173,4 @@ def compute_metrics(equity_curve: List[Dict]) -> Dict:
     totals = [row["total"] for row in equity_curve if "total" in row]
     if not totals:
         return {"total_return": 0, "sharpe_ratio": 0, "max_drawdown": 0, "win_rate": 0, "profit_factor": 0}
-    start, end = totals[0], totals[-1]
-    total_return = (end - start) / start if start else 0.0
-    # Simple dd
-    peak, max_dd = totals[0], 0.0
-    for v in totals:
-        peak = max(peak, v)
-        dd = (peak - v) / peak if peak else 0.0
-        max_dd = max(max_dd, dd)
-    # Placeholder sharpe/pf/win until trades wired
-    return {
-        "total_return": total_return,
-        "sharpe_ratio": 0.0,
-        "max_drawdown": max_dd,
-        "win_rate": 0.0,
-        "profit_factor": 0.0,
-    }
+    return compute_metrics_array(np.asarray(totals, dtype=np.float64))
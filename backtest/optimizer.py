@@ -0,0 +1,362 @@
+"""
+Parallel parameter sweep over OptimizeMatrix.
+- Market arrays are copied once into a shared-memory block, or workers memory-map an
+  on-disk dataset; either way they read views instead of a pickled copy per task.
+- Results stream back as they finish and are appended to a JSONL file, so an
+  interrupted sweep resumes by skipping the combinations already on disk.
+- With a `ResultCache`, combinations already computed on identical data, config and
+  simulator version are served from it; only the misses reach the pool.
+- `run_halving` is successive halving: every combination runs on a short prefix of the
+  data, liquidated ones and the bottom of the ranking are dropped, and the survivors
+  rerun on eta-times longer prefixes until the last rung covers all bars.
+- `iter_windows` runs every combination on several bar windows as one batch of tasks;
+  walkforward.py builds on it.
+- screener.py ranks a sweep by a vectorized level-crossing estimate and sends only the
+  best combinations here (`run_screened`).
+"""
+from __future__ import annotations
+import itertools
+import json
+import math
+import multiprocessing as mp
+import os
+import sys
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from backtest.data.dataset import open_dataset
+from backtest.data.market import MarketArrays
+from backtest.engine import run_grid_backtest
+from backtest.result_cache import ResultCache, market_digest, result_key
+from config.schemas import LOWER_IS_BETTER, BacktestConfig, OptimizeMatrix
+from strategies.grid import GridParams
+
+PARAM_FIELDS = ("grid_levels", "grid_spacing_pct", "position_size_usdt", "take_profit_pct", "stop_loss_pct", "leverage")
+_ALIGN = 64
+
+
+def expand_matrix(matrix: OptimizeMatrix) -> Iterator[Dict[str, Any]]:
+    """Cartesian product of the matrix, one dict per combination."""
+    for values in itertools.product(*(getattr(matrix, f) for f in PARAM_FIELDS)):
+        yield dict(zip(PARAM_FIELDS, values))
+
+
+def combo_key(combo: Dict[str, Any]) -> str:
+    return json.dumps({f: combo[f] for f in PARAM_FIELDS}, sort_keys=True)
+
+
+class SharedMarket:
+    """Owns one shared-memory block holding every MarketArrays column."""
+
+    def __init__(self, market: MarketArrays):
+        cols = market.columns()
+        layout: Dict[str, Tuple[int, str, int]] = {}
+        offset = 0
+        for name, arr in cols.items():
+            layout[name] = (offset, arr.dtype.str, len(arr))
+            offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+        self.shm = SharedMemory(create=True, size=max(offset, 1))
+        for name, arr in cols.items():
+            off, dtype, length = layout[name]
+            np.ndarray(length, dtype=dtype, buffer=self.shm.buf, offset=off)[:] = arr
+        self.layout = {"name": self.shm.name, "columns": layout}
+
+    @staticmethod
+    def attach(layout: Dict[str, Any]) -> Tuple[SharedMemory, MarketArrays]:
+        """Map the block created by the parent; arrays are read-only views into it."""
+        shm = SharedMemory(name=layout["name"])
+        if sys.version_info < (3, 13):
+            # The parent owns the block; keep the child's tracker from unlinking it at exit.
+            resource_tracker.unregister(shm._name, "shared_memory")
+        arrays = {}
+        for name, (off, dtype, length) in layout["columns"].items():
+            view = np.ndarray(length, dtype=dtype, buffer=shm.buf, offset=off)
+            view.flags.writeable = False
+            arrays[name] = view
+        return shm, MarketArrays(**arrays)
+
+    def close(self) -> None:
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self) -> "SharedMarket":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+# Per-process state set by _init_worker
+_WORKER: Dict[str, Any] = {}
+
+
+def _init_worker(source: Dict[str, Any], config_json: str) -> None:
+    if "dataset" in source:
+        _WORKER["market"] = open_dataset(Path(source["dataset"]))
+    else:
+        _WORKER["shm"], _WORKER["market"] = SharedMarket.attach(source["shm"])
+    _WORKER["config"] = BacktestConfig.model_validate_json(config_json)
+
+
+def _run_combo(task: Tuple[Dict[str, Any], Optional[int], int]) -> Dict[str, Any]:
+    combo, bars, start = task
+    return evaluate_combo(_WORKER["market"], _WORKER["config"], combo, bars, start)
+
+
+def evaluate_combo(market: MarketArrays, config: BacktestConfig, combo: Dict[str, Any],
+                   bars: Optional[int] = None, start: int = 0) -> Dict[str, Any]:
+    """Backtest one combination (on `bars` bars from `start` if given); errors are reported on
+    the row instead of killing the sweep. Keys of `combo` beyond PARAM_FIELDS are passed
+    through to the row."""
+    row = dict(combo)
+    try:
+        cfg = config.model_copy(update={"leverage": combo["leverage"]})
+        params = GridParams(**{f: combo[f] for f in PARAM_FIELDS if f != "leverage"})
+        stop = len(market) if bars is None else min(len(market), start + bars)
+        if start > 0 or stop < len(market):
+            market = market.slice(start, stop)
+        row.update(run_grid_backtest(market, cfg, params))
+    except Exception as e:  # noqa: BLE001 - one bad combo must not abort the sweep
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def screen_liquidations(market: MarketArrays, config: BacktestConfig, combos: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Worst-case liquidation screen for a whole sweep in one vectorized pass.
+
+    For each combo, assumes every buy level (or every sell level) of the grid around the
+    first close has filled and reports that position's liquidation price and the first bar
+    whose mark reaches it (len(market) if never).
+    """
+    from backtest.exchange_specs import get_specs
+    from backtest.liquidation import first_breach, position_prices
+
+    p0 = float(market.close[0])
+    levels = np.array([c["grid_levels"] for c in combos], dtype=np.float64)
+    step = 1.0 + np.array([c["grid_spacing_pct"] for c in combos]) / 100.0
+    lev = np.array([c["leverage"] for c in combos], dtype=np.float64)
+    notional_per_level = np.array([c["position_size_usdt"] for c in combos]) * lev
+    n_buy = np.floor(levels / 2)
+    n_sell = levels - n_buy
+    # sum over k=1..n of 1/(p0 * step^-k) and 1/(p0 * step^k): geometric series
+    qty_long = notional_per_level / p0 * step * (step ** n_buy - 1) / (step - 1)
+    qty_short = notional_per_level / p0 * (1 - step ** -n_sell) / (step - 1)
+    specs = get_specs(config.symbol)
+    wallet = config.initial_balance_usdt
+    out = {}
+    for side, qty, n in (("long", qty_long, n_buy), ("short", -qty_short, n_sell)):
+        entry = n * notional_per_level / np.abs(qty)
+        pr = position_prices(specs, entry, qty, lev, config.margin_mode, wallet=wallet)
+        out[f"liq_price_{side}"] = pr["liquidation_price"]
+        out[f"liq_bar_{side}"] = first_breach(pr["liquidation_price"], qty, market.mark_low, market.mark_high)
+    df = pd.DataFrame(combos)
+    for k, v in out.items():
+        df[k] = v
+    df["liquidation_risk"] = (df["liq_bar_long"] < len(market)) | (df["liq_bar_short"] < len(market))
+    return df
+
+
+def load_results(path: Path) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    if not path.exists():
+        return rows
+    with path.open() as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                # a torn last line from an interrupted run; that combo simply reruns
+                continue
+    return rows
+
+
+def rank_results(rows: List[Dict[str, Any]], by: str = "total_return", ascending: Optional[bool] = None) -> pd.DataFrame:
+    """Best first: descending, or ascending for LOWER_IS_BETTER keys unless `ascending` is given."""
+    df = pd.DataFrame(rows)
+    if df.empty or by not in df:
+        return df
+    if ascending is None:
+        ascending = by in LOWER_IS_BETTER
+    return df.sort_values(by, ascending=ascending, kind="stable").reset_index(drop=True)
+
+
+def run_sweep(market: MarketArrays, config: BacktestConfig, matrix: OptimizeMatrix,
+              workers: Optional[int] = None, results_path: Optional[Path] = None, resume: bool = False,
+              rank_by: str = "total_return", chunksize: Optional[int] = None,
+              on_result: Optional[Callable[[Dict[str, Any], int, int], None]] = None,
+              dataset_path: Optional[Path] = None, cache: Optional[ResultCache] = None) -> pd.DataFrame:
+    """Evaluate every combination of `matrix` and return them ranked by `rank_by`.
+
+    `on_result(row, done, total)` is called as each result arrives. With `resume`, rows
+    already in `results_path` are kept and their combinations skipped. When `market` was
+    opened from `dataset_path`, workers map that dataset instead of a shared-memory copy.
+    """
+    combos = list(expand_matrix(matrix))
+    rows: List[Dict[str, Any]] = []
+    if results_path is not None:
+        results_path.parent.mkdir(parents=True, exist_ok=True)
+        if resume:
+            rows = [r for r in load_results(results_path) if "error" not in r]
+            # rewrite without torn lines or failed rows so appends stay well-formed
+            with results_path.open("w") as fh:
+                fh.writelines(json.dumps(r) + "\n" for r in rows)
+        else:
+            results_path.write_text("")
+    done_keys = {combo_key(r) for r in rows}
+    pending = [c for c in combos if combo_key(c) not in done_keys]
+    total = len(rows) + len(pending)
+    workers = max(1, workers or os.cpu_count() or 1)
+    sink = results_path.open("a") if results_path is not None else None
+    try:
+        for row in _iter_cached(market, config, pending, workers, chunksize, dataset_path, cache=cache):
+            rows.append(row)
+            if sink is not None:
+                sink.write(json.dumps(row) + "\n")
+                sink.flush()
+            if on_result is not None:
+                on_result(row, len(rows), total)
+    finally:
+        if sink is not None:
+            sink.close()
+    return rank_results(rows, by=rank_by)
+
+
+def _iter_cached(market: MarketArrays, config: BacktestConfig, pending: List[Dict[str, Any]], workers: int,
+                 chunksize: Optional[int], dataset_path: Optional[Path] = None, bars: Optional[int] = None,
+                 cache: Optional[ResultCache] = None) -> Iterator[Dict[str, Any]]:
+    """Cached rows first, then the misses from the pool (stored as they arrive)."""
+    if cache is None or not pending:
+        yield from _iter_results(market, config, pending, workers, chunksize, dataset_path, bars)
+        return
+    stop = len(market) if bars is None else min(bars, len(market))
+    for row in iter_windows(market, config, pending, [(0, stop)], workers, chunksize, dataset_path, cache):
+        del row["window"]
+        yield row
+
+
+def iter_windows(market: MarketArrays, config: BacktestConfig, combos: List[Dict[str, Any]],
+                 windows: List[Tuple[int, int]], workers: int = 1, chunksize: Optional[int] = None,
+                 dataset_path: Optional[Path] = None, cache: Optional[ResultCache] = None) -> Iterator[Dict[str, Any]]:
+    """Every combo on every bar window [start, stop), as one batch of pool tasks; each row
+    carries the index of its window under "window". With `cache`, hits are yielded first
+    and the misses are stored as they arrive (keyed by the window's own data digest). Only
+    the backtest's metrics are stored: keys the combos carry (e.g. screen_rank) come from
+    the current task, hit or miss."""
+    tasks = []
+    keys: Dict[Tuple[int, str], str] = {}
+    for w, (start, stop) in enumerate(windows):
+        if cache is not None:
+            digest = market_digest(market if (start, stop) == (0, len(market)) else market.slice(start, stop))
+            for c in combos:
+                keys[w, combo_key(c)] = result_key(digest, config, {f: c[f] for f in PARAM_FIELDS})
+        tasks.extend(({**c, "window": w}, stop - start, start) for c in combos)
+    if cache is not None:
+        found = cache.get_many(list(keys.values()))
+        misses = []
+        for task in tasks:
+            metrics = found.get(keys[task[0]["window"], combo_key(task[0])])
+            if metrics is None:
+                misses.append(task)
+            else:
+                yield {**task[0], **{k: v for k, v in metrics.items() if k not in task[0]}}
+        tasks = misses
+    task_fields = set(PARAM_FIELDS).union(*(task[0] for task in tasks))
+    for row in _iter_tasks(market, config, tasks, workers, chunksize, dataset_path):
+        if cache is not None and "error" not in row:
+            cache.put(keys[row["window"], combo_key(row)], {k: v for k, v in row.items() if k not in task_fields})
+        yield row
+
+
+def _iter_results(market: MarketArrays, config: BacktestConfig, pending: List[Dict[str, Any]],
+                  workers: int, chunksize: Optional[int], dataset_path: Optional[Path] = None,
+                  bars: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    yield from _iter_tasks(market, config, [(combo, bars, 0) for combo in pending], workers, chunksize,
+                           dataset_path)
+
+
+def _iter_tasks(market: MarketArrays, config: BacktestConfig, pending: List[Tuple[Dict[str, Any], Optional[int], int]],
+                workers: int, chunksize: Optional[int], dataset_path: Optional[Path] = None) -> Iterator[Dict[str, Any]]:
+    if not pending:
+        return
+    if workers == 1:
+        for task in pending:
+            yield evaluate_combo(market, config, *task)
+        return
+    if chunksize is None:
+        chunksize = max(1, min(64, len(pending) // (workers * 8)))
+    if dataset_path is not None:
+        with mp.Pool(workers, initializer=_init_worker,
+                     initargs=({"dataset": str(dataset_path)}, config.model_dump_json())) as pool:
+            yield from pool.imap_unordered(_run_combo, pending, chunksize=chunksize)
+        return
+    with SharedMarket(market) as shared:
+        with mp.Pool(workers, initializer=_init_worker,
+                     initargs=({"shm": shared.layout}, config.model_dump_json())) as pool:
+            yield from pool.imap_unordered(_run_combo, pending, chunksize=chunksize)
+
+
+def _is_liquidated(row: Dict[str, Any]) -> bool:
+    return bool(row.get("liquidations")) or row.get("stopped") == "liquidated"
+
+
+def halving_rungs(n_bars: int, eta: int = 3, min_fraction: float = 1 / 27) -> List[int]:
+    """Prefix lengths of each rung: n_bars * eta^-k down to `min_fraction`, ending at n_bars."""
+    if eta < 2:
+        raise ValueError("eta must be >= 2")
+    k = max(0, int(math.floor(math.log(1 / min_fraction, eta) + 1e-9)))
+    rungs = sorted({max(1, int(n_bars / eta ** i)) for i in range(k, -1, -1)})
+    rungs[-1] = n_bars
+    return rungs
+
+
+def run_halving(market: MarketArrays, config: BacktestConfig, matrix: OptimizeMatrix, eta: int = 3,
+                min_fraction: float = 1 / 27, keep: int = 10, rank_by: str = "total_return",
+                workers: Optional[int] = None, chunksize: Optional[int] = None,
+                dataset_path: Optional[Path] = None, results_path: Optional[Path] = None,
+                on_rung: Optional[Callable[[Dict[str, Any]], None]] = None,
+                cache: Optional[ResultCache] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Successive-halving sweep; returns the final rung ranked by `rank_by` and a report.
+
+    After each rung, the last included, liquidated or failed combinations are dropped; the
+    best max(ceil(len / eta), keep) of the rest carry on to the next one. The report gives
+    each rung's size and the bar-steps spent against those of an exhaustive sweep.
+    """
+    combos = list(expand_matrix(matrix))
+    workers = max(1, workers or os.cpu_count() or 1)
+    rungs = halving_rungs(len(market), eta, min_fraction)
+    survivors = combos
+    rows: List[Dict[str, Any]] = []
+    report: Dict[str, Any] = {"combos": len(combos), "eta": eta, "rungs": []}
+    bar_steps = 0
+    for r, bars in enumerate(rungs):
+        rows = list(_iter_cached(market, config, survivors, workers, chunksize, dataset_path, bars, cache))
+        bar_steps += len(survivors) * bars
+        alive = [row for row in rows if "error" not in row and not _is_liquidated(row)]
+        info = {"bars": bars, "candidates": len(rows), "liquidated": sum(map(_is_liquidated, rows)),
+                "errors": sum("error" in row for row in rows)}
+        if r < len(rungs) - 1:
+            ranked = rank_results(alive, by=rank_by)
+            n_keep = min(len(alive), max(math.ceil(len(rows) / eta), keep))
+            survivors = [{f: row[f] for f in PARAM_FIELDS} for row in ranked.head(n_keep).to_dict("records")]
+            info["survivors"] = len(survivors)
+        report["rungs"].append(info)
+        if on_rung is not None:
+            on_rung(info)
+        if not survivors:
+            alive = []
+            break
+    exhaustive = len(combos) * len(market)
+    report.update(bar_steps=bar_steps, exhaustive_bar_steps=exhaustive,
+                  saved_fraction=1 - bar_steps / exhaustive if exhaustive else 0.0)
+    if results_path is not None:
+        results_path.parent.mkdir(parents=True, exist_ok=True)
+        with results_path.open("w") as fh:
+            fh.writelines(json.dumps(row) + "\n" for row in alive)
+    return rank_results(alive, by=rank_by), report
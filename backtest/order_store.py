@@ -0,0 +1,147 @@
+"""
+Struct-of-arrays storage for the simulator's open orders.
+- One slot per order in parallel NumPy columns (price, qty, side, tif, flags, live); an
+  order is addressed by its integer handle, the slot index.
+- Slots of orders that left the book go on a free list and are reused by later orders,
+  so a handle is only meaningful while its order is open.
+- Orders may carry a string id (the `Order.id` of `ExchangeSim.place_order`); id-less
+  orders placed in bulk skip the id dict entirely and are known by their handle.
+- `queue` is only used by the simulator's trade-driven mode: volume still to print at the
+  order's price before it fills (its estimated queue ahead plus its own qty).
+"""
+from __future__ import annotations
+import sys
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+import numpy as np
+
+BUY, SELL = 1, -1
+TIF_CODES = {"GTC": 0, "IOC": 1, "FOK": 2}
+TIF_NAMES = {v: k for k, v in TIF_CODES.items()}
+FLAG_POST_ONLY = 1
+FLAG_MARKET = 2
+
+OrderKey = Union[str, int]
+
+_COLUMNS = (("price", np.float64), ("qty", np.float64), ("queue", np.float64), ("side", np.int8),
+            ("tif", np.int8), ("flags", np.uint8), ("live", np.bool_))
+
+
+class OrderStore:
+    """Open orders as parallel columns indexed by integer handle."""
+
+    def __init__(self, capacity: int = 64):
+        capacity = max(int(capacity), 1)
+        for name, dtype in _COLUMNS:
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        self.ids: List[Optional[str]] = [None] * capacity
+        self._by_id: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._top = 0  # slots [0, _top) have been handed out at least once
+        self._open = 0
+
+    def __len__(self) -> int:
+        return self._open
+
+    @property
+    def capacity(self) -> int:
+        return len(self.price)
+
+    def _grow(self, need: int) -> None:
+        cap = self.capacity
+        if need <= cap:
+            return
+        new_cap = max(need, cap * 2)
+        for name, dtype in _COLUMNS:
+            col = np.zeros(new_cap, dtype=dtype)
+            col[:cap] = getattr(self, name)
+            setattr(self, name, col)
+        self.ids.extend([None] * (new_cap - cap))
+
+    def _take(self, n: int) -> np.ndarray:
+        """`n` free handles: reused slots first (most recently freed first), then fresh ones."""
+        reuse = min(n, len(self._free))
+        taken = self._free[len(self._free) - reuse:][::-1]
+        del self._free[len(self._free) - reuse:]
+        fresh = n - reuse
+        self._grow(self._top + fresh)
+        handles = np.empty(n, dtype=np.int64)
+        handles[:reuse] = taken
+        handles[reuse:] = np.arange(self._top, self._top + fresh)
+        self._top += fresh
+        return handles
+
+    def add(self, side: int, price: float, qty: float, tif: int = 0, flags: int = 0,
+            oid: Optional[str] = None) -> int:
+        if self._free:
+            h = self._free.pop()
+        else:
+            h = self._top
+            self._grow(h + 1)
+            self._top += 1
+        self.price[h] = price
+        self.qty[h] = qty
+        self.side[h] = side
+        self.tif[h] = tif
+        self.flags[h] = flags
+        self.live[h] = True
+        if oid is not None:
+            self.ids[h] = oid
+            self._by_id[oid] = h
+        self._open += 1
+        return h
+
+    def add_many(self, side: int, price: np.ndarray, qty: np.ndarray, tif: int = 0, flags: int = 0) -> np.ndarray:
+        """Store id-less orders of one side in bulk; returns their handles in input order."""
+        handles = self._take(len(price))
+        self.price[handles] = price
+        self.qty[handles] = qty
+        self.side[handles] = side
+        self.tif[handles] = tif
+        self.flags[handles] = flags
+        self.live[handles] = True
+        self._open += len(handles)
+        return handles
+
+    def remove(self, h: int) -> None:
+        self.live[h] = False
+        oid = self.ids[h]
+        if oid is not None:
+            del self._by_id[oid]
+            self.ids[h] = None
+        self._free.append(h)
+        self._open -= 1
+
+    def remove_many(self, handles: Sequence[int]) -> None:
+        handles = np.asarray(handles, dtype=np.int64)
+        self.live[handles] = False
+        for h in handles.tolist():
+            oid = self.ids[h]
+            if oid is not None:
+                del self._by_id[oid]
+                self.ids[h] = None
+        self._free.extend(handles.tolist())
+        self._open -= len(handles)
+
+    def handle(self, key: OrderKey) -> Optional[int]:
+        """Handle of an open order given its id or handle; None if it is not open."""
+        if isinstance(key, str):
+            return self._by_id.get(key)
+        h = int(key)
+        return h if 0 <= h < self._top and self.live[h] else None
+
+    def key(self, h: int) -> OrderKey:
+        """The order's id, or its handle if it has none."""
+        oid = self.ids[h]
+        return h if oid is None else oid
+
+    def handles(self) -> np.ndarray:
+        return np.flatnonzero(self.live[:self._top])
+
+    def keys(self) -> Iterator[OrderKey]:
+        for h in self.handles().tolist():
+            yield self.key(h)
+
+    def nbytes(self) -> int:
+        """Bytes held by the columns, the id list and the id dict (ids themselves excluded)."""
+        cols = sum(getattr(self, name).nbytes for name, _ in _COLUMNS)
+        return cols + sys.getsizeof(self.ids) + sys.getsizeof(self._by_id) + sys.getsizeof(self._free)
@@ -0,0 +1,163 @@
+"""
+Multi-symbol portfolio backtests on a merged timeline.
+- Each leg is one grid on one symbol. Isolated legs own their bucket (`allocation_usdt`)
+  and liquidate on their own; cross legs draw on one shared cross wallet.
+- Legs never read each other's state until the cross account is liquidated, so every leg
+  runs as an independent job (sharded over processes) that returns its per-bar equity,
+  worst-mark equity and maintenance margin. The parent merges them onto the union of the
+  legs' timestamps as they arrive.
+- The cross account is liquidated at the first merged bar where the cross wallet's equity
+  at the worst mark of each leg falls to the legs' total maintenance margin; from there
+  the cross legs are flat with nothing left (taken over at bankruptcy).
+"""
+from __future__ import annotations
+import multiprocessing as mp
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import numpy as np
+
+from backtest.data.dataset import open_dataset
+from backtest.data.market import MarketArrays
+from backtest.engine import periods_per_year, run_grid_backtest
+from backtest.exchange_sim import ExchangeSim
+from backtest.liquidation import resolve_specs
+from backtest.metrics import compute_metrics_array
+from config.schemas import BacktestConfig, MarginMode
+from strategies.grid import GridParams
+
+
+@dataclass
+class PortfolioLeg:
+    symbol: str
+    params: GridParams
+    allocation_usdt: float
+    leverage: int = 20
+    margin_mode: MarginMode = "isolated"
+    market: Optional[MarketArrays] = None
+    dataset: Optional[Path] = None  # workers map this instead of receiving `market`
+
+
+@dataclass
+class LegCurves:
+    symbol: str
+    margin_mode: str
+    ts: np.ndarray
+    equity: np.ndarray        # at mark close
+    worst_equity: np.ndarray  # at the bar's adverse mark extreme
+    maintenance: np.ndarray
+    metrics: Dict[str, Any]
+
+
+@dataclass
+class PortfolioResult:
+    ts: np.ndarray
+    equity: np.ndarray
+    cross_equity: np.ndarray
+    legs: Dict[str, Dict[str, Any]]
+    cross_liquidated_ts: Optional[int] = None
+    metrics: Dict[str, Any] = field(default_factory=dict)
+
+
+def run_leg(leg: PortfolioLeg, config: BacktestConfig) -> LegCurves:
+    """Backtest one leg on its own timeline. Cross legs skip the per-symbol liquidation check;
+    the shared wallet is checked when the legs are merged."""
+    market = leg.market if leg.market is not None else open_dataset(Path(leg.dataset))
+    cfg = config.model_copy(update={"symbol": leg.symbol, "leverage": leg.leverage,
+                                    "margin_mode": leg.margin_mode, "initial_balance_usdt": leg.allocation_usdt})
+    sim = ExchangeSim(cfg.symbol, margin_mode=cfg.margin_mode, leverage=cfg.leverage, fees_bps=cfg.fees_bps)
+    sim.balance_usdt = cfg.initial_balance_usdt
+    sim.liquidation_enabled = leg.margin_mode != "cross"
+    metrics = run_grid_backtest(market, cfg, leg.params, sim=sim, record_equity=True)
+    mark = market.mark_close if cfg.use_mark_price else market.close
+    worst_hi = market.mark_high if cfg.use_mark_price else market.high
+    worst_lo = market.mark_low if cfg.use_mark_price else market.low
+    qm = sim.position_curve * sim.multiplier
+    worst = np.where(qm > 0, worst_lo, worst_hi)
+    mmr, cum = resolve_specs(sim.specs).tier_arrays(np.abs(qm) * mark)
+    maintenance = np.where(qm != 0, np.abs(qm) * mark * mmr - cum, 0.0)
+    return LegCurves(leg.symbol, leg.margin_mode, np.asarray(market.ts, dtype=np.int64), sim.equity_curve,
+                     sim.equity_curve + qm * (worst - mark), maintenance, metrics)
+
+
+def _on_timeline(ts: np.ndarray, leg_ts: np.ndarray, values: np.ndarray, before: float) -> np.ndarray:
+    """Leg values carried forward onto the merged timeline; `before` until the leg's first bar."""
+    pos = np.searchsorted(leg_ts, ts, side="right") - 1
+    return np.where(pos >= 0, values[np.maximum(pos, 0)], before)
+
+
+# Per-process state set by _init_worker
+_WORKER: Dict[str, Any] = {}
+
+
+def _init_worker(config_json: str) -> None:
+    _WORKER["config"] = BacktestConfig.model_validate_json(config_json)
+
+
+def _run_leg(leg: PortfolioLeg) -> LegCurves:
+    return run_leg(leg, _WORKER["config"])
+
+
+def _iter_legs(legs: List[PortfolioLeg], config: BacktestConfig, workers: int) -> Iterator[LegCurves]:
+    if workers == 1 or len(legs) == 1:
+        for leg in legs:
+            yield run_leg(leg, config)
+        return
+    # legs backed by a dataset are mapped by the worker rather than pickled over
+    tasks = [PortfolioLeg(**{**leg.__dict__, "market": None}) if leg.dataset is not None else leg for leg in legs]
+    with mp.Pool(min(workers, len(tasks)), initializer=_init_worker, initargs=(config.model_dump_json(),)) as pool:
+        yield from pool.imap_unordered(_run_leg, tasks)
+
+
+def run_portfolio(legs: List[PortfolioLeg], config: BacktestConfig, workers: Optional[int] = None,
+                  cross_wallet_usdt: Optional[float] = None,
+                  on_leg: Optional[Callable[[LegCurves, int, int], None]] = None) -> PortfolioResult:
+    """Run every leg (sharded over `workers` processes) and merge them into one account.
+
+    `cross_wallet_usdt` is the cross wallet's cash; it defaults to the sum of the cross legs'
+    allocations, and anything above that sum is held unallocated.
+    """
+    if not legs:
+        raise ValueError("portfolio needs at least one leg")
+    if len({leg.symbol for leg in legs}) != len(legs):
+        raise ValueError("one leg per symbol")
+    ts = np.unique(np.concatenate([
+        np.asarray((leg.market if leg.market is not None else open_dataset(Path(leg.dataset))).ts, dtype=np.int64)
+        for leg in legs]))
+    cross_alloc = sum(leg.allocation_usdt for leg in legs if leg.margin_mode == "cross")
+    spare = (cross_wallet_usdt - cross_alloc) if cross_wallet_usdt is not None else 0.0
+    if spare < 0:
+        raise ValueError("cross wallet is smaller than the cross legs' allocations")
+    isolated = np.zeros(len(ts))
+    cross = np.full(len(ts), spare)
+    cross_worst = cross.copy()
+    cross_mm = np.zeros(len(ts))
+    summaries: Dict[str, Dict[str, Any]] = {}
+    workers = max(1, workers or os.cpu_count() or 1)
+    for done, curves in enumerate(_iter_legs(legs, config, workers), 1):
+        alloc = next(leg.allocation_usdt for leg in legs if leg.symbol == curves.symbol)
+        eq = _on_timeline(ts, curves.ts, curves.equity, alloc)
+        if curves.margin_mode == "cross":
+            cross += eq
+            cross_worst += _on_timeline(ts, curves.ts, curves.worst_equity, alloc)
+            cross_mm += _on_timeline(ts, curves.ts, curves.maintenance, 0.0)
+        else:
+            isolated += eq
+        summaries[curves.symbol] = {"margin_mode": curves.margin_mode, **curves.metrics}
+        if on_leg is not None:
+            on_leg(curves, done, len(legs))
+    liquidated_ts = None
+    if cross_alloc:
+        hit = np.flatnonzero((cross_mm > 0) & (cross_worst <= cross_mm))
+        if hit.size:
+            k = int(hit[0])
+            liquidated_ts = int(ts[k])
+            cross[k:] = 0.0
+            for symbol, summary in summaries.items():
+                if summary["margin_mode"] == "cross":
+                    summary["stopped"] = "account_liquidated"
+    equity = isolated + cross
+    metrics = compute_metrics_array(equity, periods_per_year=periods_per_year(config.timeframe))
+    metrics["cross_liquidated"] = liquidated_ts is not None
+    return PortfolioResult(ts, equity, cross, summaries, liquidated_ts, metrics)
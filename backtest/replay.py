@@ -0,0 +1,52 @@
+"""
+Multi-resolution replay.
+- `CoarseBars` groups the fine (1m) bars into higher-timeframe blocks aligned on the
+  coarse timeframe's boundaries and keeps each block's high/low (last and mark).
+- `ExchangeSim.run_bars(..., coarse=...)` scans those blocks first: a block whose range
+  holds no resting level, watch-band edge or liquidation price is skipped whole, and only
+  the blocks where something can happen are drilled into at 1m resolution.
+- A block's high/low are the max/min of its bars, so a block is quiet exactly when every
+  bar in it is quiet: fills and equity match a plain 1m run.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+
+from utils.time import timeframe_to_ms
+
+
+@dataclass
+class CoarseBars:
+    start: np.ndarray  # fine index of each block's first bar; start[0] == 0
+    high: np.ndarray
+    low: np.ndarray
+    mark_high: np.ndarray
+    mark_low: np.ndarray
+    n_fine: int
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    @classmethod
+    def build(cls, ts: np.ndarray, high: np.ndarray, low: np.ndarray, timeframe: str,
+              mark_high: Optional[np.ndarray] = None, mark_low: Optional[np.ndarray] = None) -> "CoarseBars":
+        """Blocks of fine bars sharing one `timeframe` bucket of `ts` (gaps simply shorten a block)."""
+        t = np.asarray(ts, dtype=np.int64)
+        h = np.asarray(high, dtype=np.float64)
+        l = np.asarray(low, dtype=np.float64)
+        if t.size == 0:
+            empty = np.empty(0, dtype=np.float64)
+            return cls(np.empty(0, dtype=np.int64), empty, empty, empty, empty, 0)
+        bucket = t // timeframe_to_ms(timeframe)
+        start = np.flatnonzero(np.concatenate(([True], bucket[1:] != bucket[:-1])))
+        mh = h if mark_high is None else np.asarray(mark_high, dtype=np.float64)
+        ml = l if mark_low is None else np.asarray(mark_low, dtype=np.float64)
+        return cls(start, np.maximum.reduceat(h, start), np.minimum.reduceat(l, start),
+                   np.maximum.reduceat(mh, start), np.minimum.reduceat(ml, start), len(t))
+
+    def block_of(self, i: int) -> int:
+        return int(np.searchsorted(self.start, i, side="right")) - 1
+
+    def block_end(self, b: int) -> int:
+        return int(self.start[b + 1]) if b + 1 < len(self.start) else self.n_fine
@@ -0,0 +1,184 @@
+"""
+Content-addressed store of backtest results (SQLite).
+- Key: hash of the market data (`market_digest`), the BacktestConfig, the grid parameters,
+  the symbol's registered ContractSpecs and `sim_version()`, a digest of the simulator's
+  own source. Editing the simulator or refreshing specs therefore misses every old entry
+  instead of serving stale numbers.
+- Value: the metrics dict and, optionally, a float32 equity curve downsampled to a few
+  hundred points.
+- Size-bounded: past `max_bytes` the least recently used entries are evicted.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import sqlite3
+import time
+from dataclasses import asdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+import numpy as np
+
+from backtest.data.market import MarketArrays
+from backtest.exchange_specs import get_specs
+from config.schemas import BacktestConfig
+
+# Source files whose behaviour determines a backtest's numbers.
+_SIM_SOURCES = ("backtest/exchange_sim.py", "backtest/exchange_specs.py", "backtest/liquidation.py",
+                "backtest/funding.py", "backtest/replay.py", "backtest/metrics.py", "backtest/engine.py",
+                "backtest/order_store.py", "backtest/data/market.py", "strategies/base.py",
+                "strategies/grid.py")
+_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+@lru_cache(maxsize=None)
+def sim_version() -> str:
+    h = hashlib.sha256()
+    for rel in _SIM_SOURCES:
+        h.update(rel.encode())
+        h.update((_ROOT / rel).read_bytes())
+    return h.hexdigest()[:16]
+
+
+def market_digest(market: MarketArrays) -> str:
+    """Hash of every column's bytes (memory-mapped columns are read, not copied)."""
+    h = hashlib.blake2b(digest_size=16)
+    for name, arr in market.columns().items():
+        a = np.ascontiguousarray(arr)
+        h.update(f"{name}:{a.dtype.str}:{a.size};".encode())
+        h.update(memoryview(a).cast("B"))
+    return h.hexdigest()
+
+
+def specs_payload(symbol: str) -> Optional[Dict[str, Any]]:
+    """The registered specs of `symbol` as plain data (None when none are registered)."""
+    specs = get_specs(symbol)
+    if specs is None:
+        return None
+    return {k: v for k, v in asdict(specs).items() if not k.startswith("_")}
+
+
+def result_key(data_digest: str, config: BacktestConfig, params: Mapping[str, Any]) -> str:
+    payload = {"data": data_digest, "config": config.model_dump(mode="json"), "params": dict(params),
+               "specs": specs_payload(config.symbol), "sim": sim_version()}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def downsample(curve: np.ndarray, points: int = 500) -> np.ndarray:
+    """Last value of each of `points` equal buckets (keeps the final equity exact)."""
+    curve = np.asarray(curve)
+    if len(curve) <= points:
+        return curve.astype(np.float32)
+    idx = np.linspace(0, len(curve), points + 1).astype(np.int64)[1:] - 1
+    return curve[idx].astype(np.float32)
+
+
+class ResultCache:
+    def __init__(self, path: Optional[Path] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        if path is None:
+            from backtest.data.downloader import CACHE_DIR
+
+            path = CACHE_DIR / "results.sqlite"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(str(path), timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, metrics TEXT NOT NULL, "
+                         "equity BLOB, size INTEGER NOT NULL, created REAL NOT NULL, used REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        self._db.commit()
+
+    def get(self, key: str, with_equity: bool = False) -> Optional[Dict[str, Any]]:
+        row = self._db.execute("SELECT metrics, equity FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._db.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+        self._db.commit()
+        out = json.loads(row[0])
+        if with_equity and row[1] is not None:
+            out["equity_curve"] = np.frombuffer(row[1], dtype=np.float32)
+        return out
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        for k in range(0, len(keys), 500):
+            chunk = keys[k:k + 500]
+            marks = ",".join("?" * len(chunk))
+            for key, metrics in self._db.execute(f"SELECT key, metrics FROM results WHERE key IN ({marks})", chunk):
+                found[key] = json.loads(metrics)
+        if found:
+            now = time.time()
+            self._db.executemany("UPDATE results SET used = ? WHERE key = ?", [(now, k) for k in found])
+            self._db.commit()
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, key: str, metrics: Mapping[str, Any], equity: Optional[np.ndarray] = None) -> None:
+        blob = None if equity is None else np.asarray(equity, dtype=np.float32).tobytes()
+        text = json.dumps(dict(metrics), default=str)
+        now = time.time()
+        self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                         (key, text, blob, len(key) + len(text) + (len(blob) if blob else 0), now, now))
+        self._db.commit()
+        self._evict()
+
+    def size_bytes(self) -> int:
+        return int(self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0])
+
+    def __len__(self) -> int:
+        return int(self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0])
+
+    def _evict(self) -> None:
+        total = self.size_bytes()
+        if total <= self.max_bytes:
+            return
+        # drop least recently used entries until 10% under the bound
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        doomed = []
+        for key, size in self._db.execute("SELECT key, size FROM results ORDER BY used ASC"):
+            doomed.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        self._db.executemany("DELETE FROM results WHERE key = ?", doomed)
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def cached_grid_backtest(market: MarketArrays, config: BacktestConfig, params: Any, cache: ResultCache,
+                         equity_points: Optional[int] = None, data_digest: Optional[str] = None,
+                         refresh: bool = False) -> Dict[str, Any]:
+    """`run_grid_backtest` through the cache; with `equity_points` the downsampled equity curve
+    is stored and returned as "equity_curve" as well. `refresh` recomputes and overwrites."""
+    from backtest.engine import run_grid_backtest
+    from backtest.exchange_sim import ExchangeSim
+
+    key = result_key(data_digest or market_digest(market), config, params.model_dump())
+    hit = None if refresh else cache.get(key, with_equity=equity_points is not None)
+    if hit is not None and (equity_points is None or "equity_curve" in hit):
+        return hit
+    sim = ExchangeSim(config.symbol, margin_mode=config.margin_mode, leverage=config.leverage,
+                      fees_bps=config.fees_bps)
+    sim.balance_usdt = config.initial_balance_usdt
+    metrics = run_grid_backtest(market, config, params, sim=sim, record_equity=equity_points is not None)
+    curve = downsample(sim.equity_curve, equity_points) if equity_points is not None else None
+    cache.put(key, metrics, curve)
+    if curve is not None:
+        metrics["equity_curve"] = curve
+    return metrics
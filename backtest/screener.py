@@ -0,0 +1,256 @@
+"""
+Level-crossing screen: a vectorized estimate of a grid's outcome, used to rank a sweep
+before any combination reaches ExchangeSim.
+- The bars are walked as the simulator walks them (first close, then O->L->H->C for up
+  bars, O->H->L->C for down bars). A fill at level k re-arms k-1 and k+1, so the grid's
+  state (the level of its last fill) follows the path with one level of hysteresis;
+  `grid_state` computes it for an unbounded grid with array operations only, once per
+  distinct `grid_spacing_pct`.
+- `level_crossings` histograms how often that state crosses each pair of adjacent levels;
+  the fills of any `grid_levels` are a sum over the histogram, and the position is the
+  state clipped to the grid's levels.
+- Per (spacing, levels) the equity of one level's notional is built along the path (round
+  trips at one spacing each, fees, funding on the position held at each event, the open
+  position marked to market). Size and leverage only scale it, so the first take-profit,
+  stop-loss and liquidation crossing of every combo is a binary search on its running
+  extremes.
+- Tick rounding, contract rounding and tiers beyond the full grid's are ignored; the
+  estimate is for ranking, and `run_screened` reports its Spearman rank correlation with
+  the simulated results.
+"""
+from __future__ import annotations
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from backtest.data.market import MarketArrays
+from backtest.exchange_specs import get_specs
+from backtest.liquidation import resolve_specs
+from backtest.optimizer import _iter_cached, expand_matrix, rank_results
+from backtest.result_cache import ResultCache
+from config.schemas import BacktestConfig, OptimizeMatrix
+
+
+def bar_path(market: MarketArrays, mark: bool = False, up: Optional[np.ndarray] = None) -> np.ndarray:
+    """First close, then open/low/high/close (open/high/low/close for down bars) of every later bar.
+    With `mark`, the mark-price bars, ordered by `up` (the last-price bars' direction) if given."""
+    cols = ("mark_open", "mark_high", "mark_low", "mark_close") if mark else ("open", "high", "low", "close")
+    o, h, l, c = (np.asarray(getattr(market, name), dtype=np.float64) for name in cols)
+    up = c[1:] >= o[1:] if up is None else up
+    path = np.empty((len(o) - 1, 4))
+    path[:, 0] = o[1:]
+    path[:, 1] = np.where(up, l[1:], h[1:])
+    path[:, 2] = np.where(up, h[1:], l[1:])
+    path[:, 3] = c[1:]
+    return np.concatenate([c[:1], path.ravel()])
+
+
+def grid_state(ratio: np.ndarray) -> np.ndarray:
+    """Level of the last fill of an unbounded grid along a path of price ratios
+    log(p/p0)/log(step), starting at level 0.
+
+    A fill at level k re-arms the neighbours k-1 and k+1, so the state only moves once the
+    path reaches another level: on a level it is that level, and strictly between two it is
+    the one on the side the path entered from. That side is where the path was just before
+    its current run of points inside the same gap, so no loop over the path is needed.
+    """
+    lo = np.floor(ratio)
+    hi = np.ceil(ratio)
+    on_level = lo == hi
+    n = len(ratio)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = (lo[1:] != lo[:-1]) | on_level[1:] | on_level[:-1]
+    run_start = np.maximum.accumulate(np.where(starts, np.arange(n), 0))
+    entered_from = ratio[np.maximum(run_start - 1, 0)]
+    state = np.where(on_level | (entered_from < ratio), lo, hi)
+    return state.astype(np.int64)
+
+
+def level_crossings(state: np.ndarray) -> Tuple[np.ndarray, int]:
+    """How often the grid state moves between each pair of adjacent levels (k, k+1).
+
+    Returns the counts and the k of the first entry; each move is one fill in a grid that
+    has both levels.
+    """
+    a, b = state[:-1], state[1:]
+    moved = a != b
+    lo = np.minimum(a, b)[moved]
+    hi = np.maximum(a, b)[moved]
+    first = int(min(lo.min(), 0)) if lo.size else 0
+    size = int(max(hi.max(), 1)) - first + 1
+    # a move from a to b passes the pairs min(a, b) .. max(a, b) - 1
+    diff = np.bincount(lo - first, minlength=size) - np.bincount(hi - first, minlength=size)
+    return np.cumsum(diff), first
+
+
+def _inventory(px: np.ndarray, held: np.ndarray, step: float, n_buy: int, n_sell: int) -> np.ndarray:
+    """Unrealized PnL per unit of level notional of `held` levels (> 0 long) at px = price / p0.
+
+    Long h holds the buy levels p0 / step**j, short h the sell levels p0 * step**j (j = 1..|h|),
+    each one level's notional, so the PnL is px * slope[h] - h with slope tabled per h.
+    """
+    h = np.arange(-n_sell, n_buy + 1)
+    term = np.where(h > 0, float(step) ** h, -(float(step) ** h))
+    term[n_sell] = 0.0
+    slope = np.concatenate([np.cumsum(term[:n_sell][::-1])[::-1], np.cumsum(term[n_sell:])])
+    return px * slope[held + n_sell] - held
+
+
+def _first_at_or_below(values: np.ndarray, limits: np.ndarray) -> np.ndarray:
+    """Per limit, the first index where `values` <= limit; len(values) if never."""
+    return np.searchsorted(-np.minimum.accumulate(values), -limits, side="left")
+
+
+def screen_grid(market: MarketArrays, config: BacktestConfig, combos: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Estimated outcome of each combo, one row per combo with its parameters.
+
+    Columns: fills, round_trips, gross_pnl, fees, funding_pnl and inventory_pnl (the position
+    left at the last close) over the whole data; adverse_excursion (worst mark-to-market loss
+    per unit of notional held; cross margin: of one level's notional, whole position) against
+    liq_distance (the loss that liquidates, same units); exit ("take_profit", "stop_loss",
+    "liquidated" or "") with exit_bar; est_pnl and est_return.
+    """
+    df = pd.DataFrame(combos)
+    if df.empty or len(market) < 2:
+        return df.assign(est_return=np.zeros(len(df)))
+    n = len(market)
+    path = bar_path(market)
+    up = market.close[1:] >= market.open[1:]
+    p0 = path[0]
+    px, mark_px = path / p0, bar_path(market, mark=True, up=up) / p0
+    logp = np.log(px)
+    levels = df["grid_levels"].to_numpy(dtype=np.int64)
+    spacing = df["grid_spacing_pct"].to_numpy(dtype=np.float64)
+    lev = df["leverage"].to_numpy(dtype=np.float64)
+    notional = df["position_size_usdt"].to_numpy(dtype=np.float64) * lev
+    wallet = config.initial_balance_usdt
+    to_take = df["take_profit_pct"].to_numpy(dtype=np.float64) / 100.0 * wallet
+    to_stop = df["stop_loss_pct"].to_numpy(dtype=np.float64) / 100.0 * wallet
+    mmr, _ = resolve_specs(get_specs(config.symbol)).tier_arrays(notional * (levels - levels // 2))
+    cross = config.margin_mode == "cross"
+    liq_distance = wallet / notional if cross else 1.0 / lev - mmr
+    fee = config.fees_bps / 10_000
+
+    f_idx = np.asarray(market.funding_idx, dtype=np.int64)
+    keep = f_idx > 0  # the grid is laid out at the first close
+    f_at = 4 * f_idx[keep] - 3  # path index of each event bar's open
+    f_rate = np.asarray(market.funding_rate, dtype=np.float64)[keep]
+
+    out = {k: np.zeros(len(df)) for k in ("fills", "round_trips", "gross", "fees", "funding", "inventory",
+                                          "adverse", "est")}
+    exit_at = np.full(len(df), len(path))
+    exit_kind = np.zeros(len(df), dtype=np.int8)  # 0 none, 1 take profit, 2 stop loss, 3 liquidated
+    for s in np.unique(spacing):
+        step = 1.0 + s / 100.0
+        state = grid_state(logp / math.log(step))
+        counts, first = level_crossings(state)
+        total = np.concatenate([[0], np.cumsum(counts)])
+        for L in np.unique(levels[spacing == s]):
+            rows = np.flatnonzero((spacing == s) & (levels == L))
+            n_buy = L // 2
+            # fills: moves across the pairs (k, k+1) from -n_buy to n_sell - 1
+            lo, hi = np.clip([-n_buy - first, L - n_buy - first], 0, len(counts))
+            out["fills"][rows] = total[hi] - total[lo]
+            # everything below is per unit of one level's notional, along the path
+            held = -np.clip(state, -n_buy, L - n_buy)
+            fills = np.concatenate([[0], np.cumsum(np.abs(np.diff(held)))])
+            trips = (fills - np.abs(held)) / 2
+            funding = np.zeros(len(path))
+            np.add.at(funding, f_at, -held[f_at] * f_rate)
+            realized = trips * (step - 1) - fills * fee + np.cumsum(funding)
+            equity = realized + _inventory(px, held, step, n_buy, L - n_buy)
+            at_mark = _inventory(mark_px, held, step, n_buy, L - n_buy)
+            out["round_trips"][rows] = trips[-1]
+            out["gross"][rows] = trips[-1] * (step - 1)
+            out["fees"][rows] = fills[-1] * fee
+            out["funding"][rows] = funding.sum()
+            out["inventory"][rows] = equity[-1] - realized[-1]
+            if cross:
+                # the maintenance rate only depends on the notional: one loss path per distinct rate
+                liq = np.empty(len(rows), dtype=np.int64)
+                for m in np.unique(mmr[rows]):
+                    same = mmr[rows] == m
+                    loss = realized + at_mark - m * np.abs(held)
+                    liq[same] = _first_at_or_below(loss, -liq_distance[rows[same]])
+                    out["adverse"][rows[same]] = -loss.min()
+            else:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    per_held = np.where(held != 0, at_mark / np.abs(held), 0.0)
+                liq = _first_at_or_below(per_held, -liq_distance[rows])
+                out["adverse"][rows] = -per_held.min()
+            take = np.searchsorted(np.maximum.accumulate(equity), to_take[rows] / notional[rows], side="left")
+            stop = _first_at_or_below(equity, -to_stop[rows] / notional[rows])
+            first_exit = np.minimum(np.minimum(take, stop), liq)
+            kind = np.select([first_exit == len(path), first_exit == liq, first_exit == stop], [0, 3, 2], 1)
+            at = np.minimum(first_exit, len(path) - 1)
+            margin = wallet if cross else np.abs(held[at]) * notional[rows] / lev[rows]
+            est = np.select([kind == 1, kind == 2, kind == 3],
+                            [to_take[rows], -to_stop[rows], realized[at] * notional[rows] - margin],
+                            equity[-1] * notional[rows])
+            exit_at[rows], exit_kind[rows], out["est"][rows] = first_exit, kind, est
+
+    for k in ("gross", "fees", "funding", "inventory"):
+        out[k] *= notional
+    exit_bar = np.where(exit_kind > 0, (np.maximum(exit_at, 1) + 3) // 4, n)
+    return df.assign(fills=out["fills"], round_trips=out["round_trips"], gross_pnl=out["gross"], fees=out["fees"],
+                     funding_pnl=out["funding"], inventory_pnl=out["inventory"], adverse_excursion=out["adverse"],
+                     liq_distance=liq_distance,
+                     exit=np.array(["", "take_profit", "stop_loss", "liquidated"])[exit_kind], exit_bar=exit_bar,
+                     est_pnl=out["est"], est_return=out["est"] / wallet)
+
+
+def rank_correlation(a: Any, b: Any) -> float:
+    """Spearman correlation (Pearson on average ranks); nan with fewer than 3 pairs."""
+    x, y = pd.Series(a, dtype=np.float64), pd.Series(b, dtype=np.float64)
+    ok = x.notna().to_numpy() & y.notna().to_numpy()
+    if ok.sum() < 3:
+        return float("nan")
+    return float(x[ok].rank().corr(y[ok].rank()))
+
+
+def run_screened(market: MarketArrays, config: BacktestConfig, matrix: OptimizeMatrix, fraction: float = 0.2,
+                 keep: int = 10, audit: int = 0, rank_by: str = "total_return", workers: Optional[int] = None,
+                 chunksize: Optional[int] = None, dataset_path: Optional[Path] = None,
+                 results_path: Optional[Path] = None, cache: Optional[ResultCache] = None,
+                 seed: int = 0) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Screen every combination, simulate the best max(ceil(fraction * n), keep) of them and
+    return those ranked by `rank_by`, with a report.
+
+    `audit` screened-out combinations (drawn at random) are simulated as well, only to measure
+    the screen: the report's "spearman" is the rank correlation of est_return with
+    total_return over everything simulated, "spearman_kept" over the survivors alone.
+    """
+    combos = list(expand_matrix(matrix))
+    screen = screen_grid(market, config, combos)
+    est = screen["est_return"].to_numpy(dtype=np.float64) if combos else np.zeros(0)
+    order = np.argsort(-est, kind="stable")
+    n_keep = min(len(combos), max(math.ceil(fraction * len(combos)), keep))
+    rest = order[n_keep:]
+    audited = np.random.default_rng(seed).choice(rest, min(audit, len(rest)), replace=False) if audit else rest[:0]
+    # screen_rank and est_return ride along on the task and come back on the row
+    picked = set(order[:n_keep].tolist()) | set(audited.tolist())
+    tasks = [{**combos[i], "screen_rank": r, "est_return": float(est[i])}
+             for r, i in enumerate(order.tolist()) if i in picked]
+    workers = max(1, workers or os.cpu_count() or 1)
+    rows = list(_iter_cached(market, config, tasks, workers, chunksize, dataset_path, cache=cache))
+    ok = [row for row in rows if "error" not in row]
+    survivors = [row for row in ok if row["screen_rank"] < n_keep]
+    report = {
+        "combos": len(combos), "kept": n_keep, "audited": len(audited),
+        "screened_liquidations": int((screen["exit"] == "liquidated").sum()) if "exit" in screen else 0,
+        "spearman": rank_correlation([r["est_return"] for r in ok], [r.get("total_return") for r in ok]),
+        "spearman_kept": rank_correlation([r["est_return"] for r in survivors],
+                                          [r.get("total_return") for r in survivors]),
+        "bar_steps": len(rows) * len(market), "exhaustive_bar_steps": len(combos) * len(market),
+    }
+    report["saved_fraction"] = 1 - len(rows) / len(combos) if combos else 0.0
+    final = [row for row in rows if row["screen_rank"] < n_keep]
+    if results_path is not None:
+        results_path.parent.mkdir(parents=True, exist_ok=True)
+        with results_path.open("w") as fh:
+            fh.writelines(json.dumps(row) + "\n" for row in final)
+    return rank_results(final, by=rank_by), report
@@ -0,0 +1,207 @@
+"""
+Long-lived backtest worker service.
+- Listens on a Unix socket (service_client.socket_path()); a request is one JSON line
+  (a job), the reply is a stream of JSON lines ending with {"event": "done"} or
+  {"event": "error"}. See service_client for the job shapes.
+- Imports, the worker pool and the per-dataset state (resolved dataset paths, data
+  digests for the result cache, memory-mapped columns and registered contract specs in
+  each worker) are paid for once at startup or first use instead of on every CLI run.
+- `JobRunner` is the same code with or without a pool, so the client's in-process
+  fallback returns exactly what the service would.
+"""
+from __future__ import annotations
+import json
+import multiprocessing as mp
+import os
+import socketserver
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from backtest.data.dataset import open_dataset
+from backtest.data.market import MarketArrays
+from backtest.engine import market_dataset_path, register_market_specs
+from backtest.exchange_specs import ContractSpecs
+from backtest.optimizer import PARAM_FIELDS, evaluate_combo, expand_matrix
+from backtest.result_cache import ResultCache, cached_grid_backtest, market_digest, result_key
+from backtest.service_client import ServiceClient, socket_path
+from config.schemas import BacktestConfig, OptimizeMatrix
+from strategies.grid import GridParams
+from utils.logging import get_logger
+
+log = get_logger("grid_trader.service")
+
+# per process (service and each worker): dataset path -> (meta mtime, mapped market)
+_MARKETS: Dict[str, Tuple[float, MarketArrays]] = {}
+_CACHE: Dict[int, ResultCache] = {}  # keyed by pid: a forked worker opens its own connection
+# per process: (dataset path, meta mtime) -> the symbol's specs registered for it
+_SPECS: Dict[Tuple[str, float], Optional[ContractSpecs]] = {}
+
+
+def _market(path: str) -> MarketArrays:
+    mtime = os.stat(Path(path) / "meta.json").st_mtime
+    hit = _MARKETS.get(path)
+    if hit is None or hit[0] != mtime:
+        hit = _MARKETS[path] = (mtime, open_dataset(Path(path)))
+    return hit[1]
+
+
+def _warm_specs(path: str, config: BacktestConfig) -> None:
+    """Register the dataset's contract specs in this process once (the pool forks before any job)."""
+    key = (path, os.stat(Path(path) / "meta.json").st_mtime)
+    if key not in _SPECS:
+        _SPECS[key] = register_market_specs(config, _market(path))
+
+
+def _cache() -> ResultCache:
+    pid = os.getpid()
+    if pid not in _CACHE:
+        _CACHE.clear()
+        _CACHE[pid] = ResultCache()
+    return _CACHE[pid]
+
+
+def _backtest_task(task: Tuple[str, str, Dict[str, Any], Optional[int], str, bool]) -> Dict[str, Any]:
+    path, config_json, params, equity_points, digest, refresh = task
+    config = BacktestConfig.model_validate_json(config_json)
+    _warm_specs(path, config)
+    cache = _cache()
+    hits = cache.hits
+    metrics = cached_grid_backtest(_market(path), config, GridParams(**params), cache, equity_points=equity_points,
+                                   data_digest=digest, refresh=refresh)
+    if "equity_curve" in metrics:
+        metrics["equity_curve"] = metrics["equity_curve"].tolist()
+    return {"metrics": metrics, "cache_hit": cache.hits > hits}
+
+
+def _combo_task(task: Tuple[str, str, Dict[str, Any], Optional[str]]) -> Dict[str, Any]:
+    path, config_json, combo, digest = task
+    config = BacktestConfig.model_validate_json(config_json)
+    _warm_specs(path, config)
+    key = None
+    if digest is not None:
+        key = result_key(digest, config, {f: combo[f] for f in PARAM_FIELDS})
+        hit = _cache().get(key)
+        if hit is not None:
+            return {**combo, **hit}
+    row = evaluate_combo(_market(path), config, combo)
+    if key is not None and "error" not in row:
+        _cache().put(key, {k: v for k, v in row.items() if k not in PARAM_FIELDS})
+    return row
+
+
+class JobRunner:
+    """Runs jobs on `pool`, or in the calling process when it is None."""
+
+    def __init__(self, pool: Optional[Any] = None):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._digests: Dict[Tuple[str, float], str] = {}
+        self.jobs = 0
+
+    def dataset(self, config: BacktestConfig, with_digest: bool) -> Tuple[str, Optional[str]]:
+        """Dataset path for the config (built on first use, its symbol's specs registered) and,
+        if asked, its data digest."""
+        with self._lock:  # concurrent first requests for one range must not both build it
+            path = str(market_dataset_path(config))
+            _warm_specs(path, config)
+            if not with_digest:
+                return path, None
+            key = (path, os.stat(Path(path) / "meta.json").st_mtime)
+            if key not in self._digests:
+                self._digests[key] = market_digest(_market(path))
+            return path, self._digests[key]
+
+    def run(self, job: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        op = job.get("op")
+        t0 = time.perf_counter()
+        self.jobs += 1
+        if op == "ping":
+            yield {"event": "pong", "pid": os.getpid(), "jobs": self.jobs, "datasets": len(self._digests)}
+        elif op == "backtest":
+            yield from self._backtest(job)
+        elif op == "sweep":
+            yield from self._sweep(job)
+        else:
+            raise ValueError(f"unknown op {op!r}")
+        yield {"event": "done", "elapsed_s": time.perf_counter() - t0}
+
+    def _backtest(self, job: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        config = BacktestConfig(**job.get("config", {}))
+        params = GridParams(**job.get("params", {})).model_dump()
+        path, digest = self.dataset(config, with_digest=True)
+        task = (path, config.model_dump_json(), params, job.get("equity_points"), digest, bool(job.get("refresh")))
+        out = _backtest_task(task) if self.pool is None else self.pool.apply(_backtest_task, (task,))
+        yield {"event": "result", "bars": len(_market(path)), **out}
+
+    def _sweep(self, job: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        config = BacktestConfig(**job.get("config", {}))
+        combos = list(expand_matrix(OptimizeMatrix(**job["matrix"])))
+        path, digest = self.dataset(config, with_digest=job.get("cache", True))
+        config_json = config.model_dump_json()
+        tasks = [(path, config_json, c, digest) for c in combos]
+        rows = map(_combo_task, tasks) if self.pool is None else self.pool.imap_unordered(_combo_task, tasks)
+        for row in rows:
+            yield {"event": "row", "row": row}
+
+
+def _plain(value: Any) -> Any:
+    """numpy scalars as Python numbers; anything else unknown as its str."""
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            job = json.loads(line)
+            if job.get("op") == "shutdown":
+                self._send({"event": "done"})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+            for event in self.server.runner.run(job):
+                self._send(event)
+        except BrokenPipeError:
+            pass  # client went away; its remaining results are dropped
+        except Exception as e:  # noqa: BLE001 - report to the client, keep serving
+            log.exception("job failed")
+            self._send({"event": "error", "error": f"{type(e).__name__}: {e}"})
+
+    def _send(self, event: Dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(event, default=_plain).encode() + b"\n")
+        self.wfile.flush()
+
+
+class WorkerService(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: Optional[Path] = None, workers: Optional[int] = None):
+        self.path = Path(path or socket_path())
+        if self.path.exists():
+            if ServiceClient(self.path).available():
+                raise RuntimeError(f"a service is already listening on {self.path}")
+            self.path.unlink()  # left behind by a service that died
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        # forked workers inherit the imports; tasks carry the dataset path, never arrays. Jobs
+        # always go to the pool (even of one), so request threads never share a cache connection.
+        self.pool = mp.get_context("fork").Pool(self.workers)
+        self.runner = JobRunner(self.pool)
+        super().__init__(str(self.path), _Handler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.pool.terminate()
+        self.pool.join()
+        self.path.unlink(missing_ok=True)
+
+
+def serve(path: Optional[Path] = None, workers: Optional[int] = None) -> None:
+    with WorkerService(path, workers) as server:
+        log.info("backtest service on %s (%d workers)", server.path, server.workers)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
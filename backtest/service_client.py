@@ -0,0 +1,85 @@
+"""
+Client of the backtest worker service (service.py); standard library only, so a CLI
+that talks to a running service starts without importing numpy, pandas or ccxt.
+- Jobs are JSON objects:
+    {"op": "backtest", "config": {BacktestConfig fields}, "params": {GridParams fields},
+     "equity_points": int | null, "refresh": bool}
+        -> {"event": "result", "metrics": {...}, "cache_hit": bool, "bars": int}
+    {"op": "sweep", "config": {...}, "matrix": {OptimizeMatrix lists}, "cache": bool}
+        -> one {"event": "row", "row": {...}} per combination, in completion order
+    {"op": "ping"} -> {"event": "pong", ...};  {"op": "shutdown"}
+  Every stream ends with {"event": "done", "elapsed_s": float}; a failed job ends with
+  {"event": "error", "error": str} instead.
+- `run_job` falls back to running the job in-process (same code, no pool) when no
+  service is listening.
+"""
+from __future__ import annotations
+import json
+import os
+import socket
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+SOCKET_ENV = "GRID_TRADER_SOCKET"
+
+
+class ServiceError(RuntimeError):
+    """The service ran the job and reported a failure."""
+
+
+def socket_path() -> Path:
+    """$GRID_TRADER_SOCKET, else a per-user socket in the temp dir (Unix socket paths are short)."""
+    env = os.getenv(SOCKET_ENV)
+    if env:
+        return Path(env)
+    return Path(tempfile.gettempdir()) / f"grid_trader-{os.getuid()}.sock"
+
+
+class ServiceClient:
+    def __init__(self, path: Optional[Path] = None, timeout_s: Optional[float] = None):
+        self.path = Path(path or socket_path())
+        self.timeout_s = timeout_s
+
+    def available(self) -> bool:
+        """A service is accepting connections on the socket."""
+        if not self.path.exists():
+            return False
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.settimeout(1.0)
+                s.connect(str(self.path))
+            return True
+        except OSError:
+            return False
+
+    def stream(self, job: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Send `job` and yield its events up to "done"; raises ServiceError on "error"."""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(self.timeout_s)
+            s.connect(str(self.path))
+            s.sendall(json.dumps(job).encode() + b"\n")
+            with s.makefile("rb") as fh:
+                for line in fh:
+                    event = json.loads(line)
+                    if event.get("event") == "error":
+                        raise ServiceError(event.get("error", "unknown error"))
+                    yield event
+                    if event.get("event") == "done":
+                        return
+        raise ServiceError("service closed the connection before the job finished")
+
+
+def run_job(job: Dict[str, Any], client: Optional[ServiceClient] = None, fallback: bool = True,
+            local: bool = False) -> Iterator[Dict[str, Any]]:
+    """Events of `job` from the service, or from an in-process run when none is listening
+    (or `local` is set)."""
+    client = client or ServiceClient()
+    if not local and client.available():
+        yield from client.stream(job)
+        return
+    if not fallback:
+        raise ServiceError(f"no service listening on {client.path}")
+    from backtest.service import JobRunner  # the heavy imports, only on this path
+
+    yield from JobRunner().run(job)
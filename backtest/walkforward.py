@@ -0,0 +1,207 @@
+"""
+Walk-forward optimization.
+- The history is cut into consecutive test periods (e.g. "1M" calendar months, "30d").
+  Fold k tests on period k and trains on the `train` span before it: a fixed number of
+  periods (rolling) or everything since the first bar (anchored).
+- Segmented mode (default): every combination runs once per period, the grid restarted
+  at the period's first bar, and a fold's training score is combined from the periods
+  it spans (returns compounded, drawdown the worst, counts summed). Overlapping folds
+  share those per-period runs, so 12 monthly folds cost about one sweep over the data
+  instead of 12 sweeps over their training spans. Continuous mode backtests each fold's
+  training span in one piece instead.
+- All runs of all folds go to the pool as one batch (data shared once, as in
+  optimizer.run_sweep), and through the `ResultCache` when one is given.
+- The best combination of each fold is rerun on its test period; the out-of-sample
+  equity curves are chained (each period starts from the previous one's final equity)
+  into one curve with its own metrics.
+"""
+from __future__ import annotations
+import math
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+
+from backtest.data.market import MarketArrays
+from backtest.engine import periods_per_year, run_grid_backtest
+from backtest.exchange_sim import ExchangeSim
+from backtest.metrics import compute_metrics_array
+from backtest.optimizer import PARAM_FIELDS, _is_liquidated, combo_key, expand_matrix, iter_windows
+from backtest.result_cache import ResultCache
+from config.schemas import LOWER_IS_BETTER, BacktestConfig, OptimizeMatrix
+from strategies.grid import GridParams
+from utils.time import timeframe_to_ms
+
+
+@dataclass
+class Fold:
+    index: int
+    train: Tuple[int, int]  # bar range [start, stop)
+    test: Tuple[int, int]
+    train_periods: Tuple[int, int]  # period range [first, last)
+    test_period: int
+
+
+@dataclass
+class WalkForwardResult:
+    folds: pd.DataFrame  # one row per fold: ranges, chosen params, train score, test metrics
+    ts: np.ndarray  # out-of-sample bars
+    equity: np.ndarray
+    metrics: Dict[str, Any]
+    report: Dict[str, Any]
+
+
+def _offset(period: str) -> Union[pd.DateOffset, pd.Timedelta]:
+    """"3M" -> 3 calendar months; anything utils.time understands ("30d", "1w") -> fixed length."""
+    if period.endswith("M") and period[:-1].isdigit():
+        return pd.DateOffset(months=int(period[:-1]))
+    return pd.Timedelta(milliseconds=timeframe_to_ms(period))
+
+
+def period_bounds(ts: np.ndarray, period: str) -> np.ndarray:
+    """Bar indices where consecutive `period`s start from the first bar, plus len(ts)."""
+    if not len(ts):
+        return np.zeros(1, dtype=np.int64)
+    step = _offset(period)
+    t = pd.Timestamp(int(ts[0]), unit="ms", tz="UTC")
+    last = int(ts[-1])
+    edges = []
+    while t.value // 1_000_000 <= last:
+        edges.append(t.value // 1_000_000)
+        t = t + step
+    idx = np.searchsorted(ts, np.array(edges, dtype=np.int64), side="left")
+    return np.unique(np.append(idx, len(ts))).astype(np.int64)
+
+
+def walk_forward_folds(ts: np.ndarray, train: str, test: str, anchored: bool = False) -> Tuple[List[Fold], np.ndarray]:
+    """Folds over `ts` and the period bounds they index; `train` must be whole `test` periods."""
+    bounds = period_bounds(ts, test)
+    start = pd.Timestamp(int(ts[0]), unit="ms", tz="UTC")
+    train_end = (start + _offset(train)).value // 1_000_000
+    n_train = int(np.searchsorted(ts, train_end, side="left"))
+    hit = np.flatnonzero(bounds == n_train)
+    if n_train >= len(ts) or not hit.size:
+        raise ValueError(f"train {train!r} must be a whole number of test periods ({test!r}) shorter than the data")
+    first_test = int(hit[0])
+    folds = []
+    for j in range(first_test, len(bounds) - 1):
+        lo = 0 if anchored else j - first_test
+        folds.append(Fold(index=len(folds), train=(int(bounds[lo]), int(bounds[j])),
+                          test=(int(bounds[j]), int(bounds[j + 1])), train_periods=(lo, j), test_period=j))
+    return folds, bounds
+
+
+# what combine_periods scores a fold by, and so what a segmented walk-forward can rank by
+COMBINED_METRICS = ("total_return", "final_equity", "max_drawdown", "sharpe_ratio", "sortino_ratio", "win_rate",
+                    "trades", "fills", "funding_paid", "liquidations")
+
+
+def combine_periods(rows: List[Dict[str, Any]], initial: float) -> Dict[str, Any]:
+    """Training score of a fold from its per-period rows (same combination)."""
+    total = math.prod(1.0 + r["total_return"] for r in rows) - 1.0
+    trades = sum(r["trades"] for r in rows)
+    return {
+        "total_return": total,
+        "final_equity": initial * (1.0 + total),
+        "max_drawdown": max(r["max_drawdown"] for r in rows),
+        "sharpe_ratio": float(np.mean([r["sharpe_ratio"] for r in rows])),
+        "sortino_ratio": float(np.mean([r["sortino_ratio"] for r in rows])),
+        "win_rate": sum(r["win_rate"] * r["trades"] for r in rows) / trades if trades else 0.0,
+        "trades": trades,
+        "fills": sum(r["fills"] for r in rows),
+        "funding_paid": sum(r["funding_paid"] for r in rows),
+        "liquidations": sum(r["liquidations"] for r in rows),
+    }
+
+
+def _pick(scores: Dict[str, Dict[str, Any]], rank_by: str) -> Optional[str]:
+    sign = -1.0 if rank_by in LOWER_IS_BETTER else 1.0
+    best, best_val = None, -math.inf
+    for key, row in scores.items():
+        val = row.get(rank_by)
+        if val is not None and sign * val > best_val:
+            best, best_val = key, sign * val
+    return best
+
+
+def _oos_curve(market: MarketArrays, config: BacktestConfig, combo: Dict[str, Any],
+               window: Tuple[int, int]) -> Tuple[np.ndarray, Dict[str, Any]]:
+    cfg = config.model_copy(update={"leverage": combo["leverage"]})
+    params = GridParams(**{f: combo[f] for f in PARAM_FIELDS if f != "leverage"})
+    sim = ExchangeSim(cfg.symbol, margin_mode=cfg.margin_mode, leverage=cfg.leverage, fees_bps=cfg.fees_bps)
+    sim.balance_usdt = cfg.initial_balance_usdt
+    metrics = run_grid_backtest(market.slice(*window), cfg, params, sim=sim, record_equity=True)
+    return sim.equity_curve, metrics
+
+
+def run_walk_forward(market: MarketArrays, config: BacktestConfig, matrix: OptimizeMatrix, train: str = "3M",
+                     test: str = "1M", anchored: bool = False, segmented: bool = True,
+                     rank_by: str = "total_return", workers: Optional[int] = None,
+                     chunksize: Optional[int] = None, dataset_path: Optional[Path] = None,
+                     cache: Optional[ResultCache] = None) -> WalkForwardResult:
+    """Pick the best combination per fold on its training span and stitch the test periods.
+
+    Combinations that were liquidated or failed anywhere in a training span are not
+    eligible. The report compares the bar-steps run with those of independent sweeps
+    over every fold's training span. Segmented mode ranks by one of COMBINED_METRICS.
+    """
+    if segmented and rank_by not in COMBINED_METRICS:
+        raise ValueError(f"rank_by {rank_by!r} is not combined across periods; use one of {COMBINED_METRICS} "
+                         f"or continuous mode")
+    combos = list(expand_matrix(matrix))
+    workers = max(1, workers or os.cpu_count() or 1)
+    folds, bounds = walk_forward_folds(market.ts, train, test, anchored)
+    if segmented:
+        used = range(min(f.train_periods[0] for f in folds), max(f.train_periods[1] for f in folds))
+        windows = [(int(bounds[p]), int(bounds[p + 1])) for p in used]
+        window_of = {p: w for w, p in enumerate(used)}
+    else:
+        windows = [f.train for f in folds]
+    per_window: Dict[Tuple[int, str], Dict[str, Any]] = {}
+    for row in iter_windows(market, config, combos, windows, workers, chunksize, dataset_path, cache):
+        per_window[row["window"], combo_key(row)] = row
+
+    by_key = {combo_key(c): c for c in combos}
+    records = []
+    curves = []
+    equity_scale = config.initial_balance_usdt
+    for fold in folds:
+        scores: Dict[str, Dict[str, Any]] = {}
+        for key in by_key:
+            if segmented:
+                rows = [per_window[window_of[p], key] for p in range(*fold.train_periods)]
+            else:
+                rows = [per_window[fold.index, key]]
+            if any("error" in r or _is_liquidated(r) for r in rows):
+                continue
+            scores[key] = combine_periods(rows, config.initial_balance_usdt) if segmented else rows[0]
+        best = _pick(scores, rank_by)
+        record = {"fold": fold.index, "train_start": int(market.ts[fold.train[0]]),
+                  "train_end": int(market.ts[fold.train[1] - 1]), "test_start": int(market.ts[fold.test[0]]),
+                  "test_end": int(market.ts[fold.test[1] - 1]), "candidates": len(scores)}
+        if best is None:
+            # nothing survived training: stay flat for the test period
+            curve = np.full(fold.test[1] - fold.test[0], config.initial_balance_usdt)
+        else:
+            combo = by_key[best]
+            curve, test_metrics = _oos_curve(market, config, combo, fold.test)
+            record.update(combo)
+            record[f"train_{rank_by}"] = scores[best][rank_by]
+            record.update({f"test_{k}": v for k, v in test_metrics.items()
+                           if k in ("total_return", "max_drawdown", "sharpe_ratio", "trades", "liquidations")})
+        curves.append(curve * (equity_scale / config.initial_balance_usdt))
+        equity_scale = float(curves[-1][-1])
+        records.append(record)
+
+    oos = slice(folds[0].test[0], folds[-1].test[1])
+    equity = np.concatenate(curves)
+    bar_steps = len(combos) * sum(b - a for a, b in windows)
+    independent = len(combos) * sum(f.train[1] - f.train[0] for f in folds)
+    report = {"folds": len(folds), "combos": len(combos), "segmented": segmented, "anchored": anchored,
+              "windows": len(windows), "bar_steps": bar_steps, "independent_bar_steps": independent,
+              "saved_fraction": 1 - bar_steps / independent if independent else 0.0}
+    metrics = compute_metrics_array(equity, periods_per_year=periods_per_year(config.timeframe))
+    return WalkForwardResult(folds=pd.DataFrame(records), ts=np.asarray(market.ts[oos]), equity=equity,
+                             metrics=metrics, report=report)
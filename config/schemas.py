@@ -16,7 +16,9 @@ class BacktestConfig(BaseModel):
     start: str = Field(default="2024-01-01")
     end: str = Field(default="2024-12-31")
     fees_bps: float = Field(default=0.0)  # zero for PI/USDT
+    initial_balance_usdt: float = Field(default=1000.0, gt=0)
     use_mark_price: bool = True
+    replay_timeframe: Optional[str] = None  # e.g. "1h": skip quiet coarse blocks, drill into `timeframe` bars
 
 class GridParams(BaseModel):
     grid_levels: int = Field(ge=2)
@@ -33,3 +35,6 @@ class OptimizeMatrix(BaseModel):
     take_profit_pct: List[float]
     stop_loss_pct: List[float]
     leverage: List[int]
+
+# rank keys where the smallest value is the best combination (everything else ranks descending)
+LOWER_IS_BETTER = frozenset({"max_drawdown", "max_drawdown_duration", "funding_paid", "liquidations"})
@@ -0,0 +1 @@
+"""Execution package."""
@@ -0,0 +1,150 @@
+"""
+Asyncio grid executor.
+- Keeps the grid as a target state (`GridTarget`) and its own view of the orders resting
+  on the exchange. Events (price updates, fills) are taken off the gateway queue; every
+  event already waiting is applied before one reconciliation, so a burst of fills costs
+  one diff, not one per fill.
+- Each reconciliation sends only the diff (see reconcile.py), in batches of the gateway's
+  `max_batch`: cancel batches concurrently first, then placement batches concurrently.
+- `stats` tracks what matters in production: decision-to-order latency (event taken off
+  the queue until the last batch is acknowledged) and API calls per grid shift.
+"""
+from __future__ import annotations
+import asyncio
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Dict, Hashable, List, Optional
+import numpy as np
+
+from execution.gateway import Gateway
+from execution.reconcile import OrderIntent, reconcile
+from execution.target import GridTarget
+from utils.logging import get_logger
+
+
+@dataclass
+class ExecutionStats:
+    events: int = 0
+    fills: int = 0
+    syncs: int = 0  # reconciliations that sent something
+    api_calls: int = 0
+    placed: int = 0
+    rejected: int = 0
+    canceled: int = 0
+    latencies_s: List[float] = field(default_factory=list)
+
+    def summary(self, shifts: int) -> Dict[str, Any]:
+        lat = np.asarray(self.latencies_s) * 1e3
+        out = {k: v for k, v in self.__dict__.items() if k != "latencies_s"}
+        out["shifts"] = shifts
+        out["calls_per_shift"] = self.api_calls / shifts if shifts else 0.0
+        if lat.size:
+            out.update(latency_p50_ms=float(np.percentile(lat, 50)), latency_p99_ms=float(np.percentile(lat, 99)),
+                       latency_max_ms=float(lat.max()))
+        return out
+
+
+class GridExecutor:
+    def __init__(self, gateway: Gateway, target: GridTarget):
+        self.gateway = gateway
+        self.target = target
+        self.resting: Dict[Hashable, OrderIntent] = {}
+        self.stats = ExecutionStats()
+        self.last_price: Optional[float] = None
+        self.stopped = False
+        self.log = get_logger("grid_trader.execution")
+
+    def _apply(self, event: Dict[str, Any]) -> bool:
+        """Update state from one event; False on the end event."""
+        kind = event["type"]
+        if kind == "end":
+            return False
+        self.stats.events += 1
+        if kind == "price":
+            self.last_price = event["price"]
+            if not self.target.started:
+                self.target.start(event["price"])
+        elif kind == "fill":
+            self.stats.fills += 1
+            if event.get("liquidation"):
+                # the exchange cancelled everything resting; stop placing
+                self.log.warning("position liquidated at %s, executor stopped", event["price"])
+                self.resting.clear()
+                self.stopped = True
+                return True
+            order = self.resting.get(event["order_id"])
+            if order is not None:
+                left = order.qty - event["qty"]
+                if left <= 1e-12 * order.qty:
+                    del self.resting[event["order_id"]]
+                else:
+                    self.resting[event["order_id"]] = OrderIntent(order.side, order.price, left, order.post_only)
+            if self.target.started:
+                self.target.on_fill(event["side"], event["price"])
+        return True
+
+    def _batches(self, items: List[Any]) -> List[List[Any]]:
+        n = self.gateway.max_batch
+        return [items[k:k + n] for k in range(0, len(items), n)]
+
+    async def sync(self, t0: Optional[float] = None) -> bool:
+        """Send the diff between target and resting orders; True if anything was sent."""
+        t0 = perf_counter() if t0 is None else t0
+        specs = self.target.specs
+        diff = reconcile(self.target.orders(self.last_price), self.resting, specs.tick_size if specs else None,
+                         specs.lot_size if specs else None)
+        if not diff:
+            return False
+        gw = self.gateway
+        calls = gw.api_calls
+        if diff.cancel:
+            await asyncio.gather(*(gw.cancel_orders(b) for b in self._batches(diff.cancel)))
+            for oid in diff.cancel:
+                self.resting.pop(oid, None)
+            self.stats.canceled += len(diff.cancel)
+        if diff.place:
+            batches = self._batches(diff.place)
+            results = await asyncio.gather(*(gw.place_orders(b) for b in batches))
+            for batch, ids in zip(batches, results):
+                for order, oid in zip(batch, ids):
+                    if oid is None:
+                        self.stats.rejected += 1
+                    else:
+                        self.resting[oid] = order
+                        self.stats.placed += 1
+        self.stats.api_calls += gw.api_calls - calls
+        self.stats.syncs += 1
+        self.stats.latencies_s.append(perf_counter() - t0)
+        return True
+
+    async def refresh(self) -> None:
+        """Replace the local view with the exchange's open orders (after a reconnect)."""
+        self.resting = dict(await self.gateway.open_orders())
+
+    async def run(self) -> Dict[str, Any]:
+        """Process events until the gateway sends its end event; returns `stats.summary`."""
+        queue = self.gateway.queue
+        running = True
+        while running:
+            event = await queue.get()
+            t0 = perf_counter()
+            taken = 1
+            running = self._apply(event)
+            while running and not queue.empty():
+                taken += 1
+                running = self._apply(queue.get_nowait())
+            try:
+                if self.target.started and not self.stopped:
+                    await self.sync(t0)
+            finally:
+                for _ in range(taken):
+                    queue.task_done()
+        summary = self.stats.summary(self.target.shifts)
+        self.log.info("execution stats %s", summary)
+        return summary
+
+    async def cancel_all(self) -> None:
+        ids = list(self.resting)
+        if ids:
+            await asyncio.gather(*(self.gateway.cancel_orders(b) for b in self._batches(ids)))
+            self.resting.clear()
@@ -0,0 +1,144 @@
+"""
+Exchange gateways for the executor.
+- A gateway places and cancels batches of orders, lists the resting ones and delivers
+  price updates and fills as events on `queue`:
+  {"type": "price", "price", "ts"}, {"type": "fill", "order_id", "side", "price", "qty", "ts"}
+  and a final {"type": "end"}.
+- `api_calls` counts requests: one per batch, not per order.
+- `SimGateway` runs on ExchangeSim for offline paper trading and tests: bars are pushed
+  through the simulator, its fills become events. `lockstep` replay waits until the
+  executor has handled each bar, which makes a run deterministic.
+- `CcxtGateway` talks to a ccxt.pro client (createOrders/cancelOrders, watchTicker and
+  watchMyTrades).
+"""
+from __future__ import annotations
+import asyncio
+import itertools
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Hashable, List, Optional
+import numpy as np
+
+from backtest.data.market import MarketArrays
+from backtest.exchange_sim import ExchangeSim, Order
+from execution.reconcile import OrderIntent
+
+DEFAULT_MAX_BATCH = 20
+
+
+class Gateway(ABC):
+    def __init__(self, max_batch: int = DEFAULT_MAX_BATCH):
+        self.max_batch = max_batch
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.api_calls = 0
+
+    @abstractmethod
+    async def place_orders(self, orders: List[OrderIntent]) -> List[Optional[Hashable]]:
+        """Place one batch; the id of each order, None where it was rejected."""
+
+    @abstractmethod
+    async def cancel_orders(self, ids: List[Hashable]) -> None:
+        """Cancel one batch (unknown ids are ignored)."""
+
+    @abstractmethod
+    async def open_orders(self) -> Dict[Hashable, OrderIntent]:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class SimGateway(Gateway):
+    def __init__(self, sim: ExchangeSim, latency_s: float = 0.0, max_batch: int = DEFAULT_MAX_BATCH):
+        super().__init__(max_batch)
+        self.sim = sim
+        self.latency_s = latency_s
+        self._ids = itertools.count(1)
+        sim.fill_listener = self._on_fill
+
+    def _on_fill(self, fill: Dict[str, Any]) -> None:
+        self.queue.put_nowait({"type": "fill", **fill})
+
+    async def _request(self) -> None:
+        self.api_calls += 1
+        await asyncio.sleep(self.latency_s)
+
+    async def place_orders(self, orders: List[OrderIntent]) -> List[Optional[Hashable]]:
+        await self._request()
+        ids: List[Optional[Hashable]] = []
+        for o in orders:
+            # ids are never reused, unlike the simulator's handles: a late fill can't hit a new order
+            order = Order(id=f"x{next(self._ids)}", side=o.side, type="limit", price=o.price, qty=o.qty,
+                          post_only=o.post_only)
+            self.sim.place_order(order)
+            ids.append(None if order.status in ("rejected", "expired") else order.id)
+        return ids
+
+    async def cancel_orders(self, ids: List[Hashable]) -> None:
+        await self._request()
+        self.sim.cancel_orders(ids)
+
+    async def open_orders(self) -> Dict[Hashable, OrderIntent]:
+        await self._request()
+        return {oid: OrderIntent(o.side, o.price, o.qty, o.post_only) for oid, o in self.sim.open_orders.items()}
+
+    def push_bar(self, o: float, h: float, l: float, c: float, ts: int) -> None:
+        self.sim.on_bar(o, h, l, c, ts)
+        self.queue.put_nowait({"type": "price", "price": c, "ts": ts})
+
+    async def replay(self, market: MarketArrays, pace_s: float = 0.0, lockstep: bool = True) -> None:
+        """Push every bar of `market`, then the end event."""
+        cols = [np.asarray(a).tolist() for a in (market.open, market.high, market.low, market.close, market.ts)]
+        for o, h, l, c, ts in zip(*cols):
+            self.push_bar(o, h, l, c, ts)
+            if lockstep:
+                await self.queue.join()
+            await asyncio.sleep(pace_s)
+        self.queue.put_nowait({"type": "end"})
+
+
+class CcxtGateway(Gateway):
+    def __init__(self, exchange: Any, symbol: str, max_batch: int = DEFAULT_MAX_BATCH):
+        super().__init__(max_batch)
+        self.exchange = exchange
+        self.symbol = symbol
+        self._watchers: List[asyncio.Task] = []
+
+    async def place_orders(self, orders: List[OrderIntent]) -> List[Optional[Hashable]]:
+        self.api_calls += 1
+        batch = [{"symbol": self.symbol, "type": "limit", "side": o.side, "amount": o.qty, "price": o.price,
+                  "params": {"postOnly": o.post_only}} for o in orders]
+        placed = await self.exchange.create_orders(batch)
+        return [p.get("id") if p.get("status") not in ("rejected", "canceled") else None for p in placed]
+
+    async def cancel_orders(self, ids: List[Hashable]) -> None:
+        self.api_calls += 1
+        await self.exchange.cancel_orders(list(ids), self.symbol)
+
+    async def open_orders(self) -> Dict[Hashable, OrderIntent]:
+        self.api_calls += 1
+        orders = await self.exchange.fetch_open_orders(self.symbol)
+        return {o["id"]: OrderIntent(o["side"], float(o["price"]), float(o["remaining"]),
+                                     bool(o.get("postOnly"))) for o in orders}
+
+    def start(self) -> None:
+        """Start streaming ticker prices and own trades into `queue`."""
+        self._watchers = [asyncio.create_task(self._watch_prices()), asyncio.create_task(self._watch_fills())]
+
+    async def _watch_prices(self) -> None:
+        while True:
+            t = await self.exchange.watch_ticker(self.symbol)
+            self.queue.put_nowait({"type": "price", "price": float(t["last"]), "ts": t.get("timestamp")})
+
+    async def _watch_fills(self) -> None:
+        while True:
+            for t in await self.exchange.watch_my_trades(self.symbol):
+                self.queue.put_nowait({"type": "fill", "order_id": t["order"], "side": t["side"],
+                                       "price": float(t["price"]), "qty": float(t["amount"]),
+                                       "ts": t.get("timestamp")})
+
+    async def close(self) -> None:
+        for task in self._watchers:
+            task.cancel()
+        await asyncio.gather(*self._watchers, return_exceptions=True)
+        self.queue.put_nowait({"type": "end"})
+        await self.exchange.close()
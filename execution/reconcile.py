@@ -0,0 +1,54 @@
+"""
+Diff between the desired resting orders and the ones actually resting.
+- Orders are compared on (side, price, qty), quantized to tick/lot when those are given,
+  so prices echoed back by an exchange still match the ones that were sent.
+- Equal orders are matched one for one (a level may hold several); everything unmatched
+  on the resting side is cancelled, everything unmatched on the desired side is placed.
+  There is no amend: a changed level is one cancel plus one placement.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Iterable, List, Mapping, Optional, Tuple
+
+from backtest.exchange_sim import Side
+
+
+@dataclass(frozen=True, slots=True)
+class OrderIntent:
+    side: Side
+    price: float
+    qty: float
+    post_only: bool = True
+
+
+@dataclass
+class Diff:
+    cancel: List[Hashable] = field(default_factory=list)
+    place: List[OrderIntent] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.cancel or self.place)
+
+
+def _quantize(order: OrderIntent, tick: Optional[float], lot: Optional[float]) -> Tuple[str, float, float]:
+    price = round(order.price / tick) if tick else order.price
+    qty = round(order.qty / lot) if lot else order.qty
+    return order.side, price, qty
+
+
+def reconcile(target: Iterable[OrderIntent], resting: Mapping[Hashable, OrderIntent],
+              tick: Optional[float] = None, lot: Optional[float] = None) -> Diff:
+    """Minimal cancels and placements that turn `resting` (id -> order) into `target`."""
+    by_key: Dict[Tuple[str, float, float], List[Hashable]] = {}
+    for oid, order in resting.items():
+        by_key.setdefault(_quantize(order, tick, lot), []).append(oid)
+    diff = Diff()
+    for order in target:
+        ids = by_key.get(_quantize(order, tick, lot))
+        if ids:
+            ids.pop()
+        else:
+            diff.place.append(order)
+    for ids in by_key.values():
+        diff.cancel.extend(ids)
+    return diff
@@ -0,0 +1,78 @@
+"""
+Desired state of a running grid.
+- Levels sit on a fixed geometric lattice anchored at the first price (level k at
+  anchor * (1 + spacing)^k), so a moved grid reuses the price points it already rests on.
+- One level, the center, is left empty: buys rest on the levels below it and sells on the
+  ones above. A fill at level k moves the center to k, the same re-arming as
+  GridStrategy (a buy at k turns into a sell at k + 1 and vice versa).
+- Without `trail` the grid keeps its initial range and levels past it stay empty; with it
+  the window of grid_levels orders follows the center.
+- Levels on the wrong side of the last price are left out: a post-only order there would
+  be rejected, any other would cross the book.
+- Every level carries the same quantity (margin per level * leverage at the anchor), so
+  each round trip nets flat.
+- Only the grid shape is kept here; take-profit/stop-loss exits are not acted on.
+"""
+from __future__ import annotations
+import math
+from typing import List, Optional
+
+from backtest.exchange_specs import ContractSpecs
+from execution.reconcile import OrderIntent
+from strategies.grid import GridParams
+
+
+class GridTarget:
+    def __init__(self, params: GridParams, leverage: int = 1, specs: Optional[ContractSpecs] = None,
+                 trail: bool = False):
+        self.params = params
+        self.leverage = leverage
+        self.specs = specs
+        self.trail = trail
+        self.n_buy = params.grid_levels // 2
+        self.n_sell = params.grid_levels - self.n_buy
+        self.step = 1.0 + params.grid_spacing_pct / 100.0
+        self.anchor: Optional[float] = None
+        self.center = 0
+        self.qty = 0.0
+        self.shifts = 0
+
+    @property
+    def started(self) -> bool:
+        return self.anchor is not None
+
+    def start(self, price: float) -> None:
+        self.anchor = price
+        self.center = 0
+        mult = self.specs.multiplier if self.specs is not None else 1.0
+        qty = self.params.position_size_usdt * self.leverage / (price * mult)
+        self.qty = self.specs.round_qty(qty) if self.specs is not None else qty
+
+    def price(self, level: int) -> float:
+        p = self.anchor * self.step ** level
+        return self.specs.round_price(p) if self.specs is not None else p
+
+    def level_of(self, price: float) -> int:
+        """Nearest lattice level to `price`."""
+        return round(math.log(price / self.anchor) / math.log(self.step))
+
+    def on_fill(self, side: str, price: float) -> None:
+        level = self.level_of(price)
+        if level != self.center:
+            self.center = level
+            self.shifts += 1
+
+    def orders(self, last_price: Optional[float] = None) -> List[OrderIntent]:
+        if self.anchor is None or self.qty <= 0:
+            return []
+        c = self.center
+        lo, hi = c - self.n_buy, c + self.n_sell
+        if not self.trail:
+            lo, hi = max(lo, -self.n_buy), min(hi, self.n_sell)
+        post_only = self.params.post_only
+        buys = [OrderIntent("buy", self.price(k), self.qty, post_only) for k in range(lo, c)]
+        sells = [OrderIntent("sell", self.price(k), self.qty, post_only) for k in range(c + 1, hi + 1)]
+        if last_price is not None:
+            buys = [o for o in buys if o.price < last_price]
+            sells = [o for o in sells if o.price > last_price]
+        return buys + sells
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+from __future__ import annotations
+import argparse
+import time
+from pathlib import Path
+from backtest.benchmark import BENCHMARKS, run_benchmarks
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=float, default=30.0, help="Synthetic 1m history length")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--jump-rate", type=float, default=0.0, help="Expected jumps per day (0 = plain GBM)")
+    ap.add_argument("--workers", type=int, default=1, help="Optimizer worker processes")
+    ap.add_argument("--only", nargs="*", choices=BENCHMARKS, help="Subset of benchmarks to run")
+    ap.add_argument("--out", default=None, help="JSON report (default: results/benchmarks/<timestamp>.json)")
+    args = ap.parse_args()
+
+    out = Path(args.out) if args.out else Path("results") / "benchmarks" / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    report = run_benchmarks(days=args.days, seed=args.seed, workers=args.workers, only=args.only, out=out,
+                            jump_rate=args.jump_rate)
+
+    def rounded(stats):
+        return {k: rounded(v) if isinstance(v, dict) else round(v, 3) if isinstance(v, float) else v
+                for k, v in stats.items()}
+
+    for name, stats in report.items():
+        if name != "meta":
+            print(name, rounded(stats))
+    print(f"Report: {out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 from __future__ import annotations
 import argparse
+from backtest.data.dataset import build_dataset
 from backtest.data.downloader import get_or_download_klines
 from config.settings import SETTINGS
 
@@ -12,10 +13,17 @@ def main():
     ap.add_argument("--start", default=SETTINGS.default_start)
     ap.add_argument("--end", default=SETTINGS.default_end)
     ap.add_argument("--force", action="store_true", help="Bypass cache and re-download")
+    ap.add_argument("--concurrency", type=int, default=1, help="Concurrent windows (>1 uses the async downloader)")
+    ap.add_argument("--rate", type=float, default=10.0, help="Max requests per second in concurrent mode")
+    ap.add_argument("--dataset", action="store_true", help="Also build the memory-mapped last/mark/funding dataset")
     args = ap.parse_args()
 
-    df = get_or_download_klines(args.symbol, args.timeframe, args.start, args.end, force=args.force)
+    df = get_or_download_klines(args.symbol, args.timeframe, args.start, args.end, force=args.force,
+                                concurrency=args.concurrency, rate_per_sec=args.rate)
     print(f"Downloaded rows: {len(df)} for {args.symbol} {args.timeframe}")
+    if args.dataset:
+        path = build_dataset(args.symbol, args.timeframe, args.start, args.end, force=args.force)
+        print(f"Dataset: {path}")
 
 if __name__ == "__main__":
     main()
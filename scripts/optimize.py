@@ -1,13 +1,141 @@
 #!/usr/bin/env python
 from __future__ import annotations
 import argparse
+import json
+import math
+import os
+from pathlib import Path
+# numpy/pandas and the optimizer are only imported by local runs (local_sweep), so a
+# --service sweep starts as light as scripts/run_backtest.py
+from backtest.service_client import ServiceClient
+from config.schemas import LOWER_IS_BETTER, BacktestConfig, OptimizeMatrix
+from config.settings import SETTINGS
+from utils.profiling import profiling
+
+
+def service_sweep(args, config, matrix, out, progress):
+    """Plain sweep on a running scripts/serve.py; rows are ranked without pandas."""
+    rows = []
+    total = math.prod(len(values) for values in matrix.model_dump().values())
+    job = {"op": "sweep", "config": config.model_dump(mode="json"), "matrix": matrix.model_dump(),
+           "cache": not args.no_cache}
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with out.open("a") as fh:
+        for event in ServiceClient().stream(job):
+            if event["event"] == "row":
+                rows.append(event["row"])
+                fh.write(json.dumps(event["row"]) + "\n")
+                progress(event["row"], len(rows), total)
+    sign = -1.0 if args.rank_by in LOWER_IS_BETTER else 1.0
+    rows.sort(key=lambda r: sign * r[args.rank_by] if r.get(args.rank_by) is not None else float("-inf"),
+              reverse=True)
+    for row in rows[:args.top]:
+        print(json.dumps(row))
+
+
+def local_sweep(args, config, matrix, out, progress):
+    from backtest.data.dataset import open_dataset
+    from backtest.engine import market_dataset_path, register_market_specs
+    from backtest.optimizer import run_halving, run_sweep
+    from backtest.result_cache import ResultCache
+    from backtest.screener import run_screened
+    from backtest.walkforward import run_walk_forward
+
+    dataset = market_dataset_path(config)
+    market = open_dataset(dataset)
+    register_market_specs(config, market)
+    print(f"Loaded {len(market)} bars for {args.symbol} {args.timeframe}")
+    cache = None if args.no_cache else ResultCache()
+    if args.walk_forward:
+        wf = run_walk_forward(market, config, matrix, train=args.train, test=args.test, anchored=args.anchored,
+                              segmented=not args.continuous, rank_by=args.rank_by, workers=args.workers,
+                              dataset_path=dataset, cache=cache)
+        report = wf.report
+        print(f"{report['folds']} folds, bar-steps {report['bar_steps']} vs independent "
+              f"{report['independent_bar_steps']} ({report['saved_fraction']:.1%} saved)")
+        for k, v in wf.metrics.items():
+            print(f"{'oos_' + k:>24}: {v}")
+        out.parent.mkdir(parents=True, exist_ok=True)
+        wf.folds.to_csv(out.with_suffix(".walkforward.csv"), index=False)
+        print(f"Folds: {out.with_suffix('.walkforward.csv')}")
+        ranked = wf.folds
+    elif args.screen:
+        ranked, report = run_screened(market, config, matrix, fraction=args.screen_fraction, keep=args.top,
+                                      audit=args.audit, rank_by=args.rank_by, workers=args.workers,
+                                      dataset_path=dataset, results_path=out, cache=cache)
+        print(f"simulated {report['kept']} of {report['combos']} (+{report['audited']} audited), "
+              f"screen vs simulation Spearman {report['spearman']:.3f} "
+              f"(kept only {report['spearman_kept']:.3f})")
+    elif args.halving:
+        ranked, report = run_halving(market, config, matrix, eta=args.eta, min_fraction=args.min_fraction,
+                                     keep=args.top, rank_by=args.rank_by, workers=args.workers,
+                                     dataset_path=dataset, results_path=out, on_rung=print, cache=cache)
+        print(f"bar-steps {report['bar_steps']} vs exhaustive {report['exhaustive_bar_steps']} "
+              f"({report['saved_fraction']:.1%} saved)")
+    else:
+        ranked = run_sweep(market, config, matrix, workers=args.workers, results_path=out, resume=args.resume,
+                           rank_by=args.rank_by, on_result=progress, dataset_path=dataset, cache=cache)
+    if cache is not None:
+        print(f"Result cache: {cache.hits} hits, {cache.misses} misses")
+        cache.close()
+    print(ranked.head(args.top).to_string())
 
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--symbol")
-    ap.add_argument("--timeframe")
-    print("Optimizer stub - not implemented yet")
+    mode = ap.add_mutually_exclusive_group()
+    ap.add_argument("--symbol", default=SETTINGS.default_contract)
+    ap.add_argument("--timeframe", default=SETTINGS.default_timeframes[0])
+    ap.add_argument("--start", default=SETTINGS.default_start)
+    ap.add_argument("--end", default=SETTINGS.default_end)
+    ap.add_argument("--margin", default=SETTINGS.default_margin_mode)
+    ap.add_argument("--matrix", required=True, help="JSON file with OptimizeMatrix lists")
+    ap.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (1 = in-process)")
+    ap.add_argument("--out", default=None, help="JSONL results file (default: results/<symbol>_<tf>_<start>_<end>.jsonl)")
+    ap.add_argument("--resume", action="store_true", help="Skip combinations already in --out (plain local sweep)")
+    ap.add_argument("--rank-by", default="total_return")
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--no-cache", action="store_true", help="Do not reuse or store results in the result cache")
+    mode.add_argument("--halving", action="store_true", help="Successive halving instead of an exhaustive sweep")
+    ap.add_argument("--eta", type=int, default=3, help="Halving: keep 1/eta per rung, eta-times longer prefixes")
+    ap.add_argument("--min-fraction", type=float, default=1 / 27, help="Halving: data fraction of the first rung")
+    mode.add_argument("--screen", action="store_true", help="Rank by the level-crossing estimate, simulate only the best")
+    ap.add_argument("--screen-fraction", type=float, default=0.2, help="Screen: fraction simulated (at least --top)")
+    ap.add_argument("--audit", type=int, default=0, help="Screen: also simulate this many rejected combos to check it")
+    mode.add_argument("--walk-forward", action="store_true", help="Walk-forward: pick per train window, test out of sample")
+    ap.add_argument("--train", default="3M", help="Walk-forward train span (whole multiple of --test; 'M' = months)")
+    ap.add_argument("--test", default="1M", help="Walk-forward test period")
+    ap.add_argument("--anchored", action="store_true", help="Walk-forward: train from the first bar, not a rolling span")
+    ap.add_argument("--continuous", action="store_true", help="Walk-forward: backtest train spans whole, not per period")
+    mode.add_argument("--service", action="store_true", help="Run a plain sweep on a running scripts/serve.py")
+    ap.add_argument("--profile", action="store_true", help="Print per-phase timers/counters (in-process work; use --workers 1)")
+    ap.add_argument("--flamegraph", default=None, help="Write sampled folded stacks here (implies --profile)")
+    args = ap.parse_args()
+    if args.resume and (args.service or args.halving or args.screen or args.walk_forward):
+        ap.error("--resume only applies to a plain local sweep")
+    if args.walk_forward and not args.continuous:
+        from backtest.walkforward import COMBINED_METRICS
+
+        if args.rank_by not in COMBINED_METRICS:
+            ap.error(f"--walk-forward ranks by one of {', '.join(COMBINED_METRICS)} (or use --continuous)")
+
+    config = BacktestConfig(symbol=args.symbol, timeframe=args.timeframe, start=args.start, end=args.end,
+                            margin_mode=args.margin)
+    matrix = OptimizeMatrix(**json.loads(Path(args.matrix).read_text()))
+    out = Path(args.out) if args.out else Path("results") / f"{args.symbol}_{args.timeframe}_{args.start}_{args.end}.jsonl"
+
+    def progress(row, done, total):
+        if done % 100 == 0 or done == total:
+            print(f"{done}/{total} done")
+
+    sweep = service_sweep if args.service else local_sweep
+    if args.profile or args.flamegraph:
+        sample_path = Path(args.flamegraph) if args.flamegraph else None
+        with profiling(sample_path=sample_path, log=True):
+            sweep(args, config, matrix, out, progress)
+    else:
+        sweep(args, config, matrix, out, progress)
+    print(f"Results: {out}")
 
 if __name__ == "__main__":
     main()
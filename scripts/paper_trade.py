@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+from backtest.engine import contract_to_market_symbol, load_market
+from backtest.exchange_sim import ExchangeSim
+from backtest.exchange_specs import specs_from_ccxt_market
+from backtest.data.synthetic import synthetic_market
+from config.schemas import BacktestConfig
+from config.settings import SETTINGS
+from execution.executor import GridExecutor
+from execution.gateway import CcxtGateway, SimGateway
+from execution.target import GridTarget
+from strategies.grid import GridParams
+
+
+async def run(args) -> None:
+    params = GridParams(grid_levels=args.levels, grid_spacing_pct=args.spacing, position_size_usdt=args.size,
+                        take_profit_pct=args.take_profit, stop_loss_pct=args.stop_loss)
+    if SETTINGS.env == "offline":
+        config = BacktestConfig(symbol=args.symbol, timeframe=args.timeframe, start=args.start, end=args.end,
+                                margin_mode=args.margin, leverage=args.leverage)
+        market = synthetic_market(args.synthetic_days) if args.synthetic_days else load_market(config)
+        sim = ExchangeSim(args.symbol, margin_mode=args.margin, leverage=args.leverage)
+        sim.balance_usdt = config.initial_balance_usdt
+        gateway = SimGateway(sim, latency_s=args.latency_ms / 1000)
+        executor = GridExecutor(gateway, GridTarget(params, args.leverage, sim.specs, trail=args.trail))
+        stats, _ = await asyncio.gather(executor.run(), gateway.replay(market))
+        print(f"equity {sim.equity(float(market.close[-1])):.2f} position {sim.position.qty} fills {len(sim.fills)}")
+    else:
+        import ccxt.pro as ccxtpro
+
+        exchange = ccxtpro.mexc({"apiKey": SETTINGS.api_key, "secret": SETTINGS.api_secret,
+                                 "options": {"defaultType": "swap"}})
+        if SETTINGS.env == "testnet":
+            exchange.set_sandbox_mode(True)
+        symbol = contract_to_market_symbol(args.symbol) + ":USDT"
+        try:
+            await exchange.load_markets()
+            ticker = await exchange.fetch_ticker(symbol)
+            specs = specs_from_ccxt_market(exchange.market(symbol), ref_price=float(ticker["last"]))
+        except Exception as exc:
+            specs, reason = None, exc
+        else:
+            reason = "market has no price tick or lot size"
+        if specs is None or specs.tick_size <= 0 or specs.lot_size <= 0:
+            await exchange.close()
+            raise SystemExit(f"refusing to trade {symbol} without contract specs: {reason}")
+        # Quantities go out in contracts (contractSize) and prices on the tick, so specs are required.
+        gateway = CcxtGateway(exchange, symbol)
+        executor = GridExecutor(gateway, GridTarget(params, args.leverage, specs, trail=args.trail))
+        await executor.refresh()
+        gateway.start()
+        try:
+            stats = await executor.run()
+        finally:
+            await executor.cancel_all()
+            await gateway.close()
+    print(json.dumps(stats, indent=2))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run a grid through the executor (APP_ENV=offline replays data)")
+    ap.add_argument("--symbol", default=SETTINGS.default_contract)
+    ap.add_argument("--timeframe", default=SETTINGS.default_timeframes[0])
+    ap.add_argument("--start", default=SETTINGS.default_start)
+    ap.add_argument("--end", default=SETTINGS.default_end)
+    ap.add_argument("--margin", default=SETTINGS.default_margin_mode)
+    ap.add_argument("--leverage", type=int, default=20)
+    ap.add_argument("--levels", type=int, default=20)
+    ap.add_argument("--spacing", type=float, default=0.5, help="Grid spacing in percent")
+    ap.add_argument("--size", type=float, default=5.0, help="Margin per level in USDT")
+    ap.add_argument("--take-profit", type=float, default=50.0)
+    ap.add_argument("--stop-loss", type=float, default=20.0)
+    ap.add_argument("--trail", action="store_true", help="Let the grid window follow the price")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Offline: simulated latency per API call")
+    ap.add_argument("--synthetic-days", type=float, default=0.0, help="Offline: replay synthetic bars instead of data")
+    asyncio.run(run(ap.parse_args()))
+
+if __name__ == "__main__":
+    main()
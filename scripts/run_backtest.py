@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 from __future__ import annotations
 import argparse
-from backtest.exchange_sim import ExchangeSim
+# numpy/pandas/ccxt stay unimported when a backtest service (scripts/serve.py) is running
+from backtest.service_client import run_job
 from config.settings import SETTINGS
 
 
@@ -9,12 +10,32 @@ def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--symbol", default=SETTINGS.default_contract)
     ap.add_argument("--timeframe", default=SETTINGS.default_timeframes[0])
+    ap.add_argument("--start", default=SETTINGS.default_start)
+    ap.add_argument("--end", default=SETTINGS.default_end)
     ap.add_argument("--margin", default=SETTINGS.default_margin_mode)
     ap.add_argument("--leverage", type=int, default=125)
+    ap.add_argument("--levels", type=int, default=20)
+    ap.add_argument("--spacing", type=float, default=0.5, help="Grid spacing in percent")
+    ap.add_argument("--size", type=float, default=5.0, help="Margin per level in USDT")
+    ap.add_argument("--take-profit", type=float, default=50.0)
+    ap.add_argument("--stop-loss", type=float, default=20.0)
+    ap.add_argument("--no-cache", action="store_true", help="Recompute (and re-store) even if an identical run is cached")
+    ap.add_argument("--in-process", action="store_true", help="Run here even if a backtest service is listening")
     args = ap.parse_args()
 
-    sim = ExchangeSim(symbol=args.symbol, margin_mode=args.margin, leverage=args.leverage)
-    print(f"Initialized simulator for {args.symbol} {args.margin} x{args.leverage}")
+    job = {"op": "backtest", "equity_points": 500, "refresh": args.no_cache,
+           "config": dict(symbol=args.symbol, timeframe=args.timeframe, start=args.start, end=args.end,
+                          margin_mode=args.margin, leverage=args.leverage),
+           "params": dict(grid_levels=args.levels, grid_spacing_pct=args.spacing, position_size_usdt=args.size,
+                          take_profit_pct=args.take_profit, stop_loss_pct=args.stop_loss)}
+    events = {e["event"]: e for e in run_job(job, local=args.in_process)}
+    result = events["result"]
+    print(f"Loaded {result['bars']} bars for {args.symbol} {args.timeframe} ({args.margin} x{args.leverage})")
+    print("cache hit" if result["cache_hit"] else "computed")
+    metrics = result["metrics"]
+    metrics.pop("equity_curve", None)
+    for k, v in metrics.items():
+        print(f"{k:>24}: {v}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+from __future__ import annotations
+import argparse
+import os
+from pathlib import Path
+from backtest.service import serve
+from backtest.service_client import socket_path
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Warm backtest service for run_backtest.py / optimize.py --service")
+    ap.add_argument("--socket", default=None, help=f"Unix socket path (default: {socket_path()})")
+    ap.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    args = ap.parse_args()
+    serve(Path(args.socket) if args.socket else None, workers=args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 from __future__ import annotations
+from typing import Any, Dict, List, Optional
+import numpy as np
 from pydantic import BaseModel, Field
 
+from backtest.exchange_sim import ExchangeSim, Order
+from strategies.base import Strategy
+
 class GridParams(BaseModel):
     grid_levels: int = Field(ge=2)
     grid_spacing_pct: float = Field(gt=0)
@@ -9,4 +14,119 @@ class GridParams(BaseModel):
     stop_loss_pct: float = Field(gt=0)
     post_only: bool = Field(default=True)
 
-# Placeholder strategy implementation will be added later.
+
+class GridStrategy(Strategy):
+    """Neutral geometric grid around the first close.
+
+    - Levels sit `grid_spacing_pct` percent apart; buys below the start price, sells above.
+    - A buy filled at level k re-arms a sell at k+1 and vice versa.
+    - `position_size_usdt` is the margin per level, so each order's notional is size * leverage.
+    - `take_profit_pct` / `stop_loss_pct` are percent of starting equity; crossing either
+      cancels the grid and closes the position at market.
+    """
+
+    def __init__(self, params: GridParams, leverage: int = 1):
+        self.params = params
+        self.leverage = leverage
+        self.levels: List[float] = []
+        self.active = True
+        self.stopped_reason: Optional[str] = None
+        self._sim: Optional[ExchangeSim] = None
+        self._orders: Dict[int, int] = {}  # order handle -> level
+        self._offset = 0
+        self._start_equity = 0.0
+        self._sl_lo = self._sl_hi = None
+        self._tp_lo = self._tp_hi = None
+
+    def on_bar(self, context: Dict[str, Any]) -> None:
+        sim: ExchangeSim = context["sim"]
+        if self._sim is None:
+            self._start(sim, context["close"])
+        elif not self.active:
+            return
+        elif self._hit(self._sl_lo, self._sl_hi, context):
+            self._close_out("stop_loss")
+            return
+        elif self._hit(self._tp_lo, self._tp_hi, context):
+            self._close_out("take_profit")
+            return
+        self._update_band()
+
+    def on_fill(self, fill: Dict[str, Any]) -> None:
+        if fill.get("liquidation"):
+            # the exchange already cancelled our resting orders
+            self.active = False
+            self.stopped_reason = "liquidated"
+            self._orders.clear()
+            self._sim.set_watch_band()
+            return
+        level = self._orders.pop(fill["order_id"], None)
+        if level is None or not self.active:
+            return
+        # the counter order carries the filled qty so each round trip nets flat
+        if fill["side"] == "buy":
+            self._place(level + 1, "sell", fill["qty"])
+        else:
+            self._place(level - 1, "buy", fill["qty"])
+
+    # ------------------------ internals ------------------------
+    def _start(self, sim: ExchangeSim, price: float) -> None:
+        self._sim = sim
+        self._start_equity = sim.equity(price)
+        n_buy = self.params.grid_levels // 2
+        n_sell = self.params.grid_levels - n_buy
+        step = 1.0 + self.params.grid_spacing_pct / 100.0
+        # levels[k + n_buy] is the price of level k, k in [-n_buy, n_sell]; level 0 is the start price.
+        self.levels = [price * step ** k for k in range(-n_buy, n_sell + 1)]
+        self._offset = n_buy
+        levels = np.array(self.levels)
+        self._place_many(np.arange(-n_buy, 0), "buy", levels[:n_buy])
+        self._place_many(np.arange(1, n_sell + 1), "sell", levels[n_buy + 1:])
+
+    def _place_many(self, ks: np.ndarray, side: str, prices: np.ndarray) -> None:
+        qty = self.params.position_size_usdt * self.leverage / (prices * self._sim.multiplier)
+        handles = self._sim.place_orders(side, prices, qty, post_only=self.params.post_only)
+        rested = handles >= 0
+        self._orders.update(zip(handles[rested].tolist(), ks[rested].tolist()))
+
+    def _place(self, level: int, side: str, qty: float) -> None:
+        price = self.levels[level + self._offset]
+        h = self._sim.place_limit(side, price, qty, post_only=self.params.post_only)
+        if h >= 0:
+            self._orders[h] = level
+
+    def _update_band(self) -> None:
+        """Translate equity TP/SL thresholds into prices for the current position."""
+        sim = self._sim
+        q = sim.position.qty * sim.multiplier
+        self._sl_lo = self._sl_hi = self._tp_lo = self._tp_hi = None
+        if not q:
+            sim.set_watch_band()
+            return
+        entry, bal = sim.position.entry_price, sim.balance_usdt
+        sl_eq = self._start_equity * (1 - self.params.stop_loss_pct / 100.0)
+        tp_eq = self._start_equity * (1 + self.params.take_profit_pct / 100.0)
+        sl_px = entry + (sl_eq - bal) / q
+        tp_px = entry + (tp_eq - bal) / q
+        if q > 0:
+            self._sl_lo, self._tp_hi = sl_px, tp_px
+            sim.set_watch_band(sl_px, tp_px)
+        else:
+            self._sl_hi, self._tp_lo = sl_px, tp_px
+            sim.set_watch_band(tp_px, sl_px)
+
+    @staticmethod
+    def _hit(lo: Optional[float], hi: Optional[float], context: Dict[str, Any]) -> bool:
+        return (lo is not None and context["low"] <= lo) or (hi is not None and context["high"] >= hi)
+
+    def _close_out(self, reason: str) -> None:
+        sim = self._sim
+        self.active = False
+        self.stopped_reason = reason
+        sim.cancel_orders(list(self._orders))
+        self._orders.clear()
+        sim.set_watch_band()
+        qty = sim.position.qty
+        if qty:
+            sim.place_order(Order(id="", side="sell" if qty > 0 else "buy", type="market",
+                                  price=None, qty=abs(qty)))
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.data.market import market_from_frames
+from config.schemas import OptimizeMatrix
+
+
+def random_walk_market(n=3000, seed=3):
+    rng = np.random.default_rng(seed)
+    close = np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    open_ = np.concatenate([[1.0], close[:-1]])
+    high = np.maximum(open_, close) * 1.001
+    low = np.minimum(open_, close) * 0.999
+    df = pd.DataFrame({"ts": np.arange(n) * 60_000, "open": open_, "high": high, "low": low,
+                       "close": close, "volume": 1.0})
+    return market_from_frames(df)
+
+
+@pytest.fixture
+def make_market():
+    """1m random-walk market builder: make_market(n=3000, seed=3)."""
+    return random_walk_market
+
+
+@pytest.fixture
+def matrix():
+    """Eight-combination sweep over levels, spacing and leverage."""
+    return OptimizeMatrix(grid_levels=[4, 10], grid_spacing_pct=[0.2, 0.5], position_size_usdt=[5.0],
+                          take_profit_pct=[50.0], stop_loss_pct=[20.0], leverage=[5, 20])
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pandas as pd
+
+from backtest.data import async_downloader, downloader
+from backtest.data.async_downloader import AsyncDownloader, TokenBucket, split_windows
+from backtest.data.fake_exchange import FakeMexc
+
+DAY = 86_400_000
+T0 = int(pd.Timestamp("2024-01-01", tz="UTC").timestamp() * 1000)
+
+
+def test_split_windows_cover_range_exactly():
+    w = split_windows(0, 2_499, 1_000)
+    assert w == [(0, 999), (1_000, 1_999), (2_000, 2_499)]
+
+
+def test_concurrent_klines_complete_and_sorted():
+    async def run():
+        async with AsyncDownloader(lambda: FakeMexc(latency_s=0.01), concurrency=8, rate_per_sec=1000) as dl:
+            df = await dl.klines("PI/USDT", "1m", T0, T0 + 2 * DAY - 1)
+            return df, dl.stats
+    df, stats = asyncio.run(run())
+    assert len(df) == 2 * 1440
+    assert df["ts"].is_monotonic_increasing and df["ts"].diff().dropna().eq(60_000).all()
+    assert stats["requests"] == 3
+
+
+def test_retries_survive_injected_failures():
+    async def run():
+        async with AsyncDownloader(lambda: FakeMexc(fail_every=3), concurrency=4, rate_per_sec=1000,
+                                   backoff_s=0.001) as dl:
+            k = await dl.klines("PI/USDT", "1m", T0, T0 + DAY - 1)
+            f = await dl.funding("PI/USDT", T0, T0 + 10 * DAY - 1)
+            return k, f, dl.stats
+    k, f, stats = asyncio.run(run())
+    assert len(k) == 1440 and len(f) == 30
+    assert stats["retries"] > 0
+
+
+def test_token_bucket_limits_rate():
+    async def run():
+        bucket = TokenBucket(rate=50, capacity=1)
+        t = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(11)))
+        return time.monotonic() - t
+    assert asyncio.run(run()) >= 0.18
+
+
+def test_all_missing_gaps_share_one_session(tmp_path, monkeypatch):
+    made = []
+    monkeypatch.setattr(downloader, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(async_downloader, "default_exchange_factory", lambda: made.append(FakeMexc()) or made[-1])
+    downloader.get_or_download_klines("PI/USDT", "1m", "2024-01-02", "2024-01-02", concurrency=4, rate_per_sec=1000)
+    df = downloader.get_or_download_klines("PI/USDT", "1m", "2024-01-01", "2024-01-03", concurrency=4,
+                                           rate_per_sec=1000)
+    assert len(made) == 2  # one session per call, though the second call had two gaps
+    assert len(df) == 3 * 1440 and df["ts"].diff().dropna().eq(60_000).all()
@@ -0,0 +1,25 @@
+import json
+
+import numpy as np
+
+from backtest.benchmark import BENCHMARKS, run_benchmarks
+from backtest.data.synthetic import synthetic_frames, synthetic_market
+
+
+def test_synthetic_market_is_consistent():
+    klines, mark, funding = synthetic_frames(days=2, seed=3, jump_rate=5)
+    assert len(klines) == 2880 and klines["ts"].diff().dropna().eq(60_000).all()
+    assert (klines["high"] >= klines[["open", "close"]].max(axis=1)).all()
+    assert (klines["low"] <= klines[["open", "close"]].min(axis=1)).all()
+    assert len(funding) == 6 and (np.abs(mark["close"] / klines["close"] - 1) < 0.01).all()
+    a, b = synthetic_market(days=1, seed=7), synthetic_market(days=1, seed=7)
+    assert np.array_equal(a.close, b.close) and len(a.funding_idx) == 3
+
+
+def test_benchmarks_write_json_report(tmp_path):
+    out = tmp_path / "bench.json"
+    report = run_benchmarks(days=0.5, out=out)
+    saved = json.loads(out.read_text())
+    assert set(BENCHMARKS) <= set(saved) and saved["meta"]["bars"] == 720
+    assert report["simulator"]["bars_per_sec"] > 0 and report["optimizer"]["combos"] == 12
+    assert report["downloader"]["async"]["rows"] == 720 == report["downloader"]["sync"]["rows"]
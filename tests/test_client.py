@@ -0,0 +1,74 @@
+import json
+import time
+
+import pytest
+
+from backtest.data import client, downloader
+from backtest import exchange_specs
+from backtest.data.fake_exchange import FakeMexcSync
+from backtest.data.synthetic import synthetic_market
+from backtest.engine import register_market_specs
+from backtest.exchange_specs import get_specs
+from config.schemas import BacktestConfig
+
+T0 = 1_704_067_200_000  # 2024-01-01
+
+
+@pytest.fixture
+def fake(tmp_path, monkeypatch):
+    made = []
+    monkeypatch.setattr(downloader, "CACHE_DIR", tmp_path)
+
+    def factory():
+        made.append(FakeMexcSync())
+        return made[-1]
+    client.set_exchange_factory(factory)
+    yield made
+    client.set_exchange_factory(None)
+
+
+def test_one_client_and_one_market_load_per_process(fake):
+    downloader.fetch_klines_ccxt("PI/USDT", "1m", T0, T0 + 3_600_000 - 1)
+    downloader.fetch_mark_ohlcv_ccxt("PI/USDT", "1m", T0, T0 + 3_600_000 - 1)
+    downloader.fetch_funding_rates_ccxt("PI/USDT", T0, T0 + 86_400_000 - 1)
+    assert len(fake) == 1 and fake[0].market_loads == 1
+    assert client.snapshot_path().exists()
+
+
+def test_fresh_snapshot_skips_network_and_stale_one_reloads(fake):
+    client.get_exchange()
+    client.set_exchange_factory(lambda: fake.append(FakeMexcSync()) or fake[-1])
+    ex = client.get_exchange()
+    assert ex.market_loads == 0 and "PI/USDT:USDT" in ex.markets
+
+    payload = json.loads(client.snapshot_path().read_text())
+    payload["saved_at"] = time.time() - client.SNAPSHOT_TTL_S - 1
+    client.snapshot_path().write_text(json.dumps(payload))
+    client.set_exchange_factory(lambda: fake.append(FakeMexcSync()) or fake[-1])
+    assert client.get_exchange().market_loads == 1
+
+
+def test_specs_registered_from_snapshot(fake):
+    client.get_exchange()
+    assert client.register_specs_from_snapshot(ref_prices={"PI_USDT_PERP": 2.0}) == 1
+    specs = get_specs("PI_USDT_PERP")
+    assert specs.tick_size == 0.0001 and specs.lot_size == 1.0 and specs.multiplier == 1.0
+    assert len(specs.risk_tiers) == 5
+    assert specs.risk_tiers[0].notional_cap == 1_000_000.0
+    assert specs.risk_tiers[-1].maintenance_margin_rate == pytest.approx(0.02)
+
+
+def test_tiers_need_a_reference_price(fake, monkeypatch):
+    monkeypatch.setattr(exchange_specs, "_SPECS_REGISTRY", {})
+    client.get_exchange()
+    client.register_specs_from_snapshot()
+    untiered = get_specs("PI_USDT_PERP")
+    assert len(untiered.risk_tiers) == 1 and untiered.risk_tiers[0].notional_cap == float("inf")
+    assert untiered.risk_tiers[0].maintenance_margin_rate == pytest.approx(0.004)
+
+    market = synthetic_market(0.5)
+    config = BacktestConfig(symbol="PI_USDT_PERP", timeframe="1m", start="2024-01-01", end="2024-01-02")
+    specs = register_market_specs(config, market)
+    assert get_specs("PI_USDT_PERP") is specs
+    assert specs.risk_tiers[0].notional_cap == pytest.approx(500_000 * float(market.close[-1]))
+    assert client.register_symbol_specs("BTC_USDT_PERP", 1.0) is None
@@ -0,0 +1,65 @@
+import multiprocessing as mp
+
+import numpy as np
+import pandas as pd
+
+from backtest.data import downloader
+from backtest.data.dataset import build_dataset, dataset_meta, open_dataset, write_dataset
+from backtest.data.market import market_from_frames
+
+
+def _frames():
+    ts = np.arange(0, 24 * 3_600_000, 60_000, dtype=np.int64)
+    px = 1 + np.arange(len(ts)) * 1e-5
+    k = pd.DataFrame({"ts": ts, "open": px, "high": px + 1e-4, "low": px - 1e-4, "close": px, "volume": 1.0})
+    mark = k.iloc[::2].assign(close=lambda d: d["close"] + 0.5)  # sparse: gaps forward-fill
+    funding = pd.DataFrame({"ts": [-1, 0, 8 * 3_600_000 + 30_000, 16 * 3_600_000], "rate": [9.0, 1e-4, 2e-4, 3e-4]})
+    return k, mark, funding
+
+
+def test_alignment_and_funding_index():
+    m = market_from_frames(*_frames())
+    assert m.mark_close[0] == m.close[0] + 0.5 and m.mark_close[1] == m.mark_close[0]
+    assert list(m.funding_idx) == [0, 480, 960]  # event before the first bar is dropped
+    part = m.slice(400, 1000)
+    assert list(part.funding_idx) == [80, 560] and list(part.funding_rate) == [2e-4, 3e-4]
+
+
+def _worker_sum(path):
+    return float(open_dataset(path).close.sum())
+
+
+def test_round_trip_is_memmapped_and_shared(tmp_path):
+    m = market_from_frames(*_frames())
+    path = write_dataset(m, tmp_path / "ds")
+    mapped = open_dataset(path)
+    assert isinstance(mapped.close, np.memmap) and not mapped.close.flags.writeable
+    for name, arr in m.columns().items():
+        np.testing.assert_array_equal(getattr(mapped, name), arr)
+    with mp.Pool(2) as pool:
+        assert pool.map(_worker_sum, [path, path]) == [float(m.close.sum())] * 2
+
+
+def test_build_skips_mark_when_unused_and_rebuilds_an_open_day(tmp_path, monkeypatch):
+    k, mark, funding = _frames()
+    calls = []
+
+    def stub(name, frame):
+        return lambda *a, **kw: calls.append(name) or frame.copy()
+    monkeypatch.setattr(downloader, "get_or_download_klines", stub("klines", k))
+    monkeypatch.setattr(downloader, "get_or_download_mark", stub("mark", mark))
+    monkeypatch.setattr(downloader, "get_or_download_funding", stub("funding", funding))
+
+    path = build_dataset("PI/USDT", "1m", "1970-01-01", "1970-01-01", root=tmp_path, mark=False)
+    assert "mark" not in calls and dataset_meta(path)["mark"] is False
+    np.testing.assert_array_equal(open_dataset(path).mark_close, open_dataset(path).close)
+    calls.clear()
+    build_dataset("PI/USDT", "1m", "1970-01-01", "1970-01-01", root=tmp_path, mark=False)
+    assert calls == []  # closed day: reused
+    build_dataset("PI/USDT", "1m", "1970-01-01", "1970-01-01", root=tmp_path)
+    assert calls == ["klines", "mark", "funding"]  # marks asked for: rebuilt
+
+    today = pd.Timestamp.now(tz="UTC").strftime("%Y-%m-%d")
+    for _ in range(2):
+        build_dataset("PI/USDT", "1m", "1970-01-01", today, root=tmp_path)
+    assert calls.count("klines") == 3  # the open day is never reused
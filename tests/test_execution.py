@@ -0,0 +1,67 @@
+import asyncio
+
+from backtest.data.synthetic import synthetic_market
+from backtest.exchange_sim import ExchangeSim
+from execution.executor import GridExecutor
+from execution.gateway import SimGateway
+from execution.reconcile import OrderIntent, reconcile
+from execution.target import GridTarget
+from strategies.grid import GridParams
+
+PARAMS = GridParams(grid_levels=40, grid_spacing_pct=0.1, position_size_usdt=5.0, take_profit_pct=50.0,
+                    stop_loss_pct=50.0)
+
+
+def test_reconcile_sends_only_the_difference():
+    resting = {"a": OrderIntent("buy", 0.99, 5), "b": OrderIntent("buy", 0.98, 5), "c": OrderIntent("sell", 1.01, 5),
+               "d": OrderIntent("sell", 1.01, 5)}
+    target = [OrderIntent("buy", 0.98000000001, 5), OrderIntent("buy", 0.97, 5), OrderIntent("sell", 1.01, 5)]
+    diff = reconcile(target, resting, tick=0.001, lot=1.0)
+    assert sorted(diff.cancel)[0] == "a" and len(diff.cancel) == 2 and "b" not in diff.cancel
+    assert diff.place == [OrderIntent("buy", 0.97, 5)]
+    assert not reconcile(target[:1], {"b": resting["b"]}, tick=0.001)
+
+
+def test_grid_shift_moves_one_level():
+    target = GridTarget(PARAMS, leverage=10, trail=True)
+    target.start(1.0)
+    before = {k: o for k, o in enumerate(target.orders())}
+    assert len(before) == 40
+    target.on_fill("buy", target.price(-1))
+    diff = reconcile(target.orders(), before)
+    # the filled buy is gone from the book in reality; here it is cancelled instead
+    assert len(diff.place) == 2 and len(diff.cancel) == 2 and target.shifts == 1
+
+
+def _run(trail, **market_kwargs):
+    market = synthetic_market(1, 2, **market_kwargs).slice(0, 600)
+    sim = ExchangeSim("X", leverage=10, specs=None)
+    sim.balance_usdt = 1000.0
+    gateway = SimGateway(sim, max_batch=20)
+    executor = GridExecutor(gateway, GridTarget(PARAMS, leverage=10, trail=trail))
+
+    async def main():
+        stats, _ = await asyncio.gather(executor.run(), gateway.replay(market))
+        return stats
+
+    return asyncio.run(main()), sim, executor
+
+
+def test_executor_tracks_exchange_with_few_calls():
+    stats, sim, executor = _run(trail=True)
+    assert stats["fills"] == len(sim.fills) > 100 and stats["rejected"] == 0
+    assert set(executor.resting) == set(sim.open_orders) and len(sim.open_orders) >= 30
+    # a rebuild would cost 4 calls (2 cancel + 2 place batches of 20) per shift
+    assert stats["calls_per_shift"] < 1.5
+    # one cancel and one place batch per reconciliation, except for the initial 40 orders
+    assert stats["api_calls"] <= 2 * stats["syncs"] + 1
+    assert stats["latency_p99_ms"] > 0
+    again, sim2, _ = _run(trail=True)
+    assert sim2.fills == sim.fills and again["api_calls"] == stats["api_calls"]
+
+
+def test_fixed_range_grid_stays_in_range():
+    _, sim, executor = _run(trail=False)
+    target = executor.target
+    prices = {o.price for o in executor.resting.values()}
+    assert min(prices) >= target.price(-target.n_buy) and max(prices) <= target.price(target.n_sell)
@@ -1,2 +1,89 @@
+import numpy as np
+import pytest
+
+from backtest.exchange_sim import ExchangeSim, Order
+from backtest.funding import FundingSchedule, cumulative_funding_pnl
+from strategies.base import Strategy
+
+
 def test_placeholder_funding():
     assert True
+
+
+def _bars(n=5000):
+    ts = np.arange(n, dtype=np.int64) * 60_000
+    close = 1.0 + 0.01 * np.sin(np.arange(n) / 200)
+    return ts, close
+
+
+def _schedule(ts, price):
+    f_ts = np.arange(0, int(ts[-1]) + 1, 480 * 60_000) + 30_000  # inside the bar opening at each 8h mark
+    rate = np.where(np.arange(len(f_ts)) % 2, -0.0002, 0.0001)
+    return FundingSchedule.from_arrays(ts, f_ts, rate, price)
+
+
+def test_schedule_indexes_events_to_bars():
+    ts, close = _bars()
+    sched = _schedule(ts, close)
+    assert list(sched.idx) == list(range(0, len(ts), 480))
+    assert np.allclose(sched.mark, close[sched.idx])
+    early = FundingSchedule.from_arrays(ts, np.array([-5, 90_000]), np.array([0.1, 0.2]), close)
+    assert list(early.idx) == [1] and list(early.rate) == [0.2]
+
+
+def test_long_pays_positive_rate_at_mark():
+    sim = ExchangeSim("X", leverage=10)
+    sim.balance_usdt = 100.0
+    sim.on_bar(1.0, 1.0, 1.0, 1.0, 0)
+    sim.place_order(Order(id="b", side="buy", type="market", price=None, qty=100))
+    sim.on_bar(2.0, 2.0, 2.0, 2.0, 1)
+    ev = sim.apply_funding(0.001, 2.5, 2)
+    assert ev["paid"] == pytest.approx(0.25) and sim.balance_usdt == pytest.approx(99.75)
+    sim.apply_funding(-0.001, 2.0, 3)
+    assert sim.funding_paid == pytest.approx(0.05)
+
+
+class _Recorder(Strategy):
+    def __init__(self):
+        self.events = []
+
+    def on_bar(self, context):
+        pass
+
+    def on_funding(self, event):
+        self.events.append(event)
+
+
+def test_run_bars_only_stops_on_funding_bars_and_matches_manual_loop():
+    ts, close = _bars()
+    sched = _schedule(ts, close)
+
+    def fresh():
+        sim = ExchangeSim("X", leverage=10)
+        sim.balance_usdt = 100.0
+        sim.on_bar(1.0, 1.0, 1.0, 1.0, -60_000)
+        sim.place_order(Order(id="s", side="sell", type="limit", price=1.0, qty=50))
+        return sim
+
+    fast = fresh()
+    rec = _Recorder()
+    events = fast.run_bars(close, close, close, close, ts, rec, funding=sched, record_equity=True)
+    assert len(rec.events) == len(sched)
+    assert events <= 2 * len(sched) + 2
+
+    slow = fresh()
+    k = 0
+    for j in range(len(ts)):
+        while k < len(sched) and sched.idx[k] == j:
+            slow.apply_funding(sched.rate[k], sched.mark[k], sched.ts[k])
+            k += 1
+        slow.on_bar(close[j], close[j], close[j], close[j], ts[j])
+    assert fast.balance_usdt == pytest.approx(slow.balance_usdt)
+    assert fast.funding_paid == pytest.approx(slow.funding_paid) != 0
+    assert fast.funding_curve[-1] == pytest.approx(-fast.funding_paid)
+    assert fast.equity_curve[-1] == pytest.approx(slow.equity(close[-1]))
+
+
+def test_cumulative_funding_pnl():
+    curve = cumulative_funding_pnl(6, np.array([1, 1, 4]), np.array([1.0, 0.5, -2.0]))
+    assert list(curve) == [0, -1.5, -1.5, -1.5, 0.5, 0.5]
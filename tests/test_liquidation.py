@@ -1,2 +1,96 @@
+import numpy as np
+import pytest
+
+from backtest.exchange_sim import ExchangeSim, Order
+from backtest.exchange_specs import ContractSpecs, RiskTier
+from backtest.liquidation import bankruptcy_price, first_breach, liquidation_price, position_prices
+
+
+def _specs():
+    tiers = [RiskTier(50_000, 0.01, 0.0), RiskTier(10_000, 0.005, 0.0), RiskTier(250_000, 0.02, 0.0)]
+    return ContractSpecs("T_USDT_PERP", 0.0001, 1.0, 0.0, 1.0, tiers)
+
+
 def test_placeholder_liquidation():
     assert True
+
+
+def test_tier_table_is_sorted_with_cumulative_amounts():
+    specs = _specs()
+    assert specs.tier_for_notional(5_000).maintenance_margin_rate == 0.005
+    assert specs.tier_for_notional(10_000).maintenance_margin_rate == 0.005
+    assert specs.tier_for_notional(10_001).maintenance_margin_rate == 0.01
+    assert specs.tier_for_notional(1e9).maintenance_margin_rate == 0.02
+    # continuous at the boundaries
+    for cap in (10_000, 50_000):
+        assert specs.maintenance_margin(cap) == pytest.approx(specs.maintenance_margin(cap + 1e-6), abs=1e-6)
+    mmr, cum = specs.tier_arrays(np.array([5_000.0, 20_000.0, 1e6]))
+    assert list(mmr) == [0.005, 0.01, 0.02] and list(cum) == [0.0, 50.0, 550.0]
+
+
+def test_isolated_prices_at_125x():
+    pr = position_prices(None, 1.0, 1000.0, 125)
+    margin = 1000 / 125
+    assert pr["margin"] == pytest.approx(margin)
+    # equity at the liquidation price equals maintenance there
+    lp = float(pr["liquidation_price"])
+    assert margin + 1000 * (lp - 1.0) == pytest.approx(1000 * lp * 0.004)
+    assert float(pr["bankruptcy_price"]) == pytest.approx(1 - 1 / 125)
+    short = position_prices(None, 1.0, -1000.0, 125)
+    assert float(short["liquidation_price"]) > 1.0 > float(short["bankruptcy_price"]) - 0.02
+
+
+def test_cross_uses_wallet_and_vectorizes():
+    lp = liquidation_price(np.array([1.0, 1.0]), np.array([1000.0, 1000.0]), np.array([50.0, 500.0]), 0.004)
+    assert lp[0] > lp[1]
+    assert np.isnan(bankruptcy_price(1.0, 0.0, 10.0))
+
+
+def test_first_breach_matches_scan():
+    rng = np.random.default_rng(0)
+    low = 1 + np.cumsum(rng.normal(0, 0.01, 500))
+    high = low + 0.01
+    liq = np.array([0.9, 0.95, 1.05, 1.1, 0.5])
+    qty = np.array([1, 1, -1, -1, 1])
+    got = first_breach(liq, qty, low, high)
+    for k in range(len(liq)):
+        hits = np.flatnonzero(low <= liq[k]) if qty[k] > 0 else np.flatnonzero(high >= liq[k])
+        assert got[k] == (hits[0] if hits.size else len(low))
+
+
+def test_sim_liquidates_at_bankruptcy_price():
+    sim = ExchangeSim("T_USDT_PERP", leverage=100, specs=_specs())
+    sim.balance_usdt = 1000.0
+    sim.on_bar(1.0, 1.0, 1.0, 1.0, 0)
+    sim.place_order(Order(id="b", side="buy", type="limit", price=0.999, qty=1000))
+    sim.on_bar(1.0, 1.0, 0.998, 0.999, 1)
+    assert sim.liq_price is not None and sim.liquidations == 0
+    sim.on_bar(0.999, 0.999, 0.99, 0.99, 2)
+    assert sim.liquidations == 1 and sim.position.qty == 0
+    assert sim.fills[-1]["liquidation"] and sim.balance_usdt == pytest.approx(1000 - 0.999 * 1000 / 100)
+
+
+def test_run_bars_stops_on_liquidation_event():
+    n = 2000
+    close = np.linspace(1.0, 0.9, n)
+    sim = ExchangeSim("T_USDT_PERP", leverage=50, specs=_specs())
+    sim.balance_usdt = 1000.0
+    sim.on_bar(1.0, 1.0, 1.0, 1.0, 0)
+    sim.place_order(Order(id="b", side="buy", type="limit", price=0.9995, qty=500))
+    sim.run_bars(close, close, close, close, np.arange(1, n + 1), mark_low=close - 0.001, mark_high=close)
+    assert sim.liquidations == 1 and sim.event_bars == 2
+
+
+def test_screen_liquidations_flags_high_leverage(make_market, matrix):
+    from backtest.optimizer import expand_matrix, screen_liquidations
+    from config.schemas import BacktestConfig
+
+    market = make_market()
+    config = BacktestConfig(symbol="T_USDT_PERP", timeframe="1m", start="2025-01-01", end="2025-01-03")
+    df = screen_liquidations(market, config, list(expand_matrix(matrix)))
+    assert len(df) == 8
+    assert (df["liq_price_long"] < market.close[0]).all() and (df["liq_price_short"] > market.close[0]).all()
+    low = df[df["leverage"] == 5].iloc[0]
+    high = df[(df["leverage"] == 20) & (df["grid_levels"] == low["grid_levels"])
+              & (df["grid_spacing_pct"] == low["grid_spacing_pct"])].iloc[0]
+    assert high["liq_price_long"] > low["liq_price_long"]
@@ -1,2 +1,86 @@
+import math
+
+import numpy as np
+import pytest
+
+from backtest.metrics import MetricsAccumulator, compute_metrics, compute_metrics_array
+
+
+def _equity(n=2000, seed=5):
+    rng = np.random.default_rng(seed)
+    return 1000 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+
+
+def _naive(eq, ppy):
+    r = eq[1:] / eq[:-1] - 1
+    peak = np.maximum.accumulate(eq)
+    under = eq < peak
+    longest = run = 0
+    for u in under:
+        run = run + 1 if u else 0
+        longest = max(longest, run)
+    downside = math.sqrt((np.minimum(r, 0) ** 2).mean())
+    return {
+        "sharpe_ratio": r.mean() / r.std(ddof=1) * math.sqrt(ppy),
+        "sortino_ratio": r.mean() / downside * math.sqrt(ppy),
+        "max_drawdown": ((peak - eq) / peak).max(),
+        "max_drawdown_duration": longest,
+        "total_return": eq[-1] / eq[0] - 1,
+    }
+
+
 def test_placeholder_metrics():
     assert True
+
+
+def test_streaming_matches_naive_and_array_paths():
+    eq = _equity()
+    scalar = MetricsAccumulator(periods_per_year=1000)
+    for v in eq:
+        scalar.update_equity(float(v))
+    chunked = MetricsAccumulator(periods_per_year=1000)
+    for part in np.array_split(eq, [1, 7, 300, 301, 1500]):
+        chunked.update_equity_array(part)
+    expected = _naive(eq, 1000)
+    for res in (scalar.result(), chunked.result(), compute_metrics_array(eq, periods_per_year=1000)):
+        for key, value in expected.items():
+            assert res[key] == pytest.approx(value, rel=1e-9), key
+
+
+def test_trades_funding_and_liquidations():
+    acc = MetricsAccumulator()
+    for pnl in (5.0, -2.0, 3.0, 0.0):
+        acc.record_trade(pnl)
+    acc.record_funding(1.5)
+    acc.record_funding(-0.5)
+    acc.record_liquidation()
+    res = acc.result()
+    assert res["trades"] == 3 and res["win_rate"] == pytest.approx(2 / 3)
+    assert res["profit_factor"] == pytest.approx(4.0)
+    assert res["funding_paid"] == pytest.approx(1.0) and res["liquidations"] == 1
+
+
+def test_compute_metrics_keeps_list_of_dicts_api():
+    eq = _equity(50)
+    res = compute_metrics([{"total": float(v)} for v in eq])
+    assert res["total_return"] == pytest.approx(eq[-1] / eq[0] - 1)
+    assert compute_metrics([])["sharpe_ratio"] == 0
+
+
+def test_sim_streams_same_metrics_as_recorded_curve(make_market):
+    from backtest.engine import run_grid_backtest
+    from backtest.exchange_sim import ExchangeSim
+    from config.schemas import BacktestConfig
+    from strategies.grid import GridParams
+
+    market, config = make_market(), BacktestConfig(leverage=10)
+    params = GridParams(grid_levels=10, grid_spacing_pct=0.2, position_size_usdt=5, take_profit_pct=50, stop_loss_pct=50)
+    sim = ExchangeSim(config.symbol)
+    sim.balance_usdt = config.initial_balance_usdt
+    streamed = run_grid_backtest(market, config, params, sim=sim, record_equity=True)
+    trades = [f["realized_pnl"] for f in sim.fills if f["realized_pnl"]]
+    after = compute_metrics_array(sim.equity_curve, trades, periods_per_year=525_600)
+    for key in ("total_return", "sharpe_ratio", "sortino_ratio", "max_drawdown", "max_drawdown_duration",
+                "win_rate", "profit_factor", "trades"):
+        assert streamed[key] == pytest.approx(after[key], rel=1e-9), key
+    assert streamed["trades"] > 0
@@ -0,0 +1,78 @@
+import json
+
+import pandas as pd
+
+from backtest.optimizer import combo_key, expand_matrix, run_sweep
+from config.schemas import BacktestConfig, OptimizeMatrix
+
+
+def test_expand_matrix_covers_product(matrix):
+    combos = list(expand_matrix(matrix))
+    assert len(combos) == 8
+    assert len({combo_key(c) for c in combos}) == 8
+
+
+def test_parallel_matches_serial_and_is_ranked(make_market, matrix):
+    market, config = make_market(), BacktestConfig()
+    serial = run_sweep(market, config, matrix, workers=1)
+    parallel = run_sweep(market, config, matrix, workers=2)
+    assert "error" not in serial
+    assert list(serial["total_return"]) == sorted(serial["total_return"], reverse=True)
+    key = lambda df: df.assign(k=[combo_key(r) for r in df.to_dict("records")]).set_index("k").sort_index()
+    pd.testing.assert_frame_equal(key(serial), key(parallel))
+
+
+def test_resume_skips_finished_combos(tmp_path, make_market, matrix):
+    market, config = make_market(), BacktestConfig()
+    out = tmp_path / "sweep.jsonl"
+    first = run_sweep(market, config, matrix, workers=1, results_path=out)
+    lines = out.read_text().splitlines()
+    out.write_text("\n".join(lines[:5]) + "\n" + lines[5][:10])  # interrupted mid-write
+    seen = []
+    resumed = run_sweep(market, config, matrix, workers=1, results_path=out, resume=True,
+                        on_result=lambda row, done, total: seen.append(row))
+    assert len(seen) == 3
+    assert len(resumed) == len(first) == 8
+    assert all(json.loads(line) for line in out.read_text().splitlines())
+
+
+def test_halving_keeps_exhaustive_top_k_with_fewer_bar_steps():
+    from backtest.data.synthetic import synthetic_market
+    from backtest.optimizer import halving_rungs, run_halving
+
+    assert halving_rungs(2700, eta=3, min_fraction=1 / 27) == [100, 300, 900, 2700]
+    market = synthetic_market(days=12, seed=4, sigma=0.6)
+    matrix = OptimizeMatrix(grid_levels=[6, 20], grid_spacing_pct=[0.3, 0.8, 2.0], position_size_usdt=[5.0, 40.0],
+                            take_profit_pct=[30.0], stop_loss_pct=[50.0], leverage=[5, 125])
+    config = BacktestConfig(symbol="T_USDT_PERP", initial_balance_usdt=200.0)
+    exhaustive = run_sweep(market, config, matrix, workers=1)
+    halved, report = run_halving(market, config, matrix, eta=3, keep=3, workers=1)
+    top = lambda df: [combo_key(r) for r in df.head(3).to_dict("records")]
+    assert top(halved) == top(exhaustive)
+    assert list(halved["total_return"].head(3)) == list(exhaustive["total_return"].head(3))
+    assert report["rungs"][0]["liquidated"] > 0
+    assert report["bar_steps"] < 0.5 * report["exhaustive_bar_steps"] and report["saved_fraction"] > 0.5
+
+
+def test_lower_is_better_metrics_rank_ascending(make_market, matrix):
+    from backtest.optimizer import rank_results
+
+    ranked = run_sweep(make_market(), BacktestConfig(), matrix, workers=1, rank_by="max_drawdown")
+    assert list(ranked["max_drawdown"]) == sorted(ranked["max_drawdown"])
+    rows = [{"max_drawdown": 0.3, "total_return": 0.1}, {"max_drawdown": 0.1, "total_return": -0.2}]
+    assert rank_results(rows, by="total_return")["total_return"].tolist() == [0.1, -0.2]
+    assert rank_results(rows, by="max_drawdown", ascending=False)["max_drawdown"].tolist() == [0.3, 0.1]
+
+
+def test_halving_drops_liquidations_of_the_last_rung():
+    from backtest.data.synthetic import synthetic_market
+    from backtest.optimizer import run_halving
+
+    market = synthetic_market(days=12, seed=4, sigma=0.6)
+    matrix = OptimizeMatrix(grid_levels=[6, 20], grid_spacing_pct=[0.3, 2.0], position_size_usdt=[40.0],
+                            take_profit_pct=[30.0], stop_loss_pct=[50.0], leverage=[5, 125])
+    config = BacktestConfig(symbol="T_USDT_PERP", initial_balance_usdt=200.0)
+    ranked, report = run_halving(market, config, matrix, min_fraction=1.0, keep=8, workers=1)
+    assert len(report["rungs"]) == 1 and report["rungs"][0]["liquidated"] > 0
+    assert len(ranked) == 8 - report["rungs"][0]["liquidated"] - report["rungs"][0]["errors"] > 0
+    assert not ranked["stopped"].eq("liquidated").any() and not ranked["liquidations"].any()
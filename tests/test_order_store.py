@@ -0,0 +1,62 @@
+import numpy as np
+
+from backtest.exchange_sim import ExchangeSim, Order
+from backtest.order_store import BUY, OrderStore
+from tests.test_matching import _random_bars, _sim
+
+
+def test_handles_are_reused_after_removal():
+    store = OrderStore(capacity=2)
+    a = store.add(BUY, 1.0, 1.0, oid="a")
+    handles = store.add_many(BUY, np.array([0.9, 0.8, 0.7]), np.ones(3))
+    assert a == 0 and handles.tolist() == [1, 2, 3] and store.capacity >= 4 and len(store) == 4
+    store.remove(a)
+    store.remove_many([2])
+    assert store.handle("a") is None and store.handle(2) is None and store.handle(3) == 3
+    assert sorted(store.add_many(BUY, np.array([0.5, 0.4]), np.ones(2)).tolist()) == [0, 2]
+    assert store.key(3) == 3 and len(store) == 4
+
+
+def test_bulk_grid_matches_one_by_one():
+    o, h, l, c, ts = _random_bars()
+    buys = [round(1.0 - 0.004 * k, 3) for k in range(1, 41)]
+    sells = [round(1.0 + 0.004 * k, 3) for k in range(1, 41)]
+    bulk, single = _sim(), _sim()
+    assert (bulk.place_orders("buy", buys, 10.0) >= 0).all()
+    assert (bulk.place_orders("sell", sells, 10.0) >= 0).all()
+    for side, prices in (("buy", buys), ("sell", sells)):
+        for p in prices:
+            single.place_order(Order(id="", side=side, type="limit", price=p, qty=10))
+    bulk.run_bars(o, h, l, c, ts)
+    single.run_bars(o, h, l, c, ts)
+
+    def strip(fills):
+        return [{k: v for k, v in f.items() if k != "order_id"} for f in fills]
+
+    assert strip(bulk.fills) == strip(single.fills) and bulk.fills
+    assert bulk.position == single.position and len(bulk.open_orders) == len(single.open_orders)
+
+
+def test_bulk_placement_validates_and_cancels():
+    sim = _sim()
+    handles = sim.place_orders("buy", [0.95, 0.5, 1.01, -1.0], [10.0, 1.0, 10.0, 10.0], post_only=True)
+    # ok, below min notional, marketable post-only, invalid price
+    assert handles[0] >= 0 and (handles[1:] == -1).all() and sim.fills == []
+    order = sim.open_orders[int(handles[0])]
+    assert order.price == 0.95 and order.post_only and order.status == "open"
+    sim.place_order(Order(id="s1", side="sell", type="limit", price=1.05, qty=10))
+    sim.place_order(Order(id="m1", side="buy", type="market", price=None, qty=5))
+    assert set(sim.open_orders) == {int(handles[0]), "s1", "m1"}
+    sim.cancel_orders(list(sim.open_orders))
+    assert len(sim.open_orders) == 0
+    sim.on_bar(1.0, 1.1, 0.9, 1.0, 60_000)
+    assert sim.fills == []
+
+
+def test_taker_fill_at_placement_of_idless_order():
+    sim = _sim()
+    assert sim.place_limit("buy", 1.01, 5) == -1
+    assert sim.fills[-1]["order_id"] is None and sim.position.qty == 5
+    h = sim.place_limit("sell", 1.02, 5)
+    sim.on_bar(1.0, 1.03, 1.0, 1.02, 60_000)
+    assert sim.fills[-1]["order_id"] == h and sim.position.qty == 0
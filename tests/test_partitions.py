@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from backtest.data import downloader
+from backtest.data.partitions import DAY_MS, PartitionStore
+
+
+def _fake_klines(calls):
+    def fetch(symbol, timeframe, since_ms=None, end_ms=None, limit=1000):
+        calls.append((since_ms, end_ms))
+        ts = np.arange(since_ms, end_ms + 1, 3_600_000, dtype=np.int64)
+        return pd.DataFrame({"ts": ts, "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0, "volume": 1.0})
+    return fetch
+
+
+def test_only_missing_days_are_fetched(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(downloader, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(downloader, "fetch_klines_ccxt", _fake_klines(calls))
+    first = downloader.get_or_download_klines("PI/USDT", "1h", "2024-01-01", "2024-01-05")
+    assert len(first) == 5 * 24 and len(calls) == 1
+
+    sub = downloader.get_or_download_klines("PI/USDT", "1h", "2024-01-02", "2024-01-03")
+    assert len(calls) == 1 and len(sub) == 2 * 24
+
+    wider = downloader.get_or_download_klines("PI/USDT", "1h", "2024-01-03", "2024-01-07")
+    jan6 = int(pd.Timestamp("2024-01-06", tz="UTC").timestamp() * 1000)
+    assert calls[1] == (jan6, jan6 + 2 * DAY_MS - 1)
+    assert len(wider) == 5 * 24 and wider["ts"].is_monotonic_increasing
+    assert len(list((tmp_path / "PI_USDT" / "klines_1h").glob("*.parquet"))) == 7
+
+
+def test_gaps_merge_contiguous_days(tmp_path):
+    store = PartitionStore(tmp_path, "PI/USDT", "funding", ["ts", "rate"])
+    d0 = int(pd.Timestamp("2024-03-01", tz="UTC").timestamp() * 1000)
+    store.write(pd.DataFrame({"ts": [d0 + DAY_MS * 2], "rate": [0.0001]}), d0 + DAY_MS * 2, d0 + DAY_MS * 3 - 1)
+    assert store.gaps(d0, d0 + DAY_MS * 5 - 1) == [(d0, d0 + 2 * DAY_MS - 1), (d0 + 3 * DAY_MS, d0 + 5 * DAY_MS - 1)]
+
+
+def test_open_day_is_returned_but_not_cached(tmp_path):
+    store = PartitionStore(tmp_path, "PI/USDT", "funding", ["ts", "rate"])
+    d0 = int(pd.Timestamp("2024-03-01", tz="UTC").timestamp() * 1000)
+    df = pd.DataFrame({"ts": [d0 + 1, d0 + DAY_MS + 1], "rate": [0.1, 0.2]})
+    kept = store.write(df, d0, d0 + 2 * DAY_MS - 1, now=d0 + DAY_MS + 5)
+    assert list(kept["rate"]) == [0.2]
+    assert store.missing_days(d0, d0 + 2 * DAY_MS - 1) == [d0 + DAY_MS]
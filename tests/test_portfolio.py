@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.data.market import market_from_frames
+from backtest.engine import run_grid_backtest
+from backtest.exchange_sim import ExchangeSim
+from backtest.portfolio import PortfolioLeg, run_portfolio
+from config.schemas import BacktestConfig
+from strategies.grid import GridParams
+
+PARAMS = GridParams(grid_levels=10, grid_spacing_pct=0.3, position_size_usdt=5.0,
+                    take_profit_pct=50.0, stop_loss_pct=20.0)
+CONFIG = BacktestConfig(symbol="T_USDT_PERP")
+
+
+def _trend(n, start_ms=0, drift=-0.0005):
+    close = np.exp(np.cumsum(np.full(n, drift)))
+    open_ = np.concatenate([[1.0], close[:-1]])
+    df = pd.DataFrame({"ts": start_ms + np.arange(n) * 60_000, "open": open_, "high": np.maximum(open_, close),
+                       "low": np.minimum(open_, close), "close": close, "volume": 1.0})
+    return market_from_frames(df)
+
+
+def test_isolated_legs_sum_to_portfolio_on_merged_timeline(make_market):
+    a = make_market(n=3000, seed=1)
+    b = make_market(n=2000, seed=2)
+    b.ts = b.ts + 1000 * 60_000  # starts 1000 bars later
+    legs = [PortfolioLeg("A", PARAMS, 100.0, leverage=5, market=a), PortfolioLeg("B", PARAMS, 50.0, leverage=5, market=b)]
+    res = run_portfolio(legs, CONFIG, workers=1)
+    assert len(res.ts) == 3000
+    solo = ExchangeSim("A", leverage=5)
+    solo.balance_usdt = 100.0
+    run_grid_backtest(a, CONFIG.model_copy(update={"symbol": "A", "leverage": 5, "initial_balance_usdt": 100.0}),
+                      PARAMS, sim=solo, record_equity=True)
+    assert np.allclose(res.equity[:1000], solo.equity_curve[:1000] + 50.0)
+    assert res.legs["A"]["fills"] == len(solo.fills)
+    assert res.cross_liquidated_ts is None and not res.metrics["cross_liquidated"]
+
+
+def test_sharded_run_matches_serial(make_market):
+    legs = [PortfolioLeg(s, PARAMS, 100.0, leverage=5, margin_mode=m, market=make_market(n=2000, seed=k))
+            for k, (s, m) in enumerate([("A", "isolated"), ("B", "cross"), ("C", "cross")])]
+    serial = run_portfolio(legs, CONFIG, workers=1, cross_wallet_usdt=250.0)
+    sharded = run_portfolio(legs, CONFIG, workers=2, cross_wallet_usdt=250.0)
+    assert np.allclose(serial.equity, sharded.equity)
+    assert serial.legs == sharded.legs
+    assert serial.equity[0] == pytest.approx(350.0)
+
+
+def test_shared_cross_wallet_liquidates_together():
+    params = GridParams(grid_levels=20, grid_spacing_pct=0.2, position_size_usdt=5.0,
+                        take_profit_pct=500.0, stop_loss_pct=99.0)
+    legs = [PortfolioLeg("A", params, 20.0, leverage=50, margin_mode="cross", market=_trend(3000)),
+            PortfolioLeg("B", params, 20.0, leverage=50, margin_mode="cross", market=_trend(3000, drift=-0.0003))]
+    res = run_portfolio(legs, CONFIG, workers=1)
+    assert res.cross_liquidated_ts is not None
+    k = int(np.searchsorted(res.ts, res.cross_liquidated_ts))
+    assert (res.equity[k:] == 0).all() and res.equity[k - 1] > 0
+    assert res.legs["B"]["stopped"] == "account_liquidated"
+    with pytest.raises(ValueError):
+        run_portfolio(legs, CONFIG, cross_wallet_usdt=10.0)
@@ -0,0 +1,66 @@
+import asyncio
+
+from backtest.data.async_downloader import AsyncDownloader
+from backtest.data.fake_exchange import FakeMexc
+from backtest.data.synthetic import synthetic_market
+from backtest.engine import run_grid_backtest
+from backtest.exchange_sim import ExchangeSim
+from config.schemas import BacktestConfig
+from strategies.grid import GridParams
+from utils.profiling import Profiler, profiling
+
+PARAMS = GridParams(grid_levels=20, grid_spacing_pct=0.3, position_size_usdt=5.0,
+                    take_profit_pct=100.0, stop_loss_pct=50.0)
+
+
+def test_simulator_phases_and_counters():
+    market = synthetic_market(days=2, seed=1)
+    config = BacktestConfig(symbol="T_USDT_PERP", leverage=5)
+    assert ExchangeSim("T").profiler is None
+    with profiling() as prof:
+        result = run_grid_backtest(market, config, PARAMS)
+    s = prof.summary()
+    assert s["counters"]["bars"] == len(market)
+    assert s["counters"]["event_bars"] == result["event_bars"]
+    assert s["counters"]["fills"] == result["fills"]
+    assert s["counters"]["funding_events"] == result["funding_events"] == 6
+    assert {"match", "liquidation", "strategy", "scan", "funding"} <= set(s["phases"])
+    assert s["phases"]["match"]["calls"] == result["event_bars"]
+    assert "match" in prof.report()
+
+
+def test_downloader_counters():
+    async def run():
+        async with AsyncDownloader(lambda: FakeMexc(fail_every=4), concurrency=4, rate_per_sec=1000,
+                                   backoff_s=0.001) as dl:
+            await dl.klines("PI/USDT", "1m", 0, 3 * 86_400_000 - 1)
+            return dl.stats
+
+    with profiling() as prof:
+        stats = asyncio.run(run())
+    c = prof.summary()["counters"]
+    assert c["rows"] == 3 * 1440 and c["bytes"] > 0
+    assert c["requests"] + c["retries"] == stats["requests"] and c["retries"] == stats["retries"]
+    assert "rate_limit_wait" in prof.summary()["phases"]
+
+
+def test_merge_and_sampled_stacks(tmp_path):
+    a, b = Profiler(), Profiler()
+    a.add_time("x", 1.0)
+    b.add_time("x", 0.5, calls=2)
+    b.count("n", 3)
+    a.merge(b)
+    assert a.summary()["phases"]["x"]["calls"] == 3 and a.counters["n"] == 3
+
+    def busy():
+        total = 0
+        for k in range(3_000_000):
+            total += k
+        return total
+
+    out = tmp_path / "stacks.folded"
+    with profiling(sample_path=out, interval_s=0.001):
+        busy()
+    lines = out.read_text().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("busy (test_profiling.py" in line for line in lines)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from backtest.engine import run_grid_backtest
+from backtest.exchange_sim import ExchangeSim
+from backtest.replay import CoarseBars
+from config.schemas import BacktestConfig
+from strategies.grid import GridParams
+
+
+def test_coarse_blocks_follow_timeframe_boundaries():
+    ts = np.array([0, 1, 2, 3, 4, 6, 7]) * 60_000 * 30  # 30m bars with a gap
+    high = np.arange(7, dtype=float) + 1
+    low = np.arange(7, dtype=float)
+    cb = CoarseBars.build(ts, high, low, "1h")
+    assert list(cb.start) == [0, 2, 4, 5]
+    assert list(cb.high) == [2, 4, 5, 7] and list(cb.low) == [0, 2, 4, 5]
+    assert cb.block_of(3) == 1 and cb.block_end(3) == 7
+
+
+@pytest.mark.parametrize("spacing,levels", [(0.5, 10), (3.0, 6)])
+def test_coarse_replay_matches_full_1m_run(spacing, levels, make_market):
+    market = make_market(n=20_000, seed=11)
+    config = BacktestConfig(symbol="T_USDT_PERP", leverage=5)
+    params = GridParams(grid_levels=levels, grid_spacing_pct=spacing, position_size_usdt=5.0,
+                        take_profit_pct=50.0, stop_loss_pct=20.0)
+    full_sim = ExchangeSim(config.symbol, leverage=5)
+    full_sim.balance_usdt = config.initial_balance_usdt
+    full = run_grid_backtest(market, config, params, sim=full_sim, record_equity=True)
+    coarse_sim = ExchangeSim(config.symbol, leverage=5)
+    coarse_sim.balance_usdt = config.initial_balance_usdt
+    coarse = run_grid_backtest(market, config.model_copy(update={"replay_timeframe": "1h"}), params,
+                               sim=coarse_sim, record_equity=True)
+    assert coarse_sim.fills == full_sim.fills
+    assert np.allclose(coarse_sim.equity_curve, full_sim.equity_curve)
+    assert coarse["event_bars"] == full["event_bars"]
+    assert coarse["blocks_skipped"] + coarse["blocks_drilled"] == -(-len(market) // 60)
+    if spacing >= 3.0:
+        assert coarse["blocks_skipped"] > coarse["blocks_drilled"]
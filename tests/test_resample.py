@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from backtest.data import downloader
+from backtest.data.resample import cacheable, is_derived, resample_ohlcv
+
+
+def _minutes(start_ms, n, seed=0, drop=()):
+    rng = np.random.default_rng(seed)
+    ts = start_ms + np.arange(n, dtype=np.int64) * 60_000
+    close = 1 + np.cumsum(rng.normal(0, 0.001, n))
+    open_ = np.concatenate([[1.0], close[:-1]])
+    df = pd.DataFrame({"ts": ts, "open": open_, "high": np.maximum(open_, close) + 0.001,
+                       "low": np.minimum(open_, close) - 0.001, "close": close, "volume": rng.uniform(1, 2, n)})
+    return df.drop(index=list(drop)).reset_index(drop=True)
+
+
+def test_resample_matches_pandas_ohlc():
+    df = _minutes(0, 600, drop=range(130, 140))
+    out = resample_ohlcv(df.sample(frac=1, random_state=1), "15m")
+    idx = pd.to_datetime(df["ts"], unit="ms")
+    ref = df.set_index(idx).resample("15min").agg(
+        {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}).dropna()
+    assert len(out) == len(ref) == 40
+    for c in ("open", "high", "low", "close", "volume"):
+        assert np.allclose(out[c], ref[c])
+
+
+def test_empty_buckets_skipped_or_filled():
+    df = _minutes(0, 180, drop=range(60, 120))
+    assert list(resample_ohlcv(df, "1h")["ts"]) == [0, 7_200_000]
+    filled = resample_ohlcv(df, "1h", fill_gaps=True)
+    assert len(filled) == 3
+    gap = filled.iloc[1]
+    assert gap["volume"] == 0 and gap["open"] == gap["high"] == gap["low"] == gap["close"] == filled.iloc[0]["close"]
+    assert is_derived("5m") and not is_derived("1m") and cacheable("4h") and not cacheable("1w")
+
+
+def test_higher_timeframes_served_from_one_1m_download(tmp_path, monkeypatch):
+    calls = []
+
+    def fetch(symbol, timeframe, since_ms=None, end_ms=None, limit=1000):
+        calls.append(timeframe)
+        n = (end_ms - since_ms) // 60_000 + 1
+        return _minutes(since_ms, n)
+
+    monkeypatch.setattr(downloader, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(downloader, "fetch_klines_ccxt", fetch)
+    h1 = downloader.get_or_download_klines("PI/USDT", "1h", "2024-01-01", "2024-01-02")
+    m5 = downloader.get_or_download_klines("PI/USDT", "5m", "2024-01-01", "2024-01-02")
+    m1 = downloader.get_or_download_klines("PI/USDT", "1m", "2024-01-01", "2024-01-02")
+    assert calls == ["1m"]
+    assert len(h1) == 48 and len(m5) == 2 * 288 and len(m1) == 2 * 1440
+    assert np.isclose(h1["high"].iloc[0], m1["high"].iloc[:60].max())
+    assert len(list((tmp_path / "PI_USDT" / "klines_1h").glob("*.parquet"))) == 2
+    again = downloader.get_or_download_klines("PI/USDT", "1h", "2024-01-01", "2024-01-02")
+    assert calls == ["1m"] and again.equals(h1)
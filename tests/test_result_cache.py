@@ -0,0 +1,66 @@
+import numpy as np
+
+from backtest import exchange_specs, optimizer, result_cache
+from backtest.exchange_specs import ContractSpecs, RiskTier
+from backtest.optimizer import run_sweep
+from backtest.result_cache import ResultCache, cached_grid_backtest, downsample, market_digest, result_key
+from config.schemas import BacktestConfig
+from strategies.grid import GridParams
+
+CONFIG = BacktestConfig(symbol="T_USDT_PERP")
+PARAMS = GridParams(grid_levels=10, grid_spacing_pct=0.3, position_size_usdt=5.0,
+                    take_profit_pct=50.0, stop_loss_pct=20.0)
+
+
+def test_key_covers_data_config_params_specs_and_sim_version(monkeypatch, make_market):
+    market = make_market()
+    d = market_digest(market)
+    assert d == market_digest(make_market()) != market_digest(market.slice(0, 100))
+    base = result_key(d, CONFIG, PARAMS.model_dump())
+    assert base == result_key(d, CONFIG.model_copy(), PARAMS.model_dump())
+    assert base != result_key(d, CONFIG.model_copy(update={"leverage": 10}), PARAMS.model_dump())
+    assert base != result_key(d, CONFIG, {**PARAMS.model_dump(), "grid_levels": 11})
+    specs = ContractSpecs(CONFIG.symbol, 1e-4, 1.0, 5.0, 1.0, [RiskTier(1e6, 0.004, 0.0)])
+    monkeypatch.setitem(exchange_specs._SPECS_REGISTRY, CONFIG.symbol, specs)
+    with_specs = result_key(d, CONFIG, PARAMS.model_dump())
+    assert with_specs != base
+    monkeypatch.setitem(exchange_specs._SPECS_REGISTRY, CONFIG.symbol,
+                        ContractSpecs(CONFIG.symbol, 1e-3, 1.0, 5.0, 1.0, [RiskTier(1e6, 0.004, 0.0)]))
+    assert result_key(d, CONFIG, PARAMS.model_dump()) != with_specs
+    monkeypatch.setattr(result_cache, "sim_version", lambda: "edited")
+    assert base != result_key(d, CONFIG, PARAMS.model_dump())
+
+
+def test_identical_run_is_served_with_equity(tmp_path, make_market):
+    market = make_market()
+    with ResultCache(tmp_path / "r.sqlite") as cache:
+        first = cached_grid_backtest(market, CONFIG, PARAMS, cache, equity_points=50)
+        again = cached_grid_backtest(market, CONFIG, PARAMS, cache, equity_points=50)
+        assert cache.hits == 1 and cache.misses == 1
+    assert again["total_return"] == first["total_return"]
+    assert len(again["equity_curve"]) == 50
+    assert np.isclose(again["equity_curve"][-1], first["final_equity"], rtol=1e-6)
+    assert list(downsample(np.arange(10.0), 5)) == [1, 3, 5, 7, 9]
+
+
+def test_size_bound_evicts_least_recently_used(tmp_path):
+    with ResultCache(tmp_path / "r.sqlite", max_bytes=20_000) as cache:
+        for k in range(30):
+            cache.put(f"k{k}", {"x": k}, np.zeros(500))
+            if k >= 1:
+                cache.get("k0")  # keep k0 hot
+        assert cache.size_bytes() <= 20_000
+        assert cache.get("k0") is not None and cache.get("k1") is None
+        assert cache.get("k29") is not None
+
+
+def test_sweep_reuses_cached_rows(tmp_path, monkeypatch, make_market, matrix):
+    market = make_market()
+    with ResultCache(tmp_path / "r.sqlite") as cache:
+        first = run_sweep(market, CONFIG, matrix, workers=1, cache=cache)
+        calls = []
+        real = optimizer.evaluate_combo
+        monkeypatch.setattr(optimizer, "evaluate_combo", lambda *a, **k: calls.append(1) or real(*a, **k))
+        second = run_sweep(market, CONFIG, matrix, workers=1, cache=cache)
+    assert calls == [] and cache.hits == len(first)
+    assert first.equals(second)
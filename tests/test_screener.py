@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from backtest.data.synthetic import synthetic_market
+from backtest.optimizer import combo_key, expand_matrix, run_sweep
+from backtest.result_cache import ResultCache
+from backtest.screener import grid_state, level_crossings, rank_correlation, run_screened, screen_grid
+from config.schemas import BacktestConfig, OptimizeMatrix
+
+MATRIX = OptimizeMatrix(grid_levels=[6, 20], grid_spacing_pct=[0.3, 0.8, 2.0], position_size_usdt=[5.0, 40.0],
+                        take_profit_pct=[30.0], stop_loss_pct=[50.0], leverage=[5, 125])
+CONFIG = BacktestConfig(symbol="T_USDT_PERP", initial_balance_usdt=200.0)
+
+
+def test_grid_state_needs_a_full_level_to_turn():
+    ratio = np.array([0.0, -0.4, -1.2, -0.6, -1.5, 0.3, 0.0, 1.0, 0.5, 2.0, -0.2])
+    assert grid_state(ratio).tolist() == [0, 0, -1, -1, -1, 0, 0, 1, 1, 2, 0]
+    counts, first = level_crossings(grid_state(ratio))
+    # pairs (-1, 0), (0, 1), (1, 2): 0 -> -1 -> 0 -> 1 -> 2 -> 0
+    assert first == -1 and counts[:3].tolist() == [2, 2, 2]
+
+
+def test_screen_matches_simulated_fills_and_ranks_like_the_sweep():
+    market = synthetic_market(days=12, seed=4, sigma=0.6)
+    screen = screen_grid(market, CONFIG, list(expand_matrix(MATRIX)))
+    sim = run_sweep(market, CONFIG, MATRIX, workers=1)
+    sim = {combo_key(r): r for r in sim.to_dict("records")}
+    for row in screen.to_dict("records"):
+        done = sim[combo_key(row)]
+        assert row["exit"] == done["stopped"]
+        if not row["exit"]:  # ran to the end: same fills, return within 0.1%
+            assert row["fills"] == done["fills"]
+            assert row["est_return"] == pytest.approx(done["total_return"], abs=1e-3)
+    assert (screen["exit"] == "liquidated").sum() > 0
+    assert rank_correlation(screen["est_return"], [sim[combo_key(r)]["total_return"] for r in
+                                                   screen.to_dict("records")]) > 0.95
+
+
+def test_cross_margin_screen_liquidates_where_the_simulator_does():
+    matrix = MATRIX.model_copy(update={"stop_loss_pct": [100.0]})
+    config = CONFIG.model_copy(update={"margin_mode": "cross"})
+    market = synthetic_market(days=12, seed=4, sigma=0.6)
+    screen = screen_grid(market, config, list(expand_matrix(matrix)))
+    sim = {combo_key(r): r for r in run_sweep(market, config, matrix, workers=1).to_dict("records")}
+    assert [r["exit"] for r in screen.to_dict("records")] == [sim[combo_key(r)]["stopped"]
+                                                            for r in screen.to_dict("records")]
+    assert (screen["exit"] == "liquidated").sum() == 3
+    assert (screen["liq_distance"] == config.initial_balance_usdt
+            / (screen["position_size_usdt"] * screen["leverage"])).all()
+
+
+def test_run_screened_simulates_the_best_fraction_and_reports_correlation(make_market):
+    market, config = make_market(), BacktestConfig()
+    full = run_sweep(market, config, MATRIX, workers=1)
+    ranked, report = run_screened(market, config, MATRIX, fraction=0.25, keep=3, audit=4, workers=1)
+    assert report["combos"] == 24 and report["kept"] == 6 and report["audited"] == 4
+    assert len(ranked) == 6 and ranked["screen_rank"].max() == 5
+    assert report["saved_fraction"] == pytest.approx(1 - 10 / 24)
+    assert report["spearman"] > 0.9
+    assert combo_key(ranked.to_dict("records")[0]) == combo_key(full.to_dict("records")[0])
+    assert list(ranked["total_return"]) == sorted(ranked["total_return"], reverse=True)
+
+
+def test_screen_fields_come_from_the_current_run_not_the_cache(tmp_path, make_market):
+    market, config = make_market(), BacktestConfig()
+    small = MATRIX.model_copy(update={"grid_levels": [6], "grid_spacing_pct": [0.8], "position_size_usdt": [5.0]})
+    with ResultCache(tmp_path / "r.sqlite") as cache:
+        run_screened(market, config, MATRIX, fraction=1.0, workers=1, cache=cache)
+        ranked, report = run_screened(market, config, small, keep=2, workers=1, cache=cache)
+        assert cache.hits == 2 and len(ranked) == 2 and sorted(ranked["screen_rank"]) == [0, 1]
+        swept = run_sweep(market, config, small, workers=1, cache=cache)
+    assert "screen_rank" not in swept and "est_return" not in swept
@@ -0,0 +1,93 @@
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from backtest import exchange_specs
+from backtest.data import client as data_client, downloader
+from backtest.data.dataset import dataset_dir, write_dataset
+from backtest.data.fake_exchange import FakeMexcSync
+from backtest.data.synthetic import synthetic_market
+from backtest.engine import register_market_specs, run_grid_backtest
+from backtest.optimizer import combo_key, evaluate_combo, expand_matrix
+from backtest import service as service_module
+from backtest.service import WorkerService
+from backtest.service_client import ServiceClient, ServiceError, run_job
+from config.schemas import BacktestConfig
+from strategies.grid import GridParams
+
+CONFIG = dict(symbol="PI_USDT_PERP", timeframe="1m", start="2024-01-01", end="2024-01-02")
+PARAMS = dict(grid_levels=10, grid_spacing_pct=0.3, position_size_usdt=5.0, take_profit_pct=50.0, stop_loss_pct=20.0)
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(service_module, "_CACHE", {})  # in-process runs reopen the cache under tmp_path
+    monkeypatch.setattr(service_module, "_SPECS", {})
+    monkeypatch.setattr(exchange_specs, "_SPECS_REGISTRY", {})  # before the service forks its pool
+    market = synthetic_market(1.0, seed=5)
+    write_dataset(market, dataset_dir("PI/USDT", "1m", "2024-01-01", "2024-01-02"))
+    return market
+
+
+@pytest.fixture
+def service(tmp_path, dataset):
+    server = WorkerService(tmp_path / "s.sock", workers=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield ServiceClient(server.path, timeout_s=60)
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def _job(**kw):
+    return {"op": "backtest", "config": CONFIG, "params": PARAMS, **kw}
+
+
+def test_in_process_fallback_matches_direct_run(dataset, tmp_path):
+    expected = run_grid_backtest(dataset, BacktestConfig(**CONFIG), GridParams(**PARAMS))
+    client = ServiceClient(tmp_path / "nobody.sock")
+    first = [e for e in run_job(_job(), client)]
+    assert [e["event"] for e in first] == ["result", "done"]
+    assert first[0]["metrics"] == expected and not first[0]["cache_hit"]
+    again = next(run_job(_job(), client))
+    assert again["cache_hit"] and again["metrics"]["total_return"] == expected["total_return"]
+    with pytest.raises(ServiceError):
+        next(run_job(_job(), client, fallback=False))
+
+
+def test_service_runs_backtests_and_streams_sweeps(service, dataset, matrix):
+    assert next(service.stream({"op": "ping"}))["event"] == "pong"
+    remote = next(service.stream(_job(equity_points=50, refresh=True)))
+    local = next(run_job(_job(equity_points=50, refresh=True), local=True))
+    assert remote["metrics"] == local["metrics"]
+    assert len(remote["metrics"]["equity_curve"]) == 50
+
+    events = list(service.stream({"op": "sweep", "config": CONFIG, "matrix": matrix.model_dump()}))
+    rows = {combo_key(e["row"]): e["row"] for e in events if e["event"] == "row"}
+    assert events[-1]["event"] == "done" and len(rows) == 8
+    config = BacktestConfig(**CONFIG)
+    for combo in list(expand_matrix(matrix))[:2]:
+        assert rows[combo_key(combo)]["total_return"] == evaluate_combo(dataset, config, combo)["total_return"]
+
+    with pytest.raises(ServiceError, match="unknown op"):
+        list(service.stream({"op": "nope"}))
+    with pytest.raises(RuntimeError):
+        WorkerService(service.path, workers=1)
+
+
+def test_workers_register_the_dataset_specs(service, dataset):
+    data_client.save_snapshot(FakeMexcSync().load_markets())  # after the pool forked
+    result = next(service.stream(_job()))
+    specs = register_market_specs(BacktestConfig(**CONFIG), dataset)
+    assert specs is not None and specs.risk_tiers[0].notional_cap < float("inf")
+    assert result["metrics"] == run_grid_backtest(dataset, BacktestConfig(**CONFIG), GridParams(**PARAMS))
+
+
+def test_client_import_is_light():
+    code = "import sys, backtest.service_client, scripts.run_backtest, scripts.optimize; print(sorted({'numpy', 'pandas', 'ccxt'} & set(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
@@ -1,2 +1,13 @@
+from backtest.exchange_specs import ContractSpecs, RiskTier
+
+
 def test_placeholder_specs():
     assert True
+
+
+def test_rounding_is_float_safe():
+    specs = ContractSpecs(symbol="X", tick_size=0.1, lot_size=0.1, min_notional=5.0,
+                          multiplier=1.0, risk_tiers=[RiskTier(1e9, 0.005, 0.0)])
+    assert specs.round_price(0.3) == 0.3
+    assert specs.round_price(0.39) == 0.3
+    assert specs.round_qty(0.7) == 0.7
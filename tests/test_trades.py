@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from backtest.data import client, downloader
+from backtest.data.fake_exchange import TRADE_INTERVAL_MS, FakeMexcSync
+from backtest.data.market import market_from_frames
+from backtest.data.synthetic import synthetic_market, synthetic_trades
+from backtest.data.trades import TradeChunk, chunk_frame, iter_trades, trade_store, trades_to_bars
+from backtest.engine import run_grid_backtest, run_grid_ticks
+from backtest.exchange_sim import ExchangeSim
+from config.schemas import BacktestConfig
+from strategies.grid import GridParams
+
+T0 = 1_704_067_200_000  # 2024-01-01
+PARAMS = GridParams(grid_levels=10, grid_spacing_pct=0.2, position_size_usdt=5.0, take_profit_pct=50.0,
+                    stop_loss_pct=20.0)
+
+
+def _trades(n=200_000, seed=1):
+    rng = np.random.default_rng(seed)
+    ticks = 10_000 + np.cumsum(rng.choice([-1, 0, 0, 1], n))  # prices on a 1e-4 tick
+    return pd.DataFrame({"ts": T0 + np.cumsum(rng.integers(0, 400, n)), "price": ticks / 10_000,
+                         "qty": rng.integers(1, 50, n).astype(float), "side": rng.choice([-1, 1], n)})
+
+
+def _chunk(*rows):
+    ts, price, qty, side = map(np.array, zip(*rows))
+    return TradeChunk(ts.astype(np.int64), price.astype(float), qty.astype(float), side.astype(np.int8))
+
+
+def test_download_stores_zstd_days_and_replays_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader, "CACHE_DIR", tmp_path)
+    client.set_exchange_factory(FakeMexcSync)
+    try:
+        written = downloader.download_trades("PI/USDT", "2024-01-01", "2024-01-02")
+        assert written == 2 * 86_400_000 // TRADE_INTERVAL_MS
+        assert downloader.download_trades("PI/USDT", "2024-01-01", "2024-01-02") == 0  # cached
+    finally:
+        client.set_exchange_factory(None)
+    store = trade_store("PI/USDT", tmp_path)
+    meta = pq.ParquetFile(store.path_for(T0)).metadata
+    assert meta.row_group(0).column(0).compression == "ZSTD"
+    start, end = T0 + 3_600_000, T0 + 86_400_000 + 3_600_000
+    chunks = list(iter_trades(store, start, end, chunk_rows=5000))
+    assert max(map(len, chunks)) <= 5000
+    ts = np.concatenate([c.ts for c in chunks])
+    assert ts[0] == start and ts[-1] == end and np.all(np.diff(ts) == TRADE_INTERVAL_MS)
+    assert chunks[0].side.dtype == np.int8 and set(np.unique(np.concatenate([c.side for c in chunks]))) == {-1, 1}
+
+
+def test_queue_position_delays_fill_until_queue_trades_away():
+    sim = ExchangeSim("X")
+    sim.run_trades([_chunk((0, 1.01, 1, 1))], queue_ahead=5.0)  # sets the last price
+    h = sim.place_limit("buy", 1.00, 2.0)
+    sim.run_trades([_chunk((1, 1.00, 3, -1), (2, 1.00, 50, 1), (3, 1.00, 3, -1))], queue_ahead=5.0)
+    assert not sim.fills and sim._store.queue[h] == pytest.approx(1.0)  # 7 - 3 - 3; taker buys don't count
+    sim.run_trades([_chunk((4, 1.00, 1, -1))], queue_ahead=5.0)
+    assert [(f["price"], f["qty"], f["maker"]) for f in sim.fills] == [(1.00, 2.0, True)]
+
+    # a print through the level fills it whatever the queue
+    sim.place_limit("sell", 1.02, 1.0)
+    sim.run_trades([_chunk((5, 1.0201, 1, 1))], queue_ahead=1e9)
+    assert len(sim.fills) == 2 and sim.position.qty == pytest.approx(1.0)
+
+
+def test_second_order_at_a_level_queues_behind_the_first():
+    sim = ExchangeSim("X")
+    sim.run_trades([_chunk((0, 1.01, 1, 1))], queue_ahead=4.0)
+    first = sim.place_limit("buy", 1.00, 1.0)
+    second = sim.place_limit("buy", 1.00, 1.0)
+    assert (sim._store.queue[first], sim._store.queue[second]) == (5.0, 6.0)
+    sim.run_trades([_chunk((1, 1.00, 5, -1))], queue_ahead=4.0)
+    assert [f["order_id"] for f in sim.fills] == [first]
+
+
+def test_tick_grid_is_chunk_invariant_and_fills_less_than_bars():
+    trades = _trades()
+    config = BacktestConfig(initial_balance_usdt=100.0)
+    runs = {}
+    for rows in (1_000, 50_000):
+        sim = ExchangeSim(config.symbol, leverage=config.leverage)
+        sim.balance_usdt = config.initial_balance_usdt
+        runs[rows] = (run_grid_ticks(chunk_frame(trades, rows), config, PARAMS, sim=sim, queue_ahead=20.0,
+                                     record_equity=True), sim)
+    (a, sim_a), (b, sim_b) = runs[1_000], runs[50_000]
+    assert np.array_equal(sim_a.equity_curve, sim_b.equity_curve) and sim_a.fills == sim_b.fills
+    assert a == pytest.approx(b)  # ratios only differ by how the samples were batched
+    minutes = (trades["ts"].iloc[-1] // 60_000) - (trades["ts"].iloc[0] // 60_000) + 1
+    assert len(sim_a.equity_curve) == minutes
+    assert a["event_trades"] < len(trades) // 2
+
+    bars = trades_to_bars(chunk_frame(trades, 7_000), 60_000)
+    assert len(bars) == trades["ts"].floordiv(60_000).nunique()
+    assert bars["volume"].sum() == trades["qty"].sum()
+    touch = run_grid_backtest(market_from_frames(bars), config, PARAMS)
+    no_queue = run_grid_ticks(chunk_frame(trades), config, PARAMS, queue_ahead=0.0)
+    assert a["fills"] <= no_queue["fills"] <= touch["fills"]
+    assert a["fills"] < touch["fills"]
+
+
+def test_grid_prices_sit_on_the_print_tick_so_queue_depth_matters():
+    market = synthetic_market(days=3, seed=2)
+    trades = synthetic_trades(market, per_bar=20)
+    config = BacktestConfig(symbol="NO_SPECS_USDT_PERP", leverage=10)
+    params = GridParams(grid_levels=40, grid_spacing_pct=0.25, position_size_usdt=5.0, take_profit_pct=200.0,
+                        stop_loss_pct=80.0)
+    sim = ExchangeSim(config.symbol, leverage=config.leverage)
+    sim.balance_usdt = config.initial_balance_usdt
+    front = run_grid_ticks(chunk_frame(trades, 20_000), config, params, sim=sim, queue_ahead=0.0)
+    assert sim.tick == 1e-4
+    assert all(p == round(p, 4) for p in sim._bids.prices + sim._asks.prices)
+    back = run_grid_ticks(chunk_frame(trades, 20_000), config, params, queue_ahead=1e12)
+    assert back["fills"] < front["fills"]
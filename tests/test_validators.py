@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from backtest.data.validators import OhlcvValidator, validate_ohlcv
+
+M = 60_000
+
+
+def _frame(n=10, start=0):
+    ts = start + np.arange(n, dtype=np.int64) * M
+    close = np.round(1.0 + 0.001 * np.arange(n), 4)
+    return pd.DataFrame({"ts": ts, "open": close, "high": close + 0.002, "low": close - 0.002,
+                         "close": close, "volume": np.full(n, 5.0)})
+
+
+def test_bad_rows_are_dropped_or_repaired():
+    df = _frame()
+    df.loc[2, "high"] = df.loc[2, "close"] - 0.001  # high below close
+    df.loc[4, "low"] = df.loc[4, "open"] + 0.001  # low above open
+    df.loc[5, "close"] = np.nan
+    df.loc[6, "open"] = -1.0
+    df = pd.concat([df, df.iloc[[0]]])  # duplicate
+    out, report = validate_ohlcv(df.astype({"volume": object}), "1m")
+    assert len(out) == 8 and report.duplicates == 1 and report.non_numeric == 1 and report.non_positive == 1
+    assert report.inconsistent == report.repaired == 2 and report.missing_bars == 2 and report.gaps == 1
+    assert (out["high"] >= out[["open", "close"]].max(axis=1)).all()
+    assert (out["low"] <= out[["open", "close"]].min(axis=1)).all()
+    dropped, report = validate_ohlcv(df, "1m", bad="drop")
+    assert len(dropped) == 6 and report.dropped_bad == 2 and not report.clean
+
+
+def test_gaps_filled_flat_across_chunks():
+    df = _frame(20).drop(index=[3, 4, 9, 10])
+    out, report = validate_ohlcv(df, "1m", fill_gaps=True, chunk_rows=5)
+    assert report.gaps == 2 and report.missing_bars == report.filled_bars == 4
+    assert np.array_equal(out["ts"], np.arange(20) * M)
+    filled = out.iloc[[3, 4]]
+    assert (filled[["open", "high", "low", "close"]].to_numpy() == out.loc[2, "close"]).all()
+    assert (filled["volume"] == 0).all()
+
+
+def test_chunked_stream_matches_one_pass():
+    df = _frame(1000).sample(frac=1.0, random_state=1)
+    whole, a = validate_ohlcv(df, "1m")
+    chunked, b = validate_ohlcv(df, "1m", chunk_rows=77)
+    assert whole.equals(chunked) and a.to_dict() == b.to_dict() and a.reordered > 0
+    v = OhlcvValidator("1m")
+    late = pd.concat([v.feed(_frame(5, start=5 * M)), v.feed(_frame(5))])
+    assert len(late) == 5 and v.report.duplicates == 5
+
+
+def test_compact_schema_keeps_prices_exact():
+    out, report = validate_ohlcv(_frame(50), "1m")
+    assert out["close"].dtype == np.float32 and out["volume"].dtype == np.float32 and out["ts"].dtype == np.int64
+    assert report.price_decimals == 3
+    back = np.round(out["close"].to_numpy(np.float64), report.price_decimals)
+    assert np.array_equal(back, _frame(50)["close"].to_numpy())
+    noisy = _frame(50)
+    noisy["close"] = noisy["open"] = noisy["close"] + 1e-11 * np.arange(50)
+    out, report = validate_ohlcv(noisy, "1m")
+    assert out["close"].dtype == np.float64 and report.price_dtype == "float64"
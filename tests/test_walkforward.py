@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.optimizer import combo_key, evaluate_combo, expand_matrix
+from backtest.result_cache import ResultCache
+from backtest.walkforward import combine_periods, period_bounds, run_walk_forward, walk_forward_folds
+from config.schemas import BacktestConfig
+
+
+def test_folds_roll_and_anchor():
+    ts = np.arange(6000) * 60_000  # 100 hours of 1m bars
+    bounds = period_bounds(ts, "12h")
+    assert list(bounds) == [0, 720, 1440, 2160, 2880, 3600, 4320, 5040, 5760, 6000]
+    folds, _ = walk_forward_folds(ts, "36h", "12h")
+    assert [f.test for f in folds] == [(2160, 2880), (2880, 3600), (3600, 4320), (4320, 5040), (5040, 5760),
+                                       (5760, 6000)]
+    assert [f.train for f in folds[:2]] == [(0, 2160), (720, 2880)]
+    anchored, _ = walk_forward_folds(ts, "36h", "12h", anchored=True)
+    assert all(f.train[0] == 0 and f.train[1] == f.test[0] for f in anchored)
+    with pytest.raises(ValueError):
+        walk_forward_folds(ts, "30h", "12h")
+
+
+def test_calendar_months():
+    ts = pd.date_range("2024-01-01", "2024-04-30", freq="1D").as_unit("ms").asi8
+    assert list(period_bounds(ts, "1M")) == [0, 31, 60, 91, 121]
+
+
+def test_combine_periods_compounds():
+    rows = [{"total_return": 0.1, "max_drawdown": 0.05, "sharpe_ratio": 1.0, "sortino_ratio": 2.0,
+             "win_rate": 1.0, "trades": 1, "fills": 2, "funding_paid": 0.5, "liquidations": 0},
+            {"total_return": -0.1, "max_drawdown": 0.2, "sharpe_ratio": 3.0, "sortino_ratio": 0.0,
+             "win_rate": 0.0, "trades": 3, "fills": 4, "funding_paid": 0.5, "liquidations": 0}]
+    out = combine_periods(rows, 100.0)
+    assert out["total_return"] == pytest.approx(1.1 * 0.9 - 1)
+    assert out["final_equity"] == pytest.approx(99.0)
+    assert (out["max_drawdown"], out["sharpe_ratio"], out["trades"], out["fills"]) == (0.2, 2.0, 4, 6)
+    assert out["win_rate"] == pytest.approx(0.25)
+
+
+def test_walk_forward_picks_on_train_and_stitches(tmp_path, make_market, matrix):
+    market, config = make_market(6000), BacktestConfig()
+    with ResultCache(tmp_path / "r.sqlite") as cache:
+        res = run_walk_forward(market, config, matrix, train="36h", test="12h", workers=1, cache=cache)
+        assert cache.misses == 8 * 8  # 8 combos on periods 0..7; the last period is test-only
+        again = run_walk_forward(market, config, matrix, train="36h", test="12h", workers=1, cache=cache)
+        assert cache.misses == 8 * 8
+    pd.testing.assert_frame_equal(res.folds, again.folds)
+    assert len(res.folds) == 6 and len(res.equity) == len(res.ts) == 6000 - 2160
+    assert res.report["saved_fraction"] == pytest.approx(1 - 8 / 18)
+
+    # the chosen combo of fold 0 is the best on the train span by compounded return
+    combos = list(expand_matrix(matrix))
+    fold0 = res.folds.to_dict("records")[0]
+    scores = {}
+    for c in combos:
+        rows = [evaluate_combo(market, config, c, 720, s) for s in (0, 720, 1440)]
+        if not any(r["liquidations"] for r in rows):
+            scores[combo_key(c)] = combine_periods(rows, config.initial_balance_usdt)["total_return"]
+    assert combo_key(fold0) == max(scores, key=scores.get)
+
+    # each test period starts from the previous period's final equity
+    start = res.folds["test_start"].to_numpy()
+    ends = np.searchsorted(res.ts, start[1:]) - 1
+    rel = res.equity[ends + 1] / res.equity[ends]
+    assert np.all(np.abs(rel - 1) < 0.05)
+    assert res.metrics["final_equity"] == pytest.approx(res.equity[-1])
+
+
+def test_continuous_mode_runs_full_train_spans(make_market, matrix):
+    market, config = make_market(6000), BacktestConfig()
+    res = run_walk_forward(market, config, matrix, train="36h", test="12h", segmented=False, workers=2)
+    assert res.report["bar_steps"] == res.report["independent_bar_steps"]
+    assert len(res.folds) == 6
+
+
+def test_rank_by_must_be_a_combined_metric_in_segmented_mode(make_market, matrix):
+    market, config = make_market(6000), BacktestConfig()
+    with pytest.raises(ValueError, match="profit_factor"):
+        run_walk_forward(market, config, matrix, train="36h", test="12h", rank_by="profit_factor", workers=1)
+    for rank_by, segmented in (("sharpe_ratio", True), ("profit_factor", False)):
+        res = run_walk_forward(market, config, matrix, train="36h", test="12h", rank_by=rank_by,
+                               segmented=segmented, workers=1)
+        picked = res.folds[res.folds["candidates"] > 0]
+        assert len(picked) and picked["grid_levels"].notna().all()
+        assert picked[f"train_{rank_by}"].notna().all()
@@ -0,0 +1,130 @@
+"""
+Opt-in instrumentation for hot paths.
+- `Profiler` accumulates per-phase wall time and counters; instrumented code only pays
+  for it when one is active (a single `is None` check otherwise).
+- `profiling()` activates a profiler for the enclosed block: simulators created inside
+  pick it up, and the downloaders report to it. Optionally a `SamplingProfiler` runs
+  alongside and writes folded stacks ("a;b;c count" lines, the input of flamegraph.pl
+  and speedscope).
+"""
+from __future__ import annotations
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.logging import get_logger
+
+_ACTIVE: ContextVar[Optional["Profiler"]] = ContextVar("active_profiler", default=None)
+
+
+def current_profiler() -> Optional["Profiler"]:
+    return _ACTIVE.get()
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.timers: Dict[str, List[float]] = {}  # name -> [calls, seconds]
+        self.counters: Counter = Counter()
+
+    def add_time(self, name: str, seconds: float, calls: int = 1) -> None:
+        t = self.timers.get(name)
+        if t is None:
+            self.timers[name] = [calls, seconds]
+        else:
+            t[0] += calls
+            t[1] += seconds
+
+    def count(self, name: str, n: float = 1) -> None:
+        self.counters[name] += n
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - t0)
+
+    def merge(self, other: "Profiler") -> None:
+        for name, (calls, secs) in other.timers.items():
+            self.add_time(name, secs, int(calls))
+        self.counters.update(other.counters)
+
+    def summary(self) -> Dict[str, Any]:
+        phases = {name: {"calls": int(calls), "seconds": secs, "mean_us": secs / calls * 1e6 if calls else 0.0}
+                  for name, (calls, secs) in sorted(self.timers.items(), key=lambda kv: -kv[1][1])}
+        return {"phases": phases, "counters": dict(self.counters)}
+
+    def report(self) -> str:
+        s = self.summary()
+        lines = [f"{'phase':<24}{'calls':>12}{'seconds':>12}{'mean_us':>12}"]
+        lines += [f"{name:<24}{p['calls']:>12}{p['seconds']:>12.4f}{p['mean_us']:>12.2f}"
+                  for name, p in s["phases"].items()]
+        lines += [f"{name:<24}{value:>12g}" for name, value in sorted(s["counters"].items())]
+        return "\n".join(lines)
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every `interval_s` from a background thread."""
+
+    def __init__(self, interval_s: float = 0.005, thread_id: Optional[int] = None):
+        self.interval_s = interval_s
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self) -> "SamplingProfiler":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def write(self, path: Path) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(self.folded())
+        return path
+
+
+@contextmanager
+def profiling(profiler: Optional[Profiler] = None, sample_path: Optional[Path] = None,
+              interval_s: float = 0.005, log: bool = False) -> Iterator[Profiler]:
+    """Activate `profiler` (a new one by default) for the block; with `sample_path`, also
+    write folded stacks of this thread there. `log` prints the summary on exit."""
+    prof = profiler if profiler is not None else Profiler()
+    token = _ACTIVE.set(prof)
+    sampler = SamplingProfiler(interval_s).start() if sample_path is not None else None
+    try:
+        yield prof
+    finally:
+        if sampler is not None:
+            sampler.stop()
+            sampler.write(Path(sample_path))
+        _ACTIVE.reset(token)
+        if log:
+            get_logger("grid_trader.profile").info("profile summary\n%s", prof.report())
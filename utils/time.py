@@ -4,3 +4,14 @@ from datetime import datetime, timezone
 
 def to_ms(dt: datetime) -> int:
     return int(dt.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+_UNIT_MS = {"s": 1_000, "m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000}
+
+
+def timeframe_to_ms(timeframe: str) -> int:
+    """'1m' -> 60000, '4h' -> 14400000 (ccxt timeframe strings; months are not fixed-width)."""
+    unit = timeframe[-1]
+    if unit not in _UNIT_MS or not timeframe[:-1].isdigit():
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return int(timeframe[:-1]) * _UNIT_MS[unit]